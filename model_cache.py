@@ -0,0 +1,91 @@
+# model_cache.py - 预融合 + trace 的 TorchScript 模型本地缓存，按 (权重 hash, device, imgsz) 区分
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from ultralytics import YOLO
+
+
+def weights_hash(path, n=16):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:n]
+
+
+class ModelCache:
+    # 用法与 YOLO 模型一致：model(image, imgsz=...) 自动选用该输入形状的 trace 模型
+    # TorchScript 输入形状固定，因此按实际送入的 letterbox 形状 (h, w)（通常是矩形）各缓存一份；
+    # 启动时用 load() 同步导出 / 加载所有候选形状，推理中遇到新形状则后台导出，导出完成前用 eager 模型顶上
+    def __init__(self, weights, device, cache_dir):
+        self.weights = Path(weights)
+        self.device = device
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.key = f"{self.weights.stem}-{weights_hash(self.weights)}-{device}"
+        self.models = {}  # (h, w) -> TorchScript 模型
+        self.exporting = {}  # (h, w) -> 后台导出线程
+        self.lock = threading.Lock()
+        self.export_lock = threading.Lock()
+        self.eager = None
+        self.names = None
+
+    def path(self, shape):
+        h, w = shape
+        return self.cache_dir / f"{self.key}-{h}x{w}.torchscript"
+
+    def prepare(self, shape):
+        # 缓存缺失时导出（export 内部会先 fuse Conv+BN 再 trace）；返回是否命中缓存
+        f = self.path(shape)
+        if f.exists():
+            return True
+        with self.export_lock:  # export 总是写到权重旁的同名文件，同一进程内串行导出
+            exported = YOLO(str(self.weights)).export(format='torchscript', imgsz=list(shape),
+                                                      device=0 if self.device == 'cuda' else self.device)
+            tmp = f.with_suffix(f'.{os.getpid()}.tmp')
+            shutil.move(exported, tmp)
+        os.replace(tmp, f)  # 原子替换，多进程同时导出也不会读到半个文件
+        return False
+
+    def load(self, shape):
+        # 同步导出（如需）并加载，启动阶段使用
+        shape = tuple(shape)
+        if shape not in self.models:
+            self.prepare(shape)
+            model = YOLO(str(self.path(shape)), task='detect')
+            self.names = model.names
+            self.models[shape] = model
+        return self.models[shape]
+
+    def _export(self, shape):
+        try:
+            self.load(shape)
+            print(f"✅ TorchScript model exported for {shape[0]}x{shape[1]}")
+        except Exception as e:
+            print(f"❌ TorchScript export failed for {shape[0]}x{shape[1]}: {e}")
+        finally:
+            with self.lock:
+                self.exporting.pop(shape, None)
+
+    def get(self, shape):
+        # 不阻塞推理：未缓存的形状交给后台线程导出，期间返回 eager 模型
+        shape = tuple(shape)
+        if shape in self.models:
+            return self.models[shape]
+        with self.lock:
+            if shape not in self.exporting:
+                print(f"⏳ No TorchScript model for {shape[0]}x{shape[1]}, exporting in background (eager meanwhile)")
+                self.exporting[shape] = threading.Thread(target=self._export, args=(shape,), daemon=True)
+                self.exporting[shape].start()
+            if self.eager is None:
+                self.eager = YOLO(str(self.weights)).to(self.device)
+                self.names = self.names or self.eager.names
+        return self.eager
+
+    def __call__(self, image, imgsz, **kwargs):
+        # image 是已 letterbox 的输入，按其实际形状选模型（imgsz 取该形状，避免再次填充成正方形）
+        shape = image.shape[:2]
+        return self.get(shape)(image, imgsz=list(shape), **kwargs)
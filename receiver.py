@@ -105,7 +105,8 @@ try:
         if detections:
             print(f"🔍 Frame {frame_id}: {len(detections)} detections - ", end="")
             for det in detections:
-                print(f"{det['label']} ({det['confidence']:.2f}) ", end="")
+                track = f"#{det['track_id']} " if 'track_id' in det else ""
+                print(f"{track}{det['label']} ({det['confidence']:.2f}) ", end="")
             print()
 
 except Exception as e:
@@ -0,0 +1,147 @@
+# send_queue.py - 有界发送队列：非阻塞 socket + 后台发送线程，按策略处理拥塞，检测半开连接
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+POLICIES = ('drop-oldest', 'drop-newest', 'block')
+
+
+def enable_keepalive(sock, idle=5, interval=2, count=3):
+    # TCP keepalive：对端掉线（半开连接）约 idle + interval * count 秒后被内核发现
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for opt, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if hasattr(socket, opt):  # Linux；macOS / Windows 只有部分选项
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), value)
+
+
+class SendQueue:
+    # 每条消息（header + payload）整体入队、整体丢弃，不会破坏接收端的分帧
+    #   drop-oldest: 队满丢最旧的（结果流：只关心最新结果）
+    #   drop-newest: 队满丢新来的
+    #   block:       队满阻塞调用方，反压传回上游（视频流：丢编码后的包会破坏参考帧）
+    # 发送在 stall_timeout 秒内毫无进展视为对端卡死 / 半开连接，后续 put() 抛出 ConnectionError
+    def __init__(self, sock, name, maxsize=4, policy='drop-oldest', sndbuf=64 * 1024, stall_timeout=2.0):
+        assert policy in POLICIES, f"Invalid policy {policy}, valid values are {POLICIES}"
+        self.sock = sock
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.stall_timeout = stall_timeout
+        if sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)  # 限制内核缓冲，积压留在可控的应用队列里
+        enable_keepalive(sock)
+        sock.setblocking(False)
+
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.error = None
+        self.closed = False
+
+        # 统计
+        self.sent = 0
+        self.dropped = 0
+        self.max_occupancy = 0
+        self.occupancy_sum = 0
+        self.puts = 0
+
+        self.thread = threading.Thread(target=self._run, name=f'send-{name}', daemon=True)
+        self.thread.start()
+
+    def put(self, data):
+        # 入队一条消息；返回 False 表示按策略丢弃了一条
+        with self.cond:
+            if self.error:
+                raise self.error
+            dropped = False
+            if len(self.queue) >= self.maxsize:
+                if self.policy == 'drop-oldest':
+                    self.queue.popleft()
+                    dropped = True
+                elif self.policy == 'drop-newest':
+                    self.dropped += 1
+                    self._sample()
+                    return False
+                elif not self.cond.wait_for(lambda: len(self.queue) < self.maxsize or self.error,
+                                            timeout=self.stall_timeout):
+                    self._fail(ConnectionError(f"{self.name}: send queue blocked > {self.stall_timeout}s"))
+                if self.error:
+                    raise self.error
+            self.dropped += dropped
+            self.queue.append(data)
+            self._sample()
+            self.cond.notify_all()
+            return not dropped
+
+    def _sample(self):
+        n = len(self.queue)
+        self.max_occupancy = max(self.max_occupancy, n)
+        self.occupancy_sum += n
+        self.puts += 1
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.queue or self.closed)
+                if not self.queue:
+                    return
+                data = self.queue.popleft()
+                self.cond.notify_all()
+            try:
+                self._send(data)
+                with self.cond:
+                    self.sent += 1
+            except OSError as e:
+                with self.cond:
+                    self._fail(e if isinstance(e, ConnectionError) else ConnectionError(f"{self.name}: {e}"))
+                return
+
+    def _fail(self, error):
+        # 调用方需持有 self.cond：记录首个错误并 shutdown socket，
+        # 发送线程随之退出，对端也看到断开，而不是一端报错、另一端继续收发
+        if self.error is None:
+            self.error = error
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # 已断开
+        self.queue.clear()
+        self.cond.notify_all()
+
+    def _send(self, data):
+        view = memoryview(data)
+        deadline = time.time() + self.stall_timeout
+        while view:
+            _, writable, _ = select.select([], [self.sock], [], max(0.0, deadline - time.time()))
+            if not writable:
+                raise ConnectionError(f"{self.name}: peer stalled > {self.stall_timeout}s (half-open or congested)")
+            try:
+                n = self.sock.send(view)
+            except BlockingIOError:
+                continue
+            view = view[n:]
+            deadline = time.time() + self.stall_timeout  # 有进展就重新计时
+
+    def stats(self):
+        with self.cond:
+            return {
+                "policy": self.policy,
+                "occupancy": len(self.queue),
+                "maxsize": self.maxsize,
+                "max_occupancy": self.max_occupancy,
+                "avg_occupancy": self.occupancy_sum / self.puts if self.puts else 0.0,
+                "sent": self.sent,
+                "dropped": self.dropped,
+            }
+
+    def summary(self):
+        s = self.stats()
+        return f"Q={s['occupancy']}/{s['maxsize']} (max={s['max_occupancy']}, drop={s['dropped']})"
+
+    def close(self, timeout=1.0):
+        # 尽量把剩余消息发完再退出
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
@@ -1,4 +1,5 @@
 # sender.py - 按逻辑帧分配 frame_id，强化 zerolatency 编码
+import argparse
 import socket
 import av
 import cv2
@@ -6,11 +7,23 @@ import struct
 import time
 import sys
 
+from send_queue import POLICIES, SendQueue
+
+# ==================== 0. 参数 ====================
+# 视频流默认 block：编码后的 H.264 包一旦丢弃会破坏后续参考帧，反压让摄像头侧少编码几帧更安全
+parser = argparse.ArgumentParser()
+parser.add_argument('--policy', default='block', choices=POLICIES, help='发送队列满时的策略')
+parser.add_argument('--queue-size', type=int, default=2, help='发送队列长度（消息数）')
+parser.add_argument('--sndbuf', type=int, default=64 * 1024, help='SO_SNDBUF 字节数，0 为系统默认')
+args = parser.parse_args()
+
 # ==================== 1. 连接 YOLO Server ====================
 try:
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client_socket.connect(('localhost', 8080))
     print("✅ Sender connected to YOLO Server (port 8080)")
+    send_queue = SendQueue(client_socket, 'sender->server', args.queue_size, args.policy, args.sndbuf)
+    print(f"📮 Send queue: policy={args.policy}, size={args.queue_size}, sndbuf={args.sndbuf}")
 except ConnectionRefusedError:
     print("❌ Cannot connect to server. Is yoloserver.py running?")
     sys.exit(1)
@@ -102,12 +115,16 @@ try:
                     continue
                 h264_data = bytes(packet)
                 header = struct.pack('dQQ', capture_time, len(h264_data), frame_id)
-                client_socket.sendall(header + h264_data)
+                send_queue.put(header + h264_data)
 
             # 日志（仅每帧一次）
             total_send_time = (time.time() - capture_time) * 1000
-            print(f"📤 Sent Frame {frame_id} | TotalSend={total_send_time:.1f}ms | Packets={len(packets)}")
+            print(f"📤 Sent Frame {frame_id} | TotalSend={total_send_time:.1f}ms | Packets={len(packets)} | "
+                  f"{send_queue.summary()}")
 
+        except ConnectionError as e:
+            print(f"❌ Send error: {e}")
+            break
         except Exception as e:
             print(f"❌ Encode/send error: {e}")
 
@@ -123,6 +140,7 @@ except Exception as e:
 finally:
     print("🧹 Cleaning up sender...")
     cap.release()
+    send_queue.close()
     client_socket.close()
     output.close()
     if display_enabled:
@@ -0,0 +1,86 @@
+# stream_profile.py - 每路视频流的推理配置：按源分辨率 + 延迟预算选择 imgsz，缓存 letterbox 几何
+import cv2
+
+# 候选推理尺寸（均为 stride 32 的倍数），从大到小
+SIZES = (640, 576, 512, 448, 384, 320, 256, 192, 160)
+
+
+class LetterboxGeometry:
+    # 某个 (源尺寸, imgsz) 组合下的 letterbox 参数，只计算一次
+    def __init__(self, shape, imgsz, stride=32, color=(114, 114, 114)):
+        h, w = shape
+        self.shape = shape
+        self.imgsz = imgsz
+        self.gain = min(imgsz / h, imgsz / w)
+        self.new_unpad = round(w * self.gain), round(h * self.gain)
+        dw = (imgsz - self.new_unpad[0]) % stride / 2  # 最小矩形填充（同 auto=True）
+        dh = (imgsz - self.new_unpad[1]) % stride / 2
+        self.pad = dw, dh
+        self.border = round(dh - 0.1), round(dh + 0.1), round(dw - 0.1), round(dw + 0.1)  # top, bottom, left, right
+        self.resize = (w, h) != self.new_unpad
+        self.out_shape = self.new_unpad[1] + sum(self.border[:2]), self.new_unpad[0] + sum(self.border[2:])  # (h, w)
+        self.color = color
+
+    def apply(self, image):
+        if self.resize:
+            image = cv2.resize(image, self.new_unpad, interpolation=cv2.INTER_LINEAR)
+        top, bottom, left, right = self.border
+        return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=self.color)
+
+    def to_source(self, xyxy):
+        # letterbox 坐标 -> 源图坐标（原地修改并裁剪到图像范围）
+        xyxy[:, [0, 2]] -= self.pad[0]
+        xyxy[:, [1, 3]] -= self.pad[1]
+        xyxy /= self.gain
+        h, w = self.shape
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+        return xyxy
+
+
+class StreamProfile:
+    # 从 start_size 起步；延迟 EMA 超出预算连续 patience 帧则降一档；长期低于预算一半则升一档（不超过源分辨率与 max_size）
+    def __init__(self, start_size=320, max_size=640, budget_ms=50.0, patience=5, alpha=0.2):
+        self.start_size = start_size
+        self.max_size = max_size
+        self.budget_ms = budget_ms
+        self.patience = patience
+        self.alpha = alpha
+        self.sizes = [s for s in SIZES if s <= max_size] or [SIZES[-1]]
+        self.level = 0  # 当前尺寸在 self.sizes 中的下标
+        self.shape = None
+        self.ema_ms = None
+        self.over = 0
+        self.under = 0
+        self.cache = {}  # (shape, imgsz) -> LetterboxGeometry
+
+    @property
+    def imgsz(self):
+        return self.sizes[self.level]
+
+    def geometry(self, shape):
+        # 源分辨率变化时重新选择起始尺寸：不超过 start_size 与源图长边
+        if shape != self.shape:
+            self.shape = shape
+            start = min(max(shape), self.start_size)
+            self.level = next((i for i, s in enumerate(self.sizes) if s <= start), len(self.sizes) - 1)
+            self.ema_ms, self.over, self.under = None, 0, 0
+        key = shape, self.imgsz
+        if key not in self.cache:
+            self.cache[key] = LetterboxGeometry(shape, self.imgsz)
+        return self.cache[key]
+
+    def record(self, latency_ms):
+        # 记录一帧推理耗时，必要时切换尺寸；返回是否发生切换
+        self.ema_ms = latency_ms if self.ema_ms is None else self.alpha * latency_ms + (1 - self.alpha) * self.ema_ms
+        self.over = self.over + 1 if self.ema_ms > self.budget_ms else 0
+        self.under = self.under + 1 if self.ema_ms < self.budget_ms / 2 else 0
+        long_side = max(self.shape) if self.shape else self.max_size
+        if self.over >= self.patience and self.level < len(self.sizes) - 1:
+            self.level += 1
+        elif self.under >= self.patience * 10 and self.level > 0 and self.sizes[self.level - 1] <= long_side:
+            self.level -= 1
+        else:
+            return False
+        self.ema_ms, self.over, self.under = None, 0, 0
+        return True
@@ -0,0 +1,189 @@
+# tracker.py - 向量化 IoU + Kalman 多目标跟踪（SORT / ByteTrack 风格）
+# 所有轨迹的预测、关联、更新都以整帧为单位做批量 NumPy 运算，单帧数百个目标也不会退化成 Python 循环
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment  # 匈牙利匹配（可选）
+except ImportError:
+    linear_sum_assignment = None
+
+
+# ==================== 框格式转换 ====================
+def xyxy_to_xyah(b):
+    # [x1, y1, x2, y2] -> [cx, cy, w/h, h]
+    w = b[:, 2] - b[:, 0]
+    h = np.maximum(b[:, 3] - b[:, 1], 1e-6)
+    return np.stack([b[:, 0] + w / 2, b[:, 1] + h / 2, w / h, h], 1)
+
+
+def xyah_to_xyxy(s):
+    # [cx, cy, w/h, h] -> [x1, y1, x2, y2]
+    w = s[:, 2] * s[:, 3]
+    h = s[:, 3]
+    return np.stack([s[:, 0] - w / 2, s[:, 1] - h / 2, s[:, 0] + w / 2, s[:, 1] + h / 2], 1)
+
+
+def iou_matrix(a, b):
+    # (n,4) x (m,4) -> (n,m) IoU，一次广播完成
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match(iou, thres):
+    # 按 IoU 做一对一匹配，返回 (匹配对, 未匹配行, 未匹配列)
+    n, m = iou.shape
+    if n == 0 or m == 0:
+        return np.empty((0, 2), dtype=int), np.arange(n), np.arange(m)
+    if linear_sum_assignment is not None:
+        r, c = linear_sum_assignment(-iou)
+    else:  # 无 scipy 时退化为贪心：按 IoU 从大到小依次占用
+        order = np.argsort(-iou, axis=None)
+        r, c = np.unravel_index(order[iou.ravel()[order] >= thres], iou.shape)
+        used_r, used_c, keep = np.zeros(n, bool), np.zeros(m, bool), []
+        for k, (i, j) in enumerate(zip(r, c)):
+            if not used_r[i] and not used_c[j]:
+                used_r[i] = used_c[j] = True
+                keep.append(k)
+        r, c = r[keep], c[keep]
+    ok = iou[r, c] >= thres
+    pairs = np.stack([r[ok], c[ok]], 1)
+    return pairs, np.setdiff1d(np.arange(n), pairs[:, 0]), np.setdiff1d(np.arange(m), pairs[:, 1])
+
+
+# ==================== 批量 Kalman 滤波 ====================
+class KalmanBoxFilter:
+    # 状态 [cx, cy, a, h, vx, vy, va, vh]，匀速模型；噪声随框高度缩放（同 DeepSORT / ByteTrack）
+    def __init__(self, std_pos=1 / 20, std_vel=1 / 160):
+        self.std_pos = std_pos
+        self.std_vel = std_vel
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+
+    def _diag(self, std):
+        # (n,k) 标准差 -> (n,k,k) 对角协方差
+        n, k = std.shape
+        cov = np.zeros((n, k, k))
+        cov[:, np.arange(k), np.arange(k)] = std**2
+        return cov
+
+    def initiate(self, z):
+        h = z[:, 3]
+        p, v = self.std_pos * h, self.std_vel * h
+        std = np.stack([2 * p, 2 * p, np.full_like(h, 1e-2), 2 * p, 10 * v, 10 * v, np.full_like(h, 1e-5), 10 * v], 1)
+        return np.concatenate([z, np.zeros_like(z)], 1), self._diag(std)
+
+    def predict(self, mean, cov):
+        h = mean[:, 3]
+        p, v = self.std_pos * h, self.std_vel * h
+        std = np.stack([p, p, np.full_like(h, 1e-2), p, v, v, np.full_like(h, 1e-5), v], 1)
+        mean = mean @ self.F.T
+        cov = self.F @ cov @ self.F.T + self._diag(std)
+        return mean, cov
+
+    def update(self, mean, cov, z):
+        h = mean[:, 3]
+        p = self.std_pos * h
+        S = cov[:, :4, :4] + self._diag(np.stack([p, p, np.full_like(h, 1e-1), p], 1))  # 投影后的协方差
+        PHt = cov[:, :, :4]
+        K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)  # (n,8,4) Kalman 增益
+        mean = mean + (K @ (z - mean[:, :4])[..., None])[..., 0]
+        cov = cov - K @ S @ K.transpose(0, 2, 1)
+        return mean, cov
+
+
+# ==================== 跟踪器 ====================
+class Tracker:
+    # ByteTrack 两阶段关联：高分框先匹配全部轨迹，低分框再匹配剩余轨迹（找回被遮挡/模糊的目标）
+    # 新轨迹需连续命中 min_hits 帧才输出（抑制单帧误检），丢失后最多补帧 max_coast 帧（抑制单帧漏检）
+    def __init__(self, high_thres=0.4, low_thres=0.1, match_iou=0.3, low_match_iou=0.5,
+                 min_hits=2, max_coast=2, max_age=30):
+        self.high_thres = high_thres
+        self.low_thres = low_thres
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.min_hits = min_hits
+        self.max_coast = max_coast
+        self.max_age = max_age
+        self.kf = KalmanBoxFilter()
+        self.next_id = 1
+
+        # 轨迹状态（按列存放，便于批量运算）
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=int)
+        self.cls = np.zeros(0, dtype=int)
+        self.conf = np.zeros(0)
+        self.hits = np.zeros(0, dtype=int)  # 连续命中帧数
+        self.lost = np.zeros(0, dtype=int)  # 距上次命中的帧数
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _associate(self, tracks, dets, boxes, cls, thres):
+        # 同类别才允许匹配：异类 IoU 置 0
+        iou = iou_matrix(xyah_to_xyxy(self.mean[tracks]), boxes[dets])
+        iou *= self.cls[tracks][:, None] == cls[dets][None, :]
+        pairs, ut, ud = match(iou, thres)
+        return tracks[pairs[:, 0]], dets[pairs[:, 1]], tracks[ut], dets[ud]
+
+    def update(self, boxes, conf, cls):
+        # boxes (n,4) xyxy, conf (n,), cls (n,) -> (boxes, conf, cls, ids) 平滑后的已确认轨迹
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        conf = np.asarray(conf, dtype=np.float64).reshape(-1)
+        cls = np.asarray(cls, dtype=int).reshape(-1)
+
+        # 1. 所有轨迹一次性预测
+        if len(self):
+            self.mean, self.cov = self.kf.predict(self.mean, self.cov)
+        self.lost += 1
+
+        # 2. 高分 / 低分框分组
+        high = np.nonzero(conf >= self.high_thres)[0]
+        low = np.nonzero((conf >= self.low_thres) & (conf < self.high_thres))[0]
+
+        # 3. 第一阶段：高分框 vs 全部轨迹；第二阶段：低分框 vs 剩余的已确认轨迹
+        t1, d1, ut, ud_high = self._associate(np.arange(len(self)), high, boxes, cls, self.match_iou)
+        confirmed = ut[self.hits[ut] >= self.min_hits]
+        t2, d2, _, _ = self._associate(confirmed, low, boxes, cls, self.low_match_iou)
+        t, d = np.concatenate([t1, t2]), np.concatenate([d1, d2])
+
+        # 4. 批量 Kalman 更新
+        if len(t):
+            self.mean[t], self.cov[t] = self.kf.update(self.mean[t], self.cov[t], xyxy_to_xyah(boxes[d]))
+            self.conf[t] = conf[d]
+            self.hits[t] += 1
+            self.lost[t] = 0
+
+        # 5. 清理：未确认轨迹一丢即删，已确认轨迹超过 max_age 帧删除；中断的命中计数清零
+        missed = self.lost > 0
+        self.hits[missed & (self.hits >= self.min_hits)] = self.min_hits  # 已确认轨迹保持确认状态
+        keep = ~(missed & (self.hits < self.min_hits)) & (self.lost <= self.max_age)
+        self._select(keep)
+
+        # 6. 未匹配的高分框新建轨迹
+        if len(ud_high):
+            mean, cov = self.kf.initiate(xyxy_to_xyah(boxes[ud_high]))
+            n = len(ud_high)
+            self.mean = np.concatenate([self.mean, mean])
+            self.cov = np.concatenate([self.cov, cov])
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+            self.cls = np.concatenate([self.cls, cls[ud_high]])
+            self.conf = np.concatenate([self.conf, conf[ud_high]])
+            self.hits = np.concatenate([self.hits, np.ones(n, dtype=int)])
+            self.lost = np.concatenate([self.lost, np.zeros(n, dtype=int)])
+            self.next_id += n
+
+        # 7. 输出：已确认且丢失不超过 max_coast 帧的轨迹（丢失期间输出预测框）
+        out = (self.hits >= self.min_hits) & (self.lost <= self.max_coast)
+        return xyah_to_xyxy(self.mean[out, :4]), self.conf[out], self.cls[out], self.ids[out]
+
+    def _select(self, keep):
+        self.mean, self.cov = self.mean[keep], self.cov[keep]
+        self.ids, self.cls, self.conf = self.ids[keep], self.cls[keep], self.conf[keep]
+        self.hits, self.lost = self.hits[keep], self.lost[keep]
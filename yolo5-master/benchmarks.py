@@ -23,12 +23,22 @@ Requirements:
 
 Usage:
     $ python benchmarks.py --weights yolov5s.pt --img 640
+    $ python benchmarks.py --weights yolov5s.onnx --img 320 --io  # ONNX Runtime / OpenVINO per-call IO overhead
+    $ python benchmarks.py --weights yolov5s_openvino_model --batch-size 8 --ov-throughput  # OpenVINO async FPS
+    $ python benchmarks.py --weights yolov5s.pt --img 320 --replicas --slo-ms 50  # CPU replicas x threads autotune
+    $ python benchmarks.py --weights yolov5s.pt --img 640 --int8 --calib 300  # ONNX Runtime INT8 vs FP32 accuracy
+    $ python benchmarks.py --weights yolov5s.pt --img 640 --compile --device cpu  # eager vs jit vs inductor latency
+    $ python benchmarks.py --weights yolov5s.pt --img 640 --channels-last --device cpu  # per-layer NCHW vs NHWC latency
+    $ python benchmarks.py --weights yolov5s.pt --img 640 --batch-size 8 --tta  # augmented inference latency and mAP
+    $ python benchmarks.py --weights yolov5s.pt --ensemble yolov5m.pt --img 640  # NMS vs WBF ensemble latency and mAP
 """
 
 import argparse
+import os
 import platform
 import sys
 import time
+from copy import deepcopy
 from pathlib import Path
 
 import pandas as pd
@@ -39,12 +49,16 @@ if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))  # add ROOT to PATH
 # ROOT = ROOT.relative_to(Path.cwd())  # relative
 
+import torch
+
 import export
+from models.common import DetectMultiBackend
 from models.experimental import attempt_load
 from models.yolo import SegmentationModel
 from segment.val import run as val_seg
 from utils import notebook_init
 from utils.general import LOGGER, check_yaml, file_size, print_args
+from utils.replicas import autotune
 from utils.torch_utils import select_device
 from val import run as val_det
 
@@ -59,6 +73,16 @@ def run(
     test=False,  # test exports only
     pt_only=False,  # test PyTorch only
     hard_fail=False,  # throw error on benchmark failure
+    io=False,  # benchmark per-call IO overhead of exported weights instead
+    ov_throughput=False,  # benchmark OpenVINO async THROUGHPUT mode against synchronous inference instead
+    replicas=False,  # autotune multi-instance CPU replicas x threads instead
+    slo_ms=100.0,  # p95 latency objective for replicas autotuning (ms)
+    int8=False,  # compare ONNX Runtime INT8 against FP32 accuracy and latency instead
+    calib=300,  # INT8 calibration images
+    compile=False,  # compare eager, TorchScript-frozen and torch.compile PyTorch latency instead
+    channels_last=False,  # compare per-layer NCHW and channels_last (oneDNN fused) PyTorch latency instead
+    tta=False,  # compare plain, per-view and batched augmented inference latency, and NMS and WBF mAP instead
+    ensemble=None,  # weights to ensemble with `weights`, compare their latency and NMS and WBF mAP instead
 ):
     """
     Run YOLOv5 benchmarks on multiple export formats and log results for model performance evaluation.
@@ -73,6 +97,27 @@ def run(
         test (bool): Test export formats only (default: False).
         pt_only (bool): Test PyTorch format only (default: False).
         hard_fail (bool): Throw an error on benchmark failure if True (default: False).
+        io (bool): Instead, benchmark per-call inference time of exported `weights` with and without zero-copy IO, see
+            `io_overhead()` (default: False).
+        ov_throughput (bool): Instead, benchmark OpenVINO `weights` FPS in THROUGHPUT mode against the synchronous
+            path, see `openvino_throughput()` (default: False).
+        replicas (bool): Instead, search CPU replicas x threads partitions for the highest throughput within `slo_ms`,
+            see `utils.replicas.autotune()` (default: False).
+        slo_ms (float): p95 latency objective in milliseconds for `replicas` (default: 100.0).
+        int8 (bool): Instead, export FP32 and INT8 ONNX models of `weights` and compare their val.py accuracy and
+            latency, see `int8_report()` (default: False).
+        calib (int): Number of calibration images for `int8` (default: 300).
+        compile (bool): Instead, compare PyTorch latency of `weights` in eager mode and with DetectMultiBackend
+            `compile_mode` jit and inductor, see `compile_latency()` (default: False).
+        channels_last (bool): Instead, compare per-layer PyTorch latency of `weights` fused in NCHW and optimized with
+            BaseModel.to_channels_last() with and without oneDNN Conv+SiLU, see `channels_last_latency()` (default:
+            False).
+        tta (bool): Instead, compare PyTorch latency of `weights` without augmentation and with augmented views run
+            one by one and batched, and val.py accuracy of augmented inference with NMS and WBF, see `tta_report()`
+            (default: False).
+        ensemble (list[str], optional): Instead, ensemble `weights` with these weights and compare the latency of
+            members run serially and concurrently, and val.py accuracy of one NMS over all members and of per-member
+            NMS and WBF, see `ensemble_report()` (default: None).
 
     Returns:
         None. Logs information about the benchmark results, including the format, size, mAP50-95, and inference time.
@@ -96,6 +141,22 @@ def run(
         Run benchmarks:
           $ python benchmarks.py --weights yolov5s.pt --img 640
     """
+    if io:
+        return io_overhead(weights, imgsz, batch_size, device, half)
+    if ov_throughput:
+        return openvino_throughput(weights, imgsz, batch_size)
+    if replicas:
+        return autotune(weights, imgsz, batch_size, slo_ms)
+    if int8:
+        return int8_report(weights, imgsz, data, device, calib)
+    if compile:
+        return compile_latency(weights, imgsz, batch_size, device, half)
+    if channels_last:
+        return channels_last_latency(weights, imgsz, batch_size, device, half)
+    if tta:
+        return tta_report(weights, imgsz, batch_size, data, device, half)
+    if ensemble:
+        return ensemble_report([weights, *ensemble], imgsz, batch_size, data, device, half)
     y, t = [], time.time()
     device = select_device(device)
     model_type = type(attempt_load(weights, fuse=False))  # DetectionModel, SegmentationModel, etc.
@@ -159,6 +220,16 @@ def test(
     test=False,  # test exports only
     pt_only=False,  # test PyTorch only
     hard_fail=False,  # throw error on benchmark failure
+    io=False,  # unused, see run()
+    ov_throughput=False,  # unused, see run()
+    replicas=False,  # unused, see run()
+    slo_ms=100.0,  # unused, see run()
+    int8=False,  # unused, see run()
+    calib=300,  # unused, see run()
+    compile=False,  # unused, see run()
+    channels_last=False,  # unused, see run()
+    tta=False,  # unused, see run()
+    ensemble=None,  # unused, see run()
 ):
     """
     Run YOLOv5 export tests for all supported formats and log the results, including export statuses.
@@ -218,6 +289,296 @@ def test(
     return py
 
 
+def io_overhead(weights, imgsz=640, batch_size=1, device="", half=False, n=200):
+    """
+    Times DetectMultiBackend inference of exported `weights` with zero-copy IO against the copying path.
+
+    ONNX Runtime IO binding and OpenVINO shared tensors save a fixed cost per call, which matters most at small input
+    sizes, so sizes 32-256 below `imgsz` are timed as well; sizes a static-shape model rejects are skipped.
+
+    Args:
+        weights (Path | str): Exported model, e.g. yolov5s.onnx or yolov5s_openvino_model/.
+        imgsz (int): Largest inference size in pixels (default: 640).
+        batch_size (int): Batch size (default: 1).
+        device (str): CUDA device, e.g., '0' or 'cpu' (default: "").
+        half (bool): Use FP16 half-precision inference (default: False).
+        n (int): Timed calls per size and path (default: 200).
+
+    Returns:
+        pd.DataFrame: Milliseconds per call for each size with copying and zero-copy IO.
+    """
+    device = select_device(device)
+    models = [DetectMultiBackend(weights, device=device, fp16=half, zero_copy=x) for x in (False, True)]
+    y = []
+    for size in [s for s in (32, 64, 128, 256) if s < imgsz] + [imgsz]:
+        im = torch.rand(batch_size, 3, size, size, device=device, dtype=torch.half if half else torch.float)
+        try:
+            t = [float("inf")] * len(models)
+            for _ in range(5):  # interleaved rounds, best of 5
+                for i, model in enumerate(models):
+                    model(im)  # warmup
+                    t0 = time.perf_counter()
+                    for _ in range(n // 5):
+                        model(im)
+                    t[i] = min(t[i], (time.perf_counter() - t0) / (n // 5) * 1e3)
+            y.append([size, round(t[0], 3), round(t[1], 3), round(t[0] - t[1], 3)])
+        except Exception as e:
+            LOGGER.warning(f"WARNING ⚠️ IO benchmark failure at size {size}: {e}")
+    py = pd.DataFrame(y, columns=["Size", "Copy (ms)", "Zero-copy (ms)", "Saved (ms)"])
+    LOGGER.info(f"\nIO benchmark of {weights} complete\n{py}")
+    return py
+
+
+def openvino_throughput(weights, imgsz=640, batch_size=8, n=10):
+    """
+    Compares OpenVINO FPS of synchronous inference with THROUGHPUT mode, where the images of each batch run in parallel
+    async infer requests.
+
+    Args:
+        weights (Path | str): OpenVINO model, e.g. yolov5s_openvino_model/.
+        imgsz (int): Inference size in pixels (default: 640).
+        batch_size (int): Images per batch, the parallelism available to THROUGHPUT mode (default: 8).
+        n (int): Timed batches per mode (default: 10).
+
+    Returns:
+        pd.DataFrame: Images per second for each mode.
+    """
+    y = []
+    im = torch.rand(batch_size, 3, imgsz, imgsz)
+    for mode, throughput in (("sync", False), ("THROUGHPUT", True)):
+        model = DetectMultiBackend(weights, ov_throughput=throughput)
+        model(im)  # warmup
+        t0 = time.perf_counter()
+        for _ in range(n):
+            model(im)
+        fps = n * batch_size / (time.perf_counter() - t0)
+        y.append([mode, len(model.ov_queue) if throughput else 1, round(fps, 1)])
+    py = pd.DataFrame(y, columns=["Mode", "Requests", "FPS"])
+    LOGGER.info(f"\nOpenVINO throughput benchmark of {weights} at batch {batch_size}, {os.cpu_count()} CPUs\n{py}")
+    return py
+
+
+def int8_report(weights, imgsz=640, data=ROOT / "data/coco128.yaml", device="", calib=300):
+    """
+    Exports FP32 and post-training INT8 ONNX models of `weights` and compares their val.py accuracy and latency.
+
+    The INT8 model is calibrated on `calib` images of the `data` train split, see `export.export_onnx_int8()`, and both
+    models are validated on the `data` val split with ONNX Runtime.
+
+    Args:
+        weights (Path | str): PyTorch detection model weights.
+        imgsz (int): Inference size in pixels (default: 640).
+        data (Path | str): Path to the dataset.yaml file (default: ROOT / "data/coco128.yaml").
+        device (str): CUDA device, e.g., '0' or 'cpu' (default: "").
+        calib (int): Number of calibration images (default: 300).
+
+    Returns:
+        pd.DataFrame: Size, mAP50, mAP50-95 and inference time for FP32 and INT8, with the INT8 - FP32 difference.
+    """
+    device = select_device(device)
+    files = export.run(
+        weights=weights, imgsz=[imgsz], include=["onnx"], device=device, int8=True, data=data, calib=calib
+    )  # FP32, INT8
+    assert len(files) == 2, "INT8 export failed"
+    y = []
+    for name, w in zip(("FP32", "INT8"), files):
+        result = val_det(data, w, 1, imgsz, plots=False, device=device, half=False)  # FP32 inputs
+        y.append([name, round(file_size(w), 1), round(result[0][2], 4), round(result[0][3], 4), round(result[2][1], 2)])
+    y.append(["INT8 - FP32", *(round(b - a, 4) for a, b in zip(y[0][1:], y[1][1:]))])
+    py = pd.DataFrame(y, columns=["Model", "Size (MB)", "mAP50", "mAP50-95", "Inference time (ms)"])
+    LOGGER.info(f"\nINT8 report of {weights} calibrated on {calib} images complete\n{py}")
+    return py
+
+
+def compile_latency(weights, imgsz=640, batch_size=1, device="", half=False, n=50):
+    """
+    Compares PyTorch inference latency of `weights` run eagerly and compiled with DetectMultiBackend `compile_mode`.
+
+    Args:
+        weights (Path | str): PyTorch model weights, e.g. yolov5s.pt.
+        imgsz (int): Inference size in pixels (default: 640).
+        batch_size (int): Batch size (default: 1).
+        device (str): CUDA device, e.g., '0' or 'cpu' (default: "").
+        half (bool): Use FP16 half-precision inference (default: False).
+        n (int): Timed calls per mode, best of 3 rounds (default: 50).
+
+    Returns:
+        pd.DataFrame: Compile seconds, milliseconds per call and speedup over eager for each mode.
+    """
+    device = select_device(device)
+    im = torch.rand(batch_size, 3, imgsz, imgsz, device=device, dtype=torch.half if half else torch.float)
+    y = []
+    for mode in ("", "jit", "inductor"):
+        try:
+            model = DetectMultiBackend(weights, device=device, fp16=half, compile_mode=mode)
+            with torch.inference_mode():
+                t0 = time.perf_counter()
+                model(im)  # compile
+                tc = time.perf_counter() - t0
+                t = float("inf")
+                for _ in range(3):
+                    t0 = time.perf_counter()
+                    for _ in range(n):
+                        model(im)
+                    t = min(t, (time.perf_counter() - t0) / n * 1e3)
+            speedup = round(y[0][2] / t, 2) if y else 1.0
+            y.append([mode or "eager", round(tc, 1) if mode else None, round(t, 2), speedup])
+        except Exception as e:
+            LOGGER.warning(f"WARNING ⚠️ Compile benchmark failure for {mode or 'eager'}: {e}")
+    py = pd.DataFrame(y, columns=["Mode", "Compile (s)", "Latency (ms)", "Speedup"])
+    LOGGER.info(f"\nCompile benchmark of {weights} at {batch_size}x{imgsz} on {device.type} complete\n{py}")
+    return py
+
+
+def channels_last_latency(weights, imgsz=640, batch_size=1, device="", half=False, n=50):
+    """
+    Compares per-layer PyTorch latency of fused `weights` in NCHW, in channels_last and in channels_last with oneDNN
+    Conv+SiLU kernels, see BaseModel.to_channels_last(), all profiled with BaseModel._profile_one_layer(). Layers are
+    profiled repeatedly on the same cache-hot input, so end-to-end latency is measured too.
+
+    Args:
+        weights (Path | str): PyTorch model weights, e.g. yolov5s.pt.
+        imgsz (int): Inference size in pixels (default: 640).
+        batch_size (int): Batch size (default: 1).
+        device (str): CUDA device, e.g., '0' or 'cpu' (default: "").
+        half (bool): Use FP16 half-precision inference (default: False).
+        n (int): Timed end-to-end calls per variant, best of 3 rounds (default: 50).
+
+    Returns:
+        pd.DataFrame: Milliseconds per layer, in total and end-to-end of each variant, and the end-to-end speedup.
+    """
+    device = select_device(device)
+    model = attempt_load(weights, device=device)  # fused
+    model.half() if half else model.float()
+    models = model, deepcopy(model).to_channels_last(), deepcopy(model).to_channels_last(fuse_act=True)
+    im = torch.rand(batch_size, 3, imgsz, imgsz, device=device, dtype=torch.half if half else torch.float)
+    inputs = im, im.contiguous(memory_format=torch.channels_last), im.contiguous(memory_format=torch.channels_last)
+    dt, e2e, error = [[], [], []], [], 0.0
+    with torch.inference_mode():
+        for m, x, t in zip(models, inputs, dt):
+            m(x)  # warmup
+            m._forward_once(x, profile=True, dt=t)
+            error = max(error, (m(x)[0] - model(im)[0]).abs().max().item())
+            e2e.append(float("inf"))
+            for _ in range(3):
+                t0 = time.perf_counter()
+                for _ in range(n):
+                    m(x)
+                e2e[-1] = min(e2e[-1], (time.perf_counter() - t0) / n * 1e3)
+    y = [[m.i, m.type.split(".")[-1], *(round(x, 2) for x in t)] for m, *t in zip(model.model, *dt)]
+    y.append(["", "Total", *(round(sum(t), 2) for t in dt)])
+    y.append(["", "End-to-end", *(round(t, 2) for t in e2e)])
+    y.append(["", "Speedup", *(round(e2e[0] / t, 2) for t in e2e)])
+    py = pd.DataFrame(y, columns=["Layer", "Module", "NCHW (ms)", "channels_last (ms)", "+ oneDNN Conv+SiLU (ms)"])
+    s = f"at {batch_size}x{imgsz} on {device.type} complete, max output difference {error:.2g}"
+    LOGGER.info(f"\nchannels_last benchmark of {weights} {s}\n{py.to_string(index=False)}")
+    return py
+
+
+def tta_report(weights, imgsz=640, batch_size=1, data=ROOT / "data/coco128.yaml", device="", half=False, n=20):
+    """
+    Compares test-time augmentation (TTA) of PyTorch detection `weights`, see DetectionModel._forward_augment().
+
+    Latency is timed on random inputs without augmentation and with the augmented views run one by one and as one
+    padded batch. Accuracy and per-image times on the `data` val split are measured without augmentation and with
+    augmentation post-processed by one NMS over all views or by per-view NMS and Weighted Box Fusion (WBF).
+
+    Args:
+        weights (Path | str): PyTorch detection model weights, e.g. yolov5s.pt.
+        imgsz (int): Inference size in pixels (default: 640).
+        batch_size (int): Batch size (default: 1).
+        data (Path | str): Path to the dataset.yaml file (default: ROOT / "data/coco128.yaml").
+        device (str): CUDA device, e.g., '0' or 'cpu' (default: "").
+        half (bool): Use FP16 half-precision inference (default: False).
+        n (int): Timed calls per mode, best of 3 rounds (default: 20).
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): Latency and speedup over per-view TTA of each mode, and mAP50, mAP50-95 and
+            inference and NMS milliseconds per image of each post-processing.
+    """
+    device = select_device(device)
+    model = attempt_load(weights, device=device)  # fused
+    model.half() if half else model.float()
+    im = torch.rand(batch_size, 3, imgsz, imgsz, device=device, dtype=torch.half if half else torch.float)
+    modes = {"none": lambda: model(im), "views": lambda: model._forward_augment(im, batched=False)}
+    modes["batched"] = lambda: model._forward_augment(im, batched=True)
+    y = []
+    with torch.inference_mode():
+        for mode, f in modes.items():
+            f()  # warmup
+            t = float("inf")
+            for _ in range(3):
+                t0 = time.perf_counter()
+                for _ in range(n):
+                    f()
+                t = min(t, (time.perf_counter() - t0) / n * 1e3)
+            y.append([mode, round(t, 2)])
+    for x in y:
+        x.append(round(y[1][1] / x[1], 2))
+    latency = pd.DataFrame(y, columns=["Augment", "Latency (ms)", "Speedup"])
+    LOGGER.info(f"\nTTA latency of {weights} at {batch_size}x{imgsz} on {device.type} complete\n{latency}")
+
+    y = []
+    for name, kwargs in ("none", {}), ("NMS", {"augment": True}), ("WBF", {"augment": True, "wbf": True}):
+        result = val_det(data, weights, batch_size, imgsz, plots=False, device=device, half=half, **kwargs)
+        y.append([name, round(result[0][2], 4), round(result[0][3], 4), *(round(t, 2) for t in result[2][1:])])
+    accuracy = pd.DataFrame(y, columns=["Augment", "mAP50", "mAP50-95", "Inference (ms)", "NMS (ms)"])
+    LOGGER.info(f"\nTTA accuracy of {weights} on {data} complete\n{accuracy}")
+    return latency, accuracy
+
+
+def ensemble_report(weights, imgsz=640, batch_size=1, data=ROOT / "data/coco128.yaml", device="", half=False, n=20):
+    """
+    Compares an Ensemble of PyTorch detection `weights` with its first member, see models.experimental.Ensemble.
+
+    Latency is timed on random inputs for the first member alone and for the ensemble with members run serially and
+    concurrently. Accuracy and per-image times on the `data` val split are measured for the first member and for the
+    ensemble post-processed by one NMS over all members or by per-member NMS and Weighted Box Fusion (WBF).
+
+    Args:
+        weights (list[str]): PyTorch detection model weights of the ensemble members, e.g. [yolov5s.pt, yolov5m.pt].
+        imgsz (int): Inference size in pixels (default: 640).
+        batch_size (int): Batch size (default: 1).
+        data (Path | str): Path to the dataset.yaml file (default: ROOT / "data/coco128.yaml").
+        device (str): CUDA device, e.g., '0' or 'cpu' (default: "").
+        half (bool): Use FP16 half-precision inference (default: False).
+        n (int): Timed calls per mode, best of 3 rounds (default: 20).
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): Latency and speedup over the serial ensemble of each mode, and mAP50, mAP50-95
+            and inference and NMS milliseconds per image of each post-processing.
+    """
+    device = select_device(device)
+    model = attempt_load(weights, device=device)  # fused Ensemble
+    model.half() if half else model.float()
+    im = torch.rand(batch_size, 3, imgsz, imgsz, device=device, dtype=torch.half if half else torch.float)
+    y = []
+    with torch.inference_mode():
+        for mode, m, concurrent in ("single", model[0], None), ("serial", model, False), ("concurrent", model, True):
+            model.concurrent = concurrent
+            m(im)  # warmup
+            t = float("inf")
+            for _ in range(3):
+                t0 = time.perf_counter()
+                for _ in range(n):
+                    m(im)
+                t = min(t, (time.perf_counter() - t0) / n * 1e3)
+            y.append([mode, round(t, 2)])
+    for x in y:
+        x.append(round(y[1][1] / x[1], 2))
+    latency = pd.DataFrame(y, columns=["Model", "Latency (ms)", "Speedup"])
+    s = f"of {len(weights)} models at {batch_size}x{imgsz} on {device.type} complete"
+    LOGGER.info(f"\nEnsemble latency {s}\n{latency}")
+
+    y = []
+    for name, w, wbf in ("single", weights[0], False), ("NMS", weights, False), ("WBF", weights, True):
+        result = val_det(data, w, batch_size, imgsz, plots=False, device=device, half=half, wbf=wbf)
+        y.append([name, round(result[0][2], 4), round(result[0][3], 4), *(round(t, 2) for t in result[2][1:])])
+    accuracy = pd.DataFrame(y, columns=["Model", "mAP50", "mAP50-95", "Inference (ms)", "NMS (ms)"])
+    LOGGER.info(f"\nEnsemble accuracy of {weights} on {data} complete\n{accuracy}")
+    return latency, accuracy
+
+
 def parse_opt():
     """
     Parses command-line arguments for YOLOv5 model inference configuration.
@@ -233,6 +594,20 @@ def parse_opt():
         pt_only (bool): Test PyTorch only. This is a flag and defaults to False.
         hard_fail (bool | str): Throw an error on benchmark failure. Can be a boolean or a string representing a minimum
             metric floor, e.g., '0.29'. Defaults to False.
+        io (bool): Benchmark per-call zero-copy IO overhead of exported weights. This is a flag and defaults to False.
+        ov_throughput (bool): Benchmark OpenVINO THROUGHPUT mode FPS against synchronous inference. This is a flag and
+            defaults to False.
+        replicas (bool): Autotune multi-instance CPU replicas x threads for throughput. This is a flag and defaults to
+            False.
+        slo_ms (float): p95 latency objective in milliseconds for --replicas. Defaults to 100.0.
+        int8 (bool): Compare ONNX Runtime INT8 against FP32 accuracy and latency. This is a flag and defaults to False.
+        calib (int): Number of calibration images for --int8. Defaults to 300.
+        compile (bool): Compare eager, jit and inductor PyTorch latency. This is a flag and defaults to False.
+        channels_last (bool): Compare per-layer NCHW and channels_last PyTorch latency. This is a flag and defaults to
+            False.
+        tta (bool): Compare augmented inference latency and NMS and WBF accuracy. This is a flag and defaults to False.
+        ensemble (list[str], optional): Weights to ensemble with --weights, comparing serial and concurrent latency and
+            NMS and WBF accuracy. Defaults to None.
 
     Returns:
         argparse.Namespace: Parsed command-line arguments encapsulated in an argparse Namespace object.
@@ -251,6 +626,16 @@ def parse_opt():
     parser.add_argument("--test", action="store_true", help="test exports only")
     parser.add_argument("--pt-only", action="store_true", help="test PyTorch only")
     parser.add_argument("--hard-fail", nargs="?", const=True, default=False, help="Exception on error or < min metric")
+    parser.add_argument("--io", action="store_true", help="benchmark zero-copy IO overhead of exported weights")
+    parser.add_argument("--ov-throughput", action="store_true", help="benchmark OpenVINO async THROUGHPUT mode FPS")
+    parser.add_argument("--replicas", action="store_true", help="autotune CPU replicas x threads for throughput")
+    parser.add_argument("--slo-ms", type=float, default=100.0, help="p95 latency objective for --replicas (ms)")
+    parser.add_argument("--int8", action="store_true", help="compare ONNX Runtime INT8 against FP32 accuracy")
+    parser.add_argument("--calib", type=int, default=300, help="calibration images for --int8")
+    parser.add_argument("--compile", action="store_true", help="compare eager, jit and inductor PyTorch latency")
+    parser.add_argument("--channels-last", action="store_true", help="compare per-layer NCHW and NHWC latency")
+    parser.add_argument("--tta", action="store_true", help="compare augmented inference latency and NMS vs WBF mAP")
+    parser.add_argument("--ensemble", nargs="+", type=str, help="weights to ensemble with --weights, NMS vs WBF")
     opt = parser.parse_args()
     opt.data = check_yaml(opt.data)  # check YAML
     print_args(vars(opt))
@@ -29,10 +29,12 @@ Usage - formats:
 """
 
 import argparse
-import csv
 import os
 import platform
+import queue
 import sys
+import threading
+import time
 from pathlib import Path
 
 import torch
@@ -46,9 +48,19 @@ ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 from ultralytics.utils.plotting import Annotator, colors, save_one_box
 
 from models.common import DetectMultiBackend
-from utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadScreenshots, LoadStreams
+from models.experimental import Ensemble
+from models.yolo import Detect, DetectionModel
+from utils.dataloaders import (
+    IMG_FORMATS,
+    VID_FORMATS,
+    LoadImages,
+    LoadScreenshots,
+    LoadStreams,
+    benchmark_video_decode,
+)
 from utils.general import (
     LOGGER,
+    NMS_METHODS,
     Profile,
     check_file,
     check_img_size,
@@ -58,12 +70,70 @@ from utils.general import (
     cv2,
     increment_path,
     non_max_suppression,
+    non_max_suppression_wbf,
     print_args,
-    scale_boxes,
+    scale_boxes_batch,
     strip_optimizer,
     xyxy2xywh,
 )
 from utils.torch_utils import select_device, smart_inference_mode
+from utils.writers import ResultWriter
+
+_DONE = object()  # end of stream marker for prefetch() and BackgroundWorker queues
+
+
+def prefetch(iterable, depth=2):
+    """Runs `iterable` in a daemon thread `depth` items ahead of the consumer, re-raising its exceptions in order."""
+    q = queue.Queue(depth)
+
+    def produce():
+        """Puts every item, then the end marker or the exception that stopped the iteration."""
+        try:
+            for x in iterable:
+                q.put(x)
+            q.put(_DONE)
+        except Exception as e:
+            q.put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while (x := q.get()) is not _DONE:
+        if isinstance(x, Exception):
+            raise x
+        yield x
+
+
+class BackgroundWorker:
+    """Calls `fn` on submitted arguments in order in a daemon thread, at most `depth` calls behind the submitter."""
+
+    def __init__(self, fn, depth=2):
+        """Starts the worker thread for `fn`."""
+        self.fn = fn
+        self.queue = queue.Queue(depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Processes queued calls until the end marker, skipping all calls after the first exception."""
+        while (args := self.queue.get()) is not _DONE:
+            if self.error is None:
+                try:
+                    self.fn(*args)
+                except Exception as e:
+                    self.error = e
+
+    def __call__(self, *args):
+        """Queues fn(*args), blocking while `depth` calls are pending; raises an earlier exception of `fn`."""
+        if self.error is not None:
+            raise self.error
+        self.queue.put(args)
+
+    def close(self):
+        """Waits for all queued calls to finish and raises an exception of `fn` if there was one."""
+        self.queue.put(_DONE)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
 
 
 @smart_inference_mode()
@@ -86,6 +156,7 @@ def run(
     classes=None,  # filter by class: --class 0, or --class 0 2 3
     agnostic_nms=False,  # class-agnostic NMS
     augment=False,  # augmented inference
+    wbf=False,  # fuse augmented views and ensemble members with Weighted Box Fusion instead of joint NMS
     visualize=False,  # visualize features
     update=False,  # update all models
     project=ROOT / "runs/detect",  # save results to project/name
@@ -97,6 +168,21 @@ def run(
     half=False,  # use FP16 half-precision inference
     dnn=False,  # use OpenCV DNN for ONNX inference
     vid_stride=1,  # video frame-rate stride
+    head_filter=False,  # filter anchors by confidence inside the Detect head, before decoding (PyTorch models)
+    head_topk=0,  # keep at most this many anchors per detection level when head_filter is used (0 for all)
+    nms="greedy",  # NMS algorithm, greedy, merge, matrix or cluster
+    pipeline=False,  # load and post-process in threads while inference runs
+    batch_size=1,  # batch size for image, directory and video sources
+    save_jsonl=False,  # save results in JSON Lines format
+    async_write=False,  # write labels, CSV, JSONL and crops from a background thread
+    video_backend="opencv",  # video decoder for file sources, opencv or pyav
+    decode_threads=0,  # PyAV decoder threads (0 for FFmpeg default)
+    keyframes=False,  # decode keyframes only (PyAV)
+    benchmark_decode=False,  # benchmark video decode FPS of OpenCV vs PyAV and exit
+    ov_throughput=False,  # OpenVINO THROUGHPUT hint, batch images run in parallel async infer requests
+    compile_mode="",  # run PyTorch models compiled, jit (TorchScript freeze) or inductor (torch.compile)
+    compile_bucket=0,  # pad inputs to multiples of this many pixels to share compiled shapes (0 for exact shapes)
+    channels_last=False,  # NHWC PyTorch model and NHWC inputs from the loaders
 ):
     """
     Runs YOLOv5 detection inference on various sources like images, videos, directories, streams, etc.
@@ -121,6 +207,9 @@ def run(
         classes (list[int]): List of class indices to filter detections by. Default is None.
         agnostic_nms (bool): If True, perform class-agnostic non-max suppression. Default is False.
         augment (bool): If True, use augmented inference. Default is False.
+        wbf (bool): If True with `augment` or several `weights` on PyTorch models, suppress each augmented view and
+            ensemble member separately and fuse them with Weighted Box Fusion instead of one NMS over all of them.
+            Default is False.
         visualize (bool): If True, visualize feature maps. Default is False.
         update (bool): If True, update all models' weights. Default is False.
         project (str | Path): Directory to save results. Default is 'runs/detect'.
@@ -133,6 +222,33 @@ def run(
         half (bool): If True, use FP16 half-precision inference. Default is False.
         dnn (bool): If True, use OpenCV DNN backend for ONNX inference. Default is False.
         vid_stride (int): Stride for processing video frames, to skip frames between processing. Default is 1.
+        head_filter (bool): If True, threshold objectness logits inside the Detect head and decode only the anchors
+            above `conf_thres`. PyTorch models only, ignored with `augment`. Default is False.
+        head_topk (int): With `head_filter`, keep at most this many anchors per detection level. Default is 0 (all).
+        nms (str): NMS algorithm, 'greedy', 'merge', 'matrix' or 'cluster'. Default is 'greedy'.
+        pipeline (bool): If True, load and preprocess batch N+1 and annotate and save batch N-1 in background threads
+            while batch N runs inference. Not used with `view_img`. Default is False.
+        batch_size (int): Number of consecutive images or video frames of equal letterbox shape to infer together for
+            file, directory and video sources; streams are batched by source. Default is 1.
+        save_jsonl (bool): If True, save one JSON line of detections per image or frame to predictions.jsonl. Default is
+            False.
+        async_write (bool): If True, labels, CSV, JSONL and crops are written from a background thread. Default is
+            False.
+        video_backend (str): Video decoder for file sources, 'opencv' or 'pyav'. PyAV decodes with threads and seeks
+            over frames skipped by `vid_stride`. Default is 'opencv'.
+        decode_threads (int): Number of PyAV decoder threads, 0 to let FFmpeg choose. Default is 0.
+        keyframes (bool): If True, decode and run inference on keyframes only (fast scan, PyAV only). Default is False.
+        benchmark_decode (bool): If True, log LoadImages video decode FPS with OpenCV and PyAV for `source` and return
+            without running inference. Default is False.
+        ov_throughput (bool): If True, compile OpenVINO models with the THROUGHPUT hint and run the images of each batch
+            (`batch_size` or streams) in parallel async infer requests. Default is False.
+        compile_mode (str): Run PyTorch models compiled per input shape instead of eagerly, 'jit' to trace and freeze
+            TorchScript or 'inductor' for torch.compile; '' runs eagerly. Default is ''.
+        compile_bucket (int): With `compile_mode`, pad inputs to multiples of this many pixels so fewer shapes are
+            compiled, 0 for exact shapes. Default is 0.
+        channels_last (bool): If True, optimize PyTorch models with BaseModel.to_channels_last() and letterbox images
+            straight into NHWC input buffers. The opt-in oneDNN Conv+SiLU fusion (`fuse_act`) is not used. Default is
+            False.
 
     Returns:
         None
@@ -163,121 +279,161 @@ def run(
 
     # Load model
     device = select_device(device)
-    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
-    stride, names, pt = model.stride, model.names, model.pt
+    model = DetectMultiBackend(
+        weights,
+        device=device,
+        dnn=dnn,
+        data=data,
+        fp16=half,
+        zero_copy=True,  # outputs reach NMS before the next call overwrites them
+        ov_throughput=ov_throughput,
+        compile_mode=compile_mode,
+        compile_bucket=compile_bucket,
+        channels_last=channels_last,
+    )
+    stride, names, pt, nhwc = model.stride, model.names, model.pt, model.channels_last
     imgsz = check_img_size(imgsz, s=stride)  # check image size
+    if wbf and not (pt and (augment or isinstance(model.model, Ensemble))):
+        LOGGER.warning("WARNING ⚠️ --wbf requires --augment or several --weights with PyTorch models, ignoring")
+        wbf = False
+    if head_filter and pt and not augment and not compile_mode:  # augment needs all anchors, compiled shapes are static
+        for m in model.model.modules():
+            if isinstance(m, Detect):
+                m.conf_thres, m.topk = conf_thres, head_topk
 
     # Dataloader
+    if benchmark_decode:
+        benchmark_video_decode(source, imgsz, stride, vid_stride, decode_threads)
+        return
     bs = 1  # batch_size
     if webcam:
         view_img = check_imshow(warn=True)
-        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride, channels_last=nhwc)
         bs = len(dataset)
     elif screenshot:
-        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
+        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt, channels_last=nhwc)
     else:
-        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        dataset = LoadImages(
+            source,
+            img_size=imgsz,
+            stride=stride,
+            auto=pt,
+            vid_stride=vid_stride,
+            video_backend="pyav" if keyframes else video_backend,
+            decode_threads=decode_threads,
+            keyframes=keyframes,
+            channels_last=nhwc,
+        )
+        bs = batch_size
     vid_path, vid_writer = [None] * bs, [None] * bs
 
     # Run inference
-    model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *imgsz))  # warmup
+    if not (pt and compile_mode):  # compiled models warm up on each input shape actually inferred, see below
+        model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *imgsz))  # warmup
+    warm = set()  # letterboxed batch shapes compiled before their timed inference
     seen, windows, dt = 0, [], (Profile(device=device), Profile(device=device), Profile(device=device))
-    for path, im, im0s, vid_cap, s in dataset:
-        with dt[0]:
-            im = torch.from_numpy(im).to(model.device)
-            im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
-            im /= 255  # 0 - 255 to 0.0 - 1.0
-            if len(im.shape) == 3:
-                im = im[None]  # expand for batch dim
-            if model.xml and im.shape[0] > 1:
-                ims = torch.chunk(im, im.shape[0], 0)
-
-        # Inference
-        with dt[1]:
-            visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
-            if model.xml and im.shape[0] > 1:
-                pred = None
-                for image in ims:
-                    if pred is None:
-                        pred = model(image, augment=augment, visualize=visualize).unsqueeze(0)
-                    else:
-                        pred = torch.cat((pred, model(image, augment=augment, visualize=visualize).unsqueeze(0)), dim=0)
-                pred = [pred, None]
-            else:
-                pred = model(im, augment=augment, visualize=visualize)
-        # NMS
-        with dt[2]:
-            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
-
-        # Second-stage classifier (optional)
-        # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
-
-        # Define the path for the CSV file
-        csv_path = save_dir / "predictions.csv"
-
-        # Create or append to the CSV file
-        def write_to_csv(image_name, prediction, confidence):
-            """Writes prediction data for an image to a CSV file, appending if the file exists."""
-            data = {"Image Name": image_name, "Prediction": prediction, "Confidence": confidence}
-            file_exists = os.path.isfile(csv_path)
-            with open(csv_path, mode="a", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=data.keys())
-                if not file_exists:
-                    writer.writeheader()
-                writer.writerow(data)
+    if pipeline and view_img:
+        LOGGER.warning("WARNING ⚠️ --pipeline is not compatible with --view-img, running sequentially")
+        pipeline = False
+
+    def read():
+        """
+        Yields batches of images as lists of (path, im, im0, video, s, frame, mode), with the dataset state each image
+        was read with; file sources are grouped into up to `bs` consecutive images of equal letterbox shape.
+        """
+        if webcam:  # streams are already batched
+            for path, im, im0s, _, s in dataset:
+                yield [(p, x, im0, None, s, dataset.count, dataset.mode) for p, x, im0 in zip(path, im, im0s)]
+            return
+        batch = []
+        for path, im, im0, vid_cap, s in dataset:
+            video = vid_cap and (
+                vid_cap.get(cv2.CAP_PROP_FPS),
+                int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            )  # read now, the capture is released at the end of the video
+            if batch and (len(batch) == bs or batch[0][1].shape != im.shape):
+                yield batch
+                batch = []
+            batch.append((path, im, im0, video, s, getattr(dataset, "frame", 0), dataset.mode))
+        if batch:
+            yield batch
+
+    def load():
+        """Yields preprocessed batches as (paths, im, im0s, videos, strings, frames, modes)."""
+        for batch in read():
+            paths, ims, *meta = zip(*batch)
+            with dt[0]:
+                im = model.preprocess(ims)  # stack into a reused input buffer, uint8 to 0.0-1.0 fp16/32
+            yield paths, im, *meta
+
+    # Labels, CSV, JSONL and crops are buffered and written in bulk
+    results = ResultWriter(background=async_write)
+    csv_path, jsonl_path = save_dir / "predictions.csv", save_dir / "predictions.jsonl"
+
+    def process(paths, im, im0s, videos, strings, frames, modes, pred, t):
+        """Rescales, annotates, shows and saves the detections of one batch."""
+        nonlocal seen
+        s = strings[0]
+        # Rescale boxes of all images from img_size to im0 size in one op
+        n = [len(det) for det in pred]  # detections per image
+        d = pred[0].device
+        index = torch.arange(len(n), device=d).repeat_interleave(torch.tensor(n, device=d))  # image of each detection
+        det = scale_boxes_batch(im.shape[2:], torch.cat(pred), index, [x.shape for x in im0s])
+        det[:, :4] = det[:, :4].round()
+        pred = det.split(n)
 
         # Process predictions
         for i, det in enumerate(pred):  # per image
             seen += 1
-            if webcam:  # batch_size >= 1
-                p, im0, frame = path[i], im0s[i].copy(), dataset.count
+            im0, video, frame, mode = im0s[i].copy(), videos[i], frames[i], modes[i]
+            if webcam:  # one line per batch of streams
                 s += f"{i}: "
-            else:
-                p, im0, frame = path, im0s.copy(), getattr(dataset, "frame", 0)
+            else:  # one line per image or video frame
+                s = strings[i]
+            j = i if webcam else 0  # video writer slot
 
-            p = Path(p)  # to Path
+            p = Path(paths[i])  # to Path
             save_path = str(save_dir / p.name)  # im.jpg
-            txt_path = str(save_dir / "labels" / p.stem) + ("" if dataset.mode == "image" else f"_{frame}")  # im.txt
+            txt_path = str(save_dir / "labels" / p.stem) + ("" if mode == "image" else f"_{frame}")  # im.txt
             s += "{:g}x{:g} ".format(*im.shape[2:])  # print string
             gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
             imc = im0.copy() if save_crop else im0  # for save_crop
             annotator = Annotator(im0, line_width=line_thickness, example=str(names))
             if len(det):
-                # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
-
                 # Print results
                 for c in det[:, 5].unique():
                     n = (det[:, 5] == c).sum()  # detections per class
                     s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
 
                 # Write results
-                for *xyxy, conf, cls in reversed(det):
-                    c = int(cls)  # integer class
-                    label = names[c] if hide_conf else f"{names[c]}"
-                    confidence = float(conf)
-                    confidence_str = f"{confidence:.2f}"
-
-                    if save_csv:
-                        write_to_csv(p.name, label, confidence_str)
-
-                    if save_txt:  # Write to file
-                        if save_format == 0:
-                            coords = (
-                                (xyxy2xywh(torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()
-                            )  # normalized xywh
-                        else:
-                            coords = (torch.tensor(xyxy).view(1, 4) / gn).view(-1).tolist()  # xyxy
-                        line = (cls, *coords, conf) if save_conf else (cls, *coords)  # label format
-                        with open(f"{txt_path}.txt", "a") as f:
-                            f.write(("%g " * len(line)).rstrip() % line + "\n")
-
-                    if save_img or save_crop or view_img:  # Add bbox to image
+                d = det.flip(0)  # highest confidence last, as drawn
+                if save_csv:
+                    rows = [(p.name, names[int(c)], f"{conf:.2f}") for conf, c in d[:, 4:6].tolist()]
+                    results.write_csv(csv_path, rows, header=("Image Name", "Prediction", "Confidence"))
+                if save_txt:  # Write to file
+                    if save_format == 0:
+                        coords = xyxy2xywh(d[:, :4]) / gn  # normalized xywh
+                    else:
+                        coords = d[:, :4] / gn  # xyxy
+                    lines = torch.cat((d[:, 5:6], coords, d[:, 4:5]) if save_conf else (d[:, 5:6], coords), 1)  # format
+                    lines = [("%g " * len(x)).rstrip() % tuple(x) + "\n" for x in lines.tolist()]
+                    results.write(f"{txt_path}.txt", lines)
+
+                if save_img or save_crop or view_img:
+                    for *xyxy, conf, cls in d:
                         c = int(cls)  # integer class
                         label = None if hide_labels else (names[c] if hide_conf else f"{names[c]} {conf:.2f}")
-                        annotator.box_label(xyxy, label, color=colors(c, True))
-                    if save_crop:
-                        save_one_box(xyxy, imc, file=save_dir / "crops" / names[c] / f"{p.stem}.jpg", BGR=True)
+                        annotator.box_label(xyxy, label, color=colors(c, True))  # Add bbox to image
+                        if save_crop:
+                            crop = save_one_box(xyxy, imc, BGR=True, save=False)
+                            results.crop(save_dir / "crops" / names[c] / f"{p.stem}.jpg", crop, BGR=True)
+            if save_jsonl:
+                boxes = [
+                    {"class": int(c), "name": names[int(c)], "confidence": round(conf, 5), "box": xyxy}
+                    for *xyxy, conf, c in det[:, :6].tolist()
+                ]
+                results.write_jsonl(jsonl_path, {"image": p.name, "frame": frame, "detections": boxes})
 
             # Stream results
             im0 = annotator.result()
@@ -291,25 +447,69 @@ def run(
 
             # Save results (image with detections)
             if save_img:
-                if dataset.mode == "image":
+                if mode == "image":
                     cv2.imwrite(save_path, im0)
                 else:  # 'video' or 'stream'
-                    if vid_path[i] != save_path:  # new video
-                        vid_path[i] = save_path
-                        if isinstance(vid_writer[i], cv2.VideoWriter):
-                            vid_writer[i].release()  # release previous video writer
-                        if vid_cap:  # video
-                            fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                            w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                            h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    if vid_path[j] != save_path:  # new video
+                        vid_path[j] = save_path
+                        if isinstance(vid_writer[j], cv2.VideoWriter):
+                            vid_writer[j].release()  # release previous video writer
+                        if video:  # video
+                            fps, w, h = video
                         else:  # stream
                             fps, w, h = 30, im0.shape[1], im0.shape[0]
                         save_path = str(Path(save_path).with_suffix(".mp4"))  # force *.mp4 suffix on results videos
-                        vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
-                    vid_writer[i].write(im0)
+                        vid_writer[j] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+                    vid_writer[j].write(im0)
+
+            # Print time (inference-only, per batch)
+            if not webcam:
+                LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{t * 1e3:.1f}ms")
+        if webcam:
+            LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{t * 1e3:.1f}ms")
+
+    # Load batch N+1 and process batch N-1 in threads while batch N infers
+    if pipeline:
+        model.inputs.slots = 4  # batch N inferring, N+1 and N+2 queued, N+3 loading
+    batches = prefetch(load()) if pipeline else load()
+    writer = BackgroundWorker(smart_inference_mode()(process)) if pipeline else None  # inference mode is per thread
+    t0 = time.time()
+    for paths, im, *meta in batches:
+        # Inference
+        compiled = pt and compile_mode and not (augment or visualize or wbf)  # these run eagerly
+        if compiled and im.shape not in warm:  # compile each new shape outside the timed inference
+            warm.add(im.shape)
+            model.warmup(imgsz=im.shape)
+        with dt[1]:
+            visualize = increment_path(save_dir / Path(paths[0]).stem, mkdir=True) if visualize else False
+            pred = model(im, augment=augment, visualize=visualize, sources=wbf)  # batch limits split internally
+        # NMS
+        with dt[2]:
+            if wbf:  # one block of rows per augmented view and ensemble member
+                pred, sources = pred  # rows of each Ensemble member, None for the views of augmented inference
+                sources = sources or len(DetectionModel.tta_scales)
+                pred = non_max_suppression_wbf(
+                    pred, sources, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det, method=nms
+                )
+            else:
+                pred = non_max_suppression(
+                    pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det, method=nms
+                )
 
-        # Print time (inference-only)
-        LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{dt[1].dt * 1e3:.1f}ms")
+        # Second-stage classifier (optional)
+        # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
+
+        if writer:
+            writer(paths, im, *meta, pred, dt[1].dt)
+        else:
+            process(paths, im, *meta, pred, dt[1].dt)
+    if writer:
+        writer.close()
+    results.close()
+    LOGGER.info(f"Throughput: {seen} images in {time.time() - t0:.2f}s, {seen / (time.time() - t0):.1f} FPS")
+    if webcam:
+        LOGGER.info(f"Streams: {dataset.summary()}")
+    LOGGER.info(f"Inputs: {model.inputs.summary()}")
 
     # Print results
     t = tuple(x.t / seen * 1e3 for x in dt)  # speeds per image
@@ -343,6 +543,8 @@ def parse_opt():
         --classes (list[int], optional): List of classes to filter results by, e.g., '--classes 0 2 3'. Defaults to None.
         --agnostic-nms (bool, optional): Flag for class-agnostic NMS. Defaults to False.
         --augment (bool, optional): Flag for augmented inference. Defaults to False.
+        --wbf (bool, optional): Flag to fuse --augment views and ensemble --weights with Weighted Box Fusion instead
+            of NMS. Defaults to False.
         --visualize (bool, optional): Flag for visualizing features. Defaults to False.
         --update (bool, optional): Flag to update all models in the model directory. Defaults to False.
         --project (str, optional): Directory to save results. Defaults to ROOT / 'runs/detect'.
@@ -355,6 +557,27 @@ def parse_opt():
         --dnn (bool, optional): Flag to use OpenCV DNN for ONNX inference. Defaults to False.
         --vid-stride (int, optional): Video frame-rate stride, determining the number of frames to skip in between
             consecutive frames. Defaults to 1.
+        --head-filter (bool, optional): Flag to filter anchors by confidence inside the Detect head before decoding.
+            Defaults to False.
+        --head-topk (int, optional): Maximum anchors kept per detection level with --head-filter. Defaults to 0 (all).
+        --nms (str, optional): NMS algorithm, 'greedy', 'merge', 'matrix' or 'cluster'. Defaults to 'greedy'.
+        --pipeline (bool, optional): Flag to load and post-process in threads while inference runs. Defaults to False.
+        --batch-size (int, optional): Batch size for image, directory and video sources. Defaults to 1.
+        --save-jsonl (bool, optional): Flag to save results in JSON Lines format. Defaults to False.
+        --async-write (bool, optional): Flag to write labels, CSV, JSONL and crops from a background thread. Defaults
+            to False.
+        --video-backend (str, optional): Video decoder for file sources, 'opencv' or 'pyav'. Defaults to 'opencv'.
+        --decode-threads (int, optional): Number of PyAV decoder threads, 0 for FFmpeg default. Defaults to 0.
+        --keyframes (bool, optional): Flag to decode keyframes only (PyAV). Defaults to False.
+        --benchmark-decode (bool, optional): Flag to benchmark video decode FPS of OpenCV vs PyAV and exit. Defaults
+            to False.
+        --ov-throughput (bool, optional): Flag to run OpenVINO batches in parallel async infer requests with the
+            THROUGHPUT hint. Defaults to False.
+        --compile-mode (str, optional): Run PyTorch models compiled, 'jit' or 'inductor'. Defaults to '' (eager).
+        --compile-bucket (int, optional): Pad inputs to multiples of this many pixels to share compiled shapes.
+            Defaults to 0 (exact shapes).
+        --channels-last (bool, optional): Flag to run PyTorch models and inputs in channels_last (NHWC) memory format.
+            Defaults to False.
 
     Returns:
         argparse.Namespace: Parsed command-line arguments as an argparse.Namespace object.
@@ -389,6 +612,7 @@ def parse_opt():
     parser.add_argument("--classes", nargs="+", type=int, help="filter by class: --classes 0, or --classes 0 2 3")
     parser.add_argument("--agnostic-nms", action="store_true", help="class-agnostic NMS")
     parser.add_argument("--augment", action="store_true", help="augmented inference")
+    parser.add_argument("--wbf", action="store_true", help="fuse --augment views and ensembles with WBF")
     parser.add_argument("--visualize", action="store_true", help="visualize features")
     parser.add_argument("--update", action="store_true", help="update all models")
     parser.add_argument("--project", default=ROOT / "runs/detect", help="save results to project/name")
@@ -400,6 +624,21 @@ def parse_opt():
     parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
     parser.add_argument("--dnn", action="store_true", help="use OpenCV DNN for ONNX inference")
     parser.add_argument("--vid-stride", type=int, default=1, help="video frame-rate stride")
+    parser.add_argument("--head-filter", action="store_true", help="filter anchors by conf in Detect head pre-decode")
+    parser.add_argument("--head-topk", type=int, default=0, help="max anchors per level with --head-filter, 0 for all")
+    parser.add_argument("--nms", default="greedy", choices=NMS_METHODS, help="NMS algorithm")
+    parser.add_argument("--pipeline", action="store_true", help="load and post-process in threads during inference")
+    parser.add_argument("--batch-size", type=int, default=1, help="batch size for image, directory and video sources")
+    parser.add_argument("--save-jsonl", action="store_true", help="save results in JSON Lines format")
+    parser.add_argument("--async-write", action="store_true", help="write labels, CSV, JSONL, crops in a thread")
+    parser.add_argument("--video-backend", default="opencv", choices=("opencv", "pyav"), help="video decoder")
+    parser.add_argument("--decode-threads", type=int, default=0, help="PyAV decoder threads, 0 for FFmpeg default")
+    parser.add_argument("--keyframes", action="store_true", help="decode keyframes only (PyAV)")
+    parser.add_argument("--benchmark-decode", action="store_true", help="benchmark OpenCV vs PyAV decode FPS and exit")
+    parser.add_argument("--ov-throughput", action="store_true", help="OpenVINO THROUGHPUT hint with async requests")
+    parser.add_argument("--compile-mode", default="", choices=("", "jit", "inductor"), help="compiled PyTorch mode")
+    parser.add_argument("--compile-bucket", type=int, default=0, help="pad to multiples of this for --compile-mode")
+    parser.add_argument("--channels-last", action="store_true", help="channels_last (NHWC) PyTorch model and inputs")
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     print_args(vars(opt))
@@ -23,6 +23,7 @@ Requirements:
 
 Usage:
     $ python export.py --weights yolov5s.pt --include torchscript onnx openvino engine coreml tflite ...
+    $ python export.py --weights yolov5s.pt --include onnx --int8 --data coco128.yaml  # ONNX Runtime INT8 QDQ
 
 Inference:
     $ python detect.py --weights yolov5s.pt                 # PyTorch
@@ -381,6 +382,95 @@ def export_onnx(model, im, file, opset, dynamic, simplify, prefix=colorstr("ONNX
     return f, model_onnx
 
 
+@try_export
+def export_onnx_int8(file, im, data, calib=300, prefix=colorstr("ONNX INT8:")):
+    """
+    Quantize an exported YOLOv5 ONNX model to INT8 with ONNX Runtime post-training static quantization.
+
+    Activation ranges are calibrated on `calib` images from the `data` train split loaded with `create_dataloader()`.
+    The model is saved in QDQ format (QuantizeLinear/DequantizeLinear pairs around INT8 weights and activations), which
+    ONNX Runtime CPU fuses into integer kernels and which `DetectMultiBackend` loads like any other ONNX model. The
+    Detect head box decoding after the last convolutions (grid and anchor arithmetic) is kept in FP32 because
+    quantizing pixel coordinates costs far more accuracy than it saves time.
+
+    Args:
+        file (Path): Path of the exported FP32 model, the ONNX file `file.with_suffix(".onnx")` must exist.
+        im (torch.Tensor): Export input tensor, its batch size and image size are used for calibration.
+        data (str): Path to the dataset YAML file providing calibration images.
+        calib (int): Number of calibration images (default: 300).
+        prefix (str): Prefix string for logging (default: "ONNX INT8:").
+
+    Returns:
+        (str, None): The INT8 ONNX model path, saved as `*-int8.onnx`, and None.
+
+    Example:
+        ```python
+        $ python export.py --weights yolov5s.pt --include onnx --int8 --calib 300
+        $ python val.py --weights yolov5s-int8.onnx
+        ```
+    """
+    check_requirements(("onnx>=1.12.0", "onnxruntime"))
+    import numpy as np
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    from utils.dataloaders import create_dataloader
+
+    LOGGER.info(f"\n{prefix} starting quantization with onnxruntime {onnxruntime.__version__}...")
+    f_onnx = file.with_suffix(".onnx")
+    f = str(file.with_name(f"{file.stem}-int8.onnx"))
+    model_onnx = onnx.load(f_onnx)
+
+    # Keep nodes with no convolution downstream (Detect box decoding) in FP32, graph nodes are topologically sorted
+    consumers = {}
+    for node in model_onnx.graph.node:
+        for x in node.input:
+            consumers.setdefault(x, []).append(node)
+    conv = {}  # node name -> a Conv follows
+    for node in reversed(model_onnx.graph.node):
+        conv[node.name] = any(c.op_type == "Conv" or conv[c.name] for x in node.output for c in consumers.get(x, []))
+    exclude = [n.name for n in model_onnx.graph.node if n.op_type != "Conv" and not conv[n.name]]
+
+    class Reader(CalibrationDataReader):
+        """Feeds up to `calib` letterboxed dataset images, normalized to 0-1 in batches of the export batch size."""
+
+        def __init__(self):
+            """Creates the calibration dataloader."""
+            dataset = check_dataset(check_yaml(data))
+            b, _, h, w = im.shape
+            self.loader = iter(
+                create_dataloader(dataset["train"], max(h, w), b, 32, pad=0.5, rect=False, workers=0, prefix=prefix)[0]
+            )
+            self.batches = max(calib // b, 1)
+
+        def get_next(self):
+            """Returns the next {"images": array} input, or None after `calib` images."""
+            if self.batches == 0:
+                return None
+            self.batches -= 1
+            x = next(self.loader, None)
+            return None if x is None or x[0].shape != im.shape else {"images": x[0].numpy().astype(np.float32) / 255}
+
+    quantize_static(
+        f_onnx,
+        f,
+        Reader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=exclude,
+    )
+
+    # Metadata
+    model_int8 = onnx.load(f)
+    del model_int8.metadata_props[:]
+    model_int8.metadata_props.extend(model_onnx.metadata_props)  # stride, names
+    onnx.save(model_int8, f)
+    return f, None
+
+
 @try_export
 def export_openvino(file, metadata, half, int8, data, prefix=colorstr("OpenVINO:")):
     """
@@ -638,10 +728,9 @@ def export_engine(
         import tensorrt as trt
 
     if trt.__version__[0] == "7":  # TensorRT 7 handling https://github.com/ultralytics/yolov5/issues/6012
-        grid = model.model[-1].anchor_grid
-        model.model[-1].anchor_grid = [a[..., :1, :1, :] for a in grid]
+        model.model[-1].broadcast_anchors = True  # Detect.forward() rebuilds anchor_grid, slice it there
         export_onnx(model, im, file, 12, dynamic, simplify)  # opset 12
-        model.model[-1].anchor_grid = grid
+        model.model[-1].broadcast_anchors = False
     else:  # TensorRT >= 8
         check_version(trt.__version__, "8.0.0", hard=True)  # require tensorrt>=8.0.0
         export_onnx(model, im, file, 12, dynamic, simplify)  # opset 12
@@ -1284,7 +1373,8 @@ def run(
     inplace=False,  # set YOLOv5 Detect() inplace=True
     keras=False,  # use Keras
     optimize=False,  # TorchScript: optimize for mobile
-    int8=False,  # CoreML/TF INT8 quantization
+    int8=False,  # CoreML/TF/OpenVINO/ONNX INT8 quantization
+    calib=300,  # ONNX INT8: calibration images
     per_tensor=False,  # TF per tensor quantization
     dynamic=False,  # ONNX/TF/TensorRT: dynamic axes
     cache="",  # TensorRT: timing cache path
@@ -1314,7 +1404,8 @@ def run(
         inplace (bool): Set the YOLOv5 Detect() module inplace=True. Default is False.
         keras (bool): Flag to use Keras for TensorFlow SavedModel export. Default is False.
         optimize (bool): Optimize TorchScript model for mobile deployment. Default is False.
-        int8 (bool): Apply INT8 quantization for CoreML or TensorFlow models. Default is False.
+        int8 (bool): Apply INT8 quantization for CoreML, TensorFlow, OpenVINO or ONNX models. Default is False.
+        calib (int): Number of dataset images to calibrate ONNX INT8 quantization on. Default is 300.
         per_tensor (bool): Apply per tensor quantization for TensorFlow models. Default is False.
         dynamic (bool): Enable dynamic axes for ONNX, TensorFlow, or TensorRT exports. Default is False.
         cache (str): TensorRT timing cache path. Default is an empty string.
@@ -1419,6 +1510,8 @@ def run(
         f[1], _ = export_engine(model, im, file, half, dynamic, simplify, workspace, verbose, cache)
     if onnx or xml:  # OpenVINO requires ONNX
         f[2], _ = export_onnx(model, im, file, opset, dynamic, simplify)
+        if onnx and int8:  # ONNX Runtime INT8
+            f.append(export_onnx_int8(file, im, data, calib)[0])
     if xml:  # OpenVINO
         f[3], _ = export_openvino(file, metadata, half, int8, data)
     if coreml:  # CoreML
@@ -1508,7 +1601,8 @@ def parse_opt(known=False):
     parser.add_argument("--inplace", action="store_true", help="set YOLOv5 Detect() inplace=True")
     parser.add_argument("--keras", action="store_true", help="TF: use Keras")
     parser.add_argument("--optimize", action="store_true", help="TorchScript: optimize for mobile")
-    parser.add_argument("--int8", action="store_true", help="CoreML/TF/OpenVINO INT8 quantization")
+    parser.add_argument("--int8", action="store_true", help="CoreML/TF/OpenVINO/ONNX INT8 quantization")
+    parser.add_argument("--calib", type=int, default=300, help="ONNX INT8: calibration images")
     parser.add_argument("--per-tensor", action="store_true", help="TF per-tensor quantization")
     parser.add_argument("--dynamic", action="store_true", help="ONNX/TF/TensorRT: dynamic axes")
     parser.add_argument("--cache", type=str, default="", help="TensorRT: timing cache file path")
@@ -6,7 +6,6 @@ import contextlib
 import json
 import math
 import platform
-import warnings
 import zipfile
 from collections import OrderedDict, namedtuple
 from copy import copy
@@ -49,12 +48,12 @@ from utils.general import (
     is_jupyter,
     make_divisible,
     non_max_suppression,
-    scale_boxes,
+    scale_boxes_batch,
     xywh2xyxy,
     xyxy2xywh,
     yaml_load,
 )
-from utils.torch_utils import copy_attr, smart_inference_mode
+from utils.torch_utils import InputBuffers, copy_attr, smart_inference_mode
 
 
 def autopad(k, p=None, d=1):
@@ -90,6 +89,13 @@ class Conv(nn.Module):
         """Applies a fused convolution and activation function to the input tensor `x`."""
         return self.act(self.conv(x))
 
+    def forward_onednn(self, x):
+        """Applies the fused convolution and SiLU activation to CPU tensor `x` as a single oneDNN kernel."""
+        c = self.conv
+        return torch.ops.mkldnn._convolution_pointwise(
+            x, c.weight, c.bias, c.padding, c.stride, c.dilation, c.groups, "swish", [], ""
+        )
+
 
 class DWConv(Conv):
     """Implements a depth-wise convolution layer with optional activation for efficient spatial filtering."""
@@ -180,6 +186,10 @@ class Bottleneck(nn.Module):
         """
         return x + self.cv2(self.cv1(x)) if self.add else self.cv2(self.cv1(x))
 
+    def forward_inplace(self, x):
+        """Adds the shortcut in place to the freshly allocated cv2 output, saving an allocation (inference only)."""
+        return self.cv2(self.cv1(x)).add_(x)
+
 
 class BottleneckCSP(nn.Module):
     """CSP bottleneck layer for feature extraction with cross-stage partial connections and optional shortcuts."""
@@ -309,9 +319,7 @@ class SPP(nn.Module):
         tensor.
         """
         x = self.cv1(x)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")  # suppress torch 1.9.0 max_pool2d() warning
-            return self.cv2(torch.cat([x] + [m(x) for m in self.m], 1))
+        return self.cv2(torch.cat([x] + [m(x) for m in self.m], 1))
 
 
 class SPPF(nn.Module):
@@ -333,11 +341,9 @@ class SPPF(nn.Module):
     def forward(self, x):
         """Processes input through a series of convolutions and max pooling operations for feature extraction."""
         x = self.cv1(x)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")  # suppress torch 1.9.0 max_pool2d() warning
-            y1 = self.m(x)
-            y2 = self.m(y1)
-            return self.cv2(torch.cat((x, y1, y2, self.m(y2)), 1))
+        y1 = self.m(x)
+        y2 = self.m(y1)
+        return self.cv2(torch.cat((x, y1, y2, self.m(y2)), 1))
 
 
 class Focus(nn.Module):
@@ -459,8 +465,42 @@ class Concat(nn.Module):
 class DetectMultiBackend(nn.Module):
     """YOLOv5 MultiBackend class for inference on various backends including PyTorch, ONNX, TensorRT, and more."""
 
-    def __init__(self, weights="yolov5s.pt", device=torch.device("cpu"), dnn=False, data=None, fp16=False, fuse=True):
-        """Initializes DetectMultiBackend with support for various inference backends, including PyTorch and ONNX."""
+    def __init__(
+        self,
+        weights="yolov5s.pt",
+        device=torch.device("cpu"),
+        dnn=False,
+        data=None,
+        fp16=False,
+        fuse=True,
+        zero_copy=False,
+        ov_throughput=False,
+        compile_mode="",
+        compile_bucket=0,
+        channels_last=False,
+    ):
+        """
+        Initializes DetectMultiBackend with support for various inference backends, including PyTorch and ONNX.
+
+        With `zero_copy`, ONNX Runtime binds the input tensor and preallocated output tensors through IO binding, and
+        OpenVINO runs one reused infer request on a shared input tensor and returns views of its output tensors. Outputs
+        are then overwritten by the next call, so it is opt-in for callers that consume or copy each output before the
+        next call, e.g. detect.py and val.py running NMS right after inference. With `ov_throughput`, OpenVINO compiles
+        with the THROUGHPUT performance hint and runs the parts of a batch in parallel infer requests of an
+        AsyncInferQueue.
+
+        With `compile_mode`, PyTorch models run compiled instead of eagerly layer by layer: "jit" traces and freezes a
+        TorchScript graph and "inductor" uses torch.compile with static shapes. Each input shape is compiled on first
+        use and cached: jit keeps the 8 most recently used shapes, inductor relies on dynamo's own cache, which runs
+        shapes beyond torch._dynamo.config.cache_size_limit (default 8) eagerly. With `compile_bucket` > 0, inputs are
+        padded bottom-right with letterbox gray to multiples of `compile_bucket` pixels, so varying rectangular batches
+        share a few compiled shapes; the padding adds predictions over the gray border, as letterboxing does.
+        Detect objectness pre-filtering is not compiled.
+
+        With `channels_last`, PyTorch models are optimized with BaseModel.to_channels_last() and preprocess() returns
+        NHWC input tensors, filled without a transpose from the CHW views of HWC images that the loaders yield with
+        `channels_last=True`.
+        """
         #   PyTorch:              weights = *.pt
         #   TorchScript:                    *.torchscript
         #   ONNX Runtime:                   *.onnx
@@ -479,8 +519,10 @@ class DetectMultiBackend(nn.Module):
         w = str(weights[0] if isinstance(weights, list) else weights)
         pt, jit, onnx, xml, engine, coreml, saved_model, pb, tflite, edgetpu, tfjs, paddle, triton = self._model_type(w)
         fp16 &= pt or jit or onnx or engine or triton  # FP16
+        channels_last &= pt  # NHWC PyTorch model and inputs
         nhwc = coreml or saved_model or pb or tflite or edgetpu  # BHWC formats (vs torch BCWH)
         stride = 32  # default stride
+        max_batch = 0 if pt or triton else 1  # largest batch per forward call, 0 for any batch size
         cuda = torch.cuda.is_available() and device.type != "cpu"  # use CUDA
         if not (pt or triton):
             w = attempt_download(w)  # download if not local
@@ -490,7 +532,15 @@ class DetectMultiBackend(nn.Module):
             stride = max(int(model.stride.max()), 32)  # model stride
             names = model.module.names if hasattr(model, "module") else model.names  # get class names
             model.half() if fp16 else model.float()
+            if channels_last:
+                for m in model if isinstance(model, nn.ModuleList) else [model]:  # Ensemble members
+                    m.to_channels_last()
             self.model = model  # explicitly assign for to(), cpu(), cuda(), half()
+            if compile_mode:
+                assert compile_mode in {"jit", "inductor"}, f"invalid compile_mode {compile_mode}, use jit or inductor"
+                compiled = OrderedDict()  # input shape -> jit model (least recently used first) or None for inductor
+                if compile_mode == "inductor":
+                    inductor = torch.compile(model, dynamic=False)  # one graph per shape, guarded and cached by dynamo
         elif jit:  # TorchScript
             LOGGER.info(f"Loading {w} for TorchScript inference...")
             extra_files = {"config.txt": ""}  # model metadata
@@ -502,6 +552,7 @@ class DetectMultiBackend(nn.Module):
                     object_hook=lambda d: {int(k) if k.isdigit() else k: v for k, v in d.items()},
                 )
                 stride, names = int(d["stride"]), d["names"]
+                max_batch = d["shape"][0] if "shape" in d else 1  # traced batch size
         elif dnn:  # ONNX OpenCV DNN
             LOGGER.info(f"Loading {w} for ONNX OpenCV DNN inference...")
             check_requirements("opencv-python>=4.5.4")
@@ -514,13 +565,20 @@ class DetectMultiBackend(nn.Module):
             providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if cuda else ["CPUExecutionProvider"]
             session = onnxruntime.InferenceSession(w, providers=providers)
             output_names = [x.name for x in session.get_outputs()]
+            if zero_copy:
+                io_binding = session.io_binding()
+                ort_device = "cuda" if "CUDAExecutionProvider" in session.get_providers() else "cpu"
+                ort_outputs = OrderedDict()  # input shape -> output tensors bound to the session, least recent first
+                ort_bound = None  # (shape, address) of the bound input, rebound only when it changes
+            max_batch = session.get_inputs()[0].shape[0]  # str for --dynamic exports
+            max_batch = max_batch if isinstance(max_batch, int) else 0
             meta = session.get_modelmeta().custom_metadata_map  # metadata
             if "stride" in meta:
                 stride, names = int(meta["stride"]), eval(meta["names"])
         elif xml:  # OpenVINO
             LOGGER.info(f"Loading {w} for OpenVINO inference...")
             check_requirements("openvino>=2023.0")  # requires openvino-dev: https://pypi.org/project/openvino-dev/
-            from openvino.runtime import Core, Layout, get_batch
+            from openvino.runtime import AsyncInferQueue, Core, Layout, Tensor, get_batch
 
             core = Core()
             if not Path(w).is_file():  # if not *.xml
@@ -531,7 +589,16 @@ class DetectMultiBackend(nn.Module):
             batch_dim = get_batch(ov_model)
             if batch_dim.is_static:
                 batch_size = batch_dim.get_length()
-            ov_compiled_model = core.compile_model(ov_model, device_name="AUTO")  # AUTO selects best available device
+            max_batch = batch_size if batch_dim.is_static else 0
+            config = {"PERFORMANCE_HINT": "THROUGHPUT"} if ov_throughput else {}  # THROUGHPUT: one stream per request
+            ov_compiled_model = core.compile_model(ov_model, device_name="AUTO", config=config)  # AUTO selects device
+            ov_queue = None
+            if ov_throughput:
+                nireq = ov_compiled_model.get_property("OPTIMAL_NUMBER_OF_INFER_REQUESTS")
+                ov_queue = AsyncInferQueue(ov_compiled_model, nireq)
+                LOGGER.info(f"OpenVINO THROUGHPUT mode with {nireq} async infer requests")
+            ov_request = ov_compiled_model.create_infer_request()  # reused, owns the output tensors
+            ov_bound = None  # (shape, address) of the shared input tensor set on the request
             stride, names = self._load_metadata(Path(w).with_suffix(".yaml"))  # load metadata
         elif engine:  # TensorRT
             LOGGER.info(f"Loading {w} for TensorRT inference...")
@@ -581,6 +648,7 @@ class DetectMultiBackend(nn.Module):
                 bindings[name] = Binding(name, dtype, shape, im, int(im.data_ptr()))
             binding_addrs = OrderedDict((n, d.ptr) for n, d in bindings.items())
             batch_size = bindings["images"].shape[0]  # if dynamic, this is instead max batch size
+            max_batch = batch_size
         elif coreml:  # CoreML
             LOGGER.info(f"Loading {w} for CoreML inference...")
             import coremltools as ct
@@ -685,19 +753,39 @@ class DetectMultiBackend(nn.Module):
             names = yaml_load(data)["names"] if data else {i: f"class{i}" for i in range(999)}
         if names[0] == "n01440764" and len(names) == 1000:  # ImageNet
             names = yaml_load(ROOT / "data/ImageNet.yaml")["names"]  # human-readable names
+        inputs = InputBuffers()  # reusable preprocessed input tensors, see preprocess()
 
         self.__dict__.update(locals())  # assign all variables to self
 
-    def forward(self, im, augment=False, visualize=False):
-        """Performs YOLOv5 inference on input images with options for augmentation and visualization."""
+    def forward(self, im, augment=False, visualize=False, sources=False):
+        """
+        Performs YOLOv5 inference on input images with options for augmentation and visualization.
+
+        With `sources`, PyTorch Ensemble models return (y, rows), the prediction rows of each member for
+        non_max_suppression_wbf(), see Ensemble.forward(); other models return as usual.
+
+        With `zero_copy`, ONNX Runtime and OpenVINO outputs alias reused buffers that the next call overwrites; consume
+        or copy them before calling again.
+        """
         _b, _ch, h, w = im.shape  # batch, channel, height, width
+        if self.xml and self.ov_queue is not None and _b > (self.max_batch or 1):  # parallel OpenVINO infer requests
+            y = self._run_async(im)
+            return y[0] if len(y) == 1 else y
+        if self.max_batch and _b > self.max_batch:  # split batches the backend can not run in one call
+            y = [self._cat_batches([self.forward(x, augment, visualize)]) for x in im.split(self.max_batch)]  # copied
+            return self._cat_batches(y)  # each part is copied before the next call can overwrite zero-copy outputs
         if self.fp16 and im.dtype != torch.float16:
             im = im.half()  # to FP16
         if self.nhwc:
             im = im.permute(0, 2, 3, 1)  # torch BCHW to numpy BHWC shape(1,320,192,3)
 
         if self.pt:  # PyTorch
-            y = self.model(im, augment=augment, visualize=visualize) if augment or visualize else self.model(im)
+            if sources and isinstance(self.model, nn.ModuleList):  # Ensemble
+                y = self.model(im, augment=augment, visualize=visualize, sources=True)
+            elif augment or visualize:
+                y = self.model(im, augment=augment, visualize=visualize)
+            else:
+                y = self._run_compiled(im) if self.compile_mode else self.model(im)
         elif self.jit:  # TorchScript
             y = self.model(im)
         elif self.dnn:  # ONNX OpenCV DNN
@@ -705,11 +793,22 @@ class DetectMultiBackend(nn.Module):
             self.net.setInput(im)
             y = self.net.forward()
         elif self.onnx:  # ONNX Runtime
-            im = im.cpu().numpy()  # torch to numpy
-            y = self.session.run(self.output_names, {self.session.get_inputs()[0].name: im})
+            if self.zero_copy:
+                y = self._run_io_binding(im)
+            else:
+                im = im.cpu().numpy()  # torch to numpy
+                y = self.session.run(self.output_names, {self.session.get_inputs()[0].name: im})
         elif self.xml:  # OpenVINO
             im = im.cpu().numpy()  # FP32
-            y = list(self.ov_compiled_model(im).values())
+            if self.zero_copy:
+                im = np.ascontiguousarray(im)
+                if self.ov_bound != (im.shape, im.ctypes.data):  # a reused input buffer stays shared with the request
+                    self.ov_request.set_input_tensor(self.Tensor(im, shared_memory=True))
+                    self.ov_bound = im.shape, im.ctypes.data
+                self.ov_request.infer()
+                y = [x.data for x in self.ov_request.output_tensors]  # views of the request's output tensors
+            else:
+                y = list(self.ov_compiled_model(im).values())
         elif self.engine:  # TensorRT
             if self.dynamic and im.shape != self.bindings["images"].shape:
                 i = self.model.get_binding_index("images")
@@ -772,14 +871,111 @@ class DetectMultiBackend(nn.Module):
         else:
             return self.from_numpy(y)
 
+    def preprocess(self, im):
+        """Converts uint8 images `im` (array or tensor, CHW or BCHW, or a list of CHW arrays) to a 0.0-1.0 FP16/32 input
+        tensor on the model device, written into a reused preallocated buffer.
+        """
+        fmt = torch.channels_last if self.channels_last else torch.contiguous_format
+        return self.inputs(im, self.device, torch.half if self.fp16 else torch.float, fmt)
+
+    def _run_io_binding(self, im):
+        """Runs ONNX Runtime on tensor `im` without copies through IO binding, returning reused output tensors."""
+        binding, device = self.io_binding, self.ort_device
+        device_id = self.device.index or 0
+        im = im.to(device).contiguous()
+        shape = tuple(im.shape)
+        if self.ort_bound != (shape, im.data_ptr()):  # a reused input buffer stays bound
+            dtype = np.float16 if im.dtype == torch.float16 else np.float32
+            binding.bind_input(self.session.get_inputs()[0].name, device, device_id, dtype, shape, im.data_ptr())
+            if shape in self.ort_outputs:
+                self.ort_outputs.move_to_end(shape)
+            else:  # first call at this shape, let ONNX Runtime allocate to learn shapes
+                if len(self.ort_outputs) >= self.inputs.max_keys:  # as many shapes as the input buffers keep
+                    self.ort_outputs.popitem(last=False)  # least recently used, rebound below if it was bound
+                for name in self.output_names:
+                    binding.bind_output(name, device, device_id)
+                self.session.run_with_iobinding(binding)
+                half = [x.type == "tensor(float16)" for x in self.session.get_outputs()]
+                self.ort_outputs[shape] = [
+                    torch.empty(x.shape(), dtype=torch.float16 if h else torch.float32, device=im.device)
+                    for x, h in zip(binding.get_outputs(), half)
+                ]
+            if self.ort_bound is None or self.ort_bound[0] != shape:
+                for name, x in zip(self.output_names, self.ort_outputs[shape]):
+                    dtype = np.float16 if x.dtype == torch.float16 else np.float32
+                    binding.bind_output(name, device, device_id, dtype, tuple(x.shape), x.data_ptr())
+            self.ort_bound = shape, im.data_ptr()
+        self.session.run_with_iobinding(binding)
+        return [x.to(self.device) for x in self.ort_outputs[shape]]
+
+    def _run_compiled(self, im):
+        """Runs the PyTorch model compiled for the shape (bucket) of `im`, compiling it on first use of the shape."""
+        b, c, h, w = im.shape
+        s = self.compile_bucket
+        if s and (h % s or w % s):  # pad to the bucket shape
+            x = im.new_full((b, c, math.ceil(h / s) * s, math.ceil(w / s) * s), 114 / 255)
+            x[..., :h, :w] = im
+            im = x
+        shape = tuple(im.shape)
+        if self.compile_mode == "inductor":  # dynamo guards and caches one graph per shape, not evictable
+            limit = torch._dynamo.config.cache_size_limit
+            if shape not in self.compiled and len(self.compiled) <= limit:  # log new shapes up to the first eager one
+                self.compiled[shape] = None
+                if len(self.compiled) > limit:
+                    LOGGER.warning(
+                        f"WARNING ⚠️ More than {limit} input shapes, dynamo runs new shapes eagerly. "
+                        "Use compile_bucket to share compiled shapes."
+                    )
+                else:
+                    LOGGER.info(f"Compiling {self.compile_mode} model for input shape {shape}...")
+            return self.inductor(im)
+        if shape in self.compiled:
+            self.compiled.move_to_end(shape)
+        else:
+            LOGGER.info(f"Compiling {self.compile_mode} model for input shape {shape}...")
+            if len(self.compiled) == 8:
+                self.compiled.popitem(last=False)  # least recently used
+            with torch.inference_mode(False), torch.no_grad():  # inference mode tensors can not be traced
+                trace = torch.jit.trace(self.model, im.clone(), strict=False, check_trace=False)
+                self.compiled[shape] = torch.jit.freeze(trace.eval())
+        return self.compiled[shape](im)
+
+    def _run_async(self, im):
+        """Runs OpenVINO on batch `im` split into model-batch-size parts, or one part per request for a dynamic batch,
+        in parallel infer requests of the AsyncInferQueue, returning the outputs concatenated in order, on the model
+        device.
+        """
+        im = im.cpu()
+        parts = im.split(self.max_batch) if self.max_batch else im.chunk(len(self.ov_queue))
+        y = [None] * len(parts)
+
+        def callback(request, i):
+            """Keeps the outputs of part `i`, copied because the request is reused."""
+            y[i] = [x.data.copy() for x in request.output_tensors]
+
+        self.ov_queue.set_callback(callback)
+        for i, x in enumerate(parts):
+            self.ov_queue.start_async({0: self.Tensor(np.ascontiguousarray(x.numpy()), shared_memory=True)}, i)
+        self.ov_queue.wait_all()  # parts are shared with the requests until they finish
+        return [self.from_numpy(np.concatenate(x)) for x in zip(*y)]
+
+    @staticmethod
+    def _cat_batches(y):
+        """Concatenates the outputs of consecutive sub-batches, tensors or nested lists of tensors, along the batch."""
+        return torch.cat(y) if isinstance(y[0], torch.Tensor) else [DetectMultiBackend._cat_batches(x) for x in zip(*y)]
+
     def from_numpy(self, x):
         """Converts a NumPy array to a torch tensor, maintaining device compatibility."""
         return torch.from_numpy(x).to(self.device) if isinstance(x, np.ndarray) else x
 
     def warmup(self, imgsz=(1, 3, 640, 640)):
-        """Performs a single inference warmup to initialize model weights, accepting an `imgsz` tuple for image size."""
+        """Performs a single inference warmup to initialize model weights, accepting an `imgsz` tuple for image size.
+
+        With `compile_mode` the warmup also runs on CPU and compiles the model for `imgsz`, so pass the letterboxed
+        batch shapes actually inferred.
+        """
         warmup_types = self.pt, self.jit, self.onnx, self.engine, self.saved_model, self.pb, self.triton
-        if any(warmup_types) and (self.device.type != "cpu" or self.triton):
+        if any(warmup_types) and (self.device.type != "cpu" or self.triton or (self.pt and self.compile_mode)):
             im = torch.empty(*imgsz, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
             for _ in range(2 if self.jit else 1):  #
                 self.forward(im)  # warmup
@@ -833,6 +1029,7 @@ class AutoShape(nn.Module):
         self.dmb = isinstance(model, DetectMultiBackend)  # DetectMultiBackend() instance
         self.pt = not self.dmb or model.pt  # PyTorch model
         self.model = model.eval()
+        self.inputs = InputBuffers()  # reusable input tensors, per thread
         if self.pt:
             m = self.model.model.model[-1] if self.dmb else self.model.model[-1]  # Detect()
             m.inplace = False  # Detect.inplace=False for safe multithread inference
@@ -899,9 +1096,9 @@ class AutoShape(nn.Module):
                 shape1.append([int(y * g) for y in s])
                 ims[i] = im if im.data.contiguous else np.ascontiguousarray(im)  # update
             shape1 = [make_divisible(x, self.stride) for x in np.array(shape1).max(0)]  # inf shape
-            x = [letterbox(im, shape1, auto=False)[0] for im in ims]  # pad
-            x = np.ascontiguousarray(np.array(x).transpose((0, 3, 1, 2)))  # stack and BHWC to BCHW
-            x = torch.from_numpy(x).to(p.device).type_as(p) / 255  # uint8 to fp16/32
+            x = [letterbox(im, shape1, auto=False)[0].transpose((2, 0, 1)) for im in ims]  # pad, HWC to CHW
+            fmt = torch.channels_last if getattr(self.model, "channels_last", False) else torch.contiguous_format
+            x = self.inputs(x, p.device, p.dtype, fmt)  # stack into a reused buffer, uint8 to fp16/32
 
         with amp.autocast(autocast):
             # Inference
@@ -919,8 +1116,9 @@ class AutoShape(nn.Module):
                     self.multi_label,
                     max_det=self.max_det,
                 )  # NMS
-                for i in range(n):
-                    scale_boxes(shape1, y[i][:, :4], shape0[i])
+                nd = [len(x) for x in y]  # detections per image
+                index = torch.arange(n, device=p.device).repeat_interleave(torch.tensor(nd, device=p.device))
+                y = list(scale_boxes_batch(shape1, torch.cat(y), index, shape0).split(nd))  # all images in one op
 
             return Detections(ims, y, files, dt, self.names, x.shape)
 
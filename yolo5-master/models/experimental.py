@@ -2,6 +2,7 @@
 """Experimental modules."""
 
 import math
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import torch
@@ -73,17 +74,54 @@ class MixConv2d(nn.Module):
 class Ensemble(nn.ModuleList):
     """Ensemble of models."""
 
+    concurrent = None  # run members in one thread (and CUDA stream) each (None for CUDA only), see forward()
+
     def __init__(self):
         """Initializes an ensemble of models to be used for aggregated predictions."""
         super().__init__()
 
-    def forward(self, x, augment=False, profile=False, visualize=False):
-        """Performs forward pass aggregating outputs from an ensemble of models.."""
-        y = [module(x, augment, profile, visualize)[0] for module in self]
+    def forward(self, x, augment=False, profile=False, visualize=False, sources=False):
+        """
+        Performs forward pass aggregating outputs from an ensemble of models.
+
+        Member predictions are concatenated, for one NMS over all members or, with `sources`, for per-member NMS and
+        Weighted Box Fusion: (y, rows) is returned instead of (y, None), with the prediction rows of each member (of
+        each member view with augment) for non_max_suppression_wbf(y, rows). With `concurrent` (default on for CUDA
+        inputs only) every member runs in its own thread and CUDA stream, so small models overlap on the GPU; CPU
+        inference already spreads each convolution over all cores.
+        """
+        concurrent = x.device.type == "cuda" if self.concurrent is None else self.concurrent
+        if concurrent and len(self) > 1 and not (profile or visualize):
+            y = self._forward_concurrent(x, augment)
+        else:
+            y = [module(x, augment, profile, visualize)[0] for module in self]
         # y = torch.stack(y).max(0)[0]  # max ensemble
         # y = torch.stack(y).mean(0)  # mean ensemble
+        rows = None
+        if sources:
+            v = [len(getattr(m, "tta_scales", (1,))) if augment else 1 for m in self]  # views per member
+            rows = [yi.shape[1] // vi for yi, vi in zip(y, v) for _ in range(vi)]
         y = torch.cat(y, 1)  # nms ensemble
-        return y, None  # inference, train output
+        return y, rows  # inference, prediction rows of each source
+
+    def _forward_concurrent(self, x, augment=False):
+        """Runs each member on `x` in its own thread, and on CUDA its own stream, with the caller's grad mode."""
+        inference, grad = torch.is_inference_mode_enabled(), torch.is_grad_enabled()  # thread-local modes
+        cuda = x.device.type == "cuda"
+        streams = [torch.cuda.Stream(x.device) for _ in self] if cuda else [None] * len(self)
+        for s in streams if cuda else ():
+            s.wait_stream(torch.cuda.current_stream(x.device))  # x is ready
+
+        def run(m, s):
+            with torch.inference_mode(inference), torch.set_grad_enabled(grad), torch.cuda.stream(s):
+                return m(x, augment)[0]
+
+        with ThreadPoolExecutor(len(self)) as pool:
+            y = list(pool.map(run, self, streams))
+        for s, yi in zip(streams, y) if cuda else ():
+            torch.cuda.current_stream(x.device).wait_stream(s)
+            yi.record_stream(torch.cuda.current_stream(x.device))  # allocated on s, used on the current stream
+        return y
 
 
 def attempt_load(weights, device=None, inplace=True, fuse=True):
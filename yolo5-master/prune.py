@@ -0,0 +1,169 @@
+# Ultralytics 🚀 AGPL-3.0 License - https://ultralytics.com/license
+"""
+Structured channel pruning of a trained YOLOv5 detection model, followed by fine-tuning and a comparison report.
+
+Channels with the smallest BatchNorm |gamma| are physically removed from every Conv, C3 and SPPF layer, see
+BaseModel.prune(), so the pruned model and all its exports are smaller and faster on dense CPU and GPU kernels. The
+pruned model is fine-tuned with train.py and parameters, GFLOPs, latency and mAP of the original, pruned and fine-tuned
+models are reported.
+
+Usage:
+    $ python prune.py --weights yolov5s.pt --data coco128.yaml --amount 0.3 --epochs 30
+    $ python prune.py --weights yolov5s.pt --data coco128.yaml --amount 0.5 --epochs 0  # prune and report only
+    $ python export.py --weights runs/prune/exp/finetune/weights/best.pt --include onnx  # export the pruned model
+"""
+
+import argparse
+import sys
+from copy import deepcopy
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+# ROOT = ROOT.relative_to(Path.cwd())  # relative
+
+import torch
+
+import train
+from models.experimental import attempt_load
+from utils.general import LOGGER, check_yaml, colorstr, increment_path, print_args
+from utils.torch_utils import model_info, select_device, time_sync
+from val import run as val_det
+
+
+def latency(model, imgsz=640, device=None, n=50):
+    """Returns the median milliseconds of `n` batch-1 inferences of `model` at `imgsz` after 5 warmup runs."""
+    im = torch.zeros(1, 3, imgsz, imgsz, device=device)
+    t = []
+    with torch.inference_mode():
+        for _ in range(n + 5):
+            t0 = time_sync()
+            model(im)
+            t.append(time_sync() - t0)
+    return float(np.median(t[5:])) * 1e3
+
+
+def run(
+    weights=ROOT / "yolov5s.pt",  # trained model.pt path
+    data=ROOT / "data/coco128.yaml",  # dataset.yaml path
+    amount=0.3,  # fraction of channels to remove
+    epochs=30,  # fine-tuning epochs, 0 to skip
+    imgsz=640,  # train, val and latency image size (pixels)
+    batch_size=16,  # fine-tuning and val batch size
+    device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+    project=ROOT / "runs/prune",  # save to project/name
+    name="exp",  # save to project/name
+    exist_ok=False,  # existing project/name ok, do not increment
+):
+    """
+    Prunes `amount` of the channels of `weights`, fine-tunes the pruned model and reports the results.
+
+    Args:
+        weights (Path | str): Trained YOLOv5 detection model weights (default: ROOT / "yolov5s.pt").
+        data (Path | str): Path to the dataset.yaml file used for fine-tuning and validation (default: coco128.yaml).
+        amount (float): Fraction of the channels to remove from each layer (default: 0.3).
+        epochs (int): Fine-tuning epochs with train.py, 0 to skip fine-tuning (default: 30).
+        imgsz (int): Image size in pixels for training, validation and latency (default: 640).
+        batch_size (int): Batch size for fine-tuning and validation (default: 16).
+        device (str): CUDA device, e.g., '0' or '0,1,2,3' or 'cpu' (default: "").
+        project (Path | str): Directory for results (default: ROOT / "runs/prune").
+        name (str): Results subdirectory name (default: "exp").
+        exist_ok (bool): Reuse an existing project/name directory (default: False).
+
+    Returns:
+        pd.DataFrame: Parameters, GFLOPs, latency, mAP50 and mAP50-95 of the original, pruned and fine-tuned models.
+    """
+    save_dir = increment_path(Path(project) / name, exist_ok=exist_ok)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    data = check_yaml(data)
+
+    # Prune
+    model = attempt_load(weights, device="cpu", fuse=False)
+    pruned = deepcopy(model).prune(amount)
+    assert "pruned" in pruned.yaml, f"{weights} is not prunable"
+    f = save_dir / f"{Path(weights).stem}-pruned.pt"
+    ckpt = {"model": deepcopy(pruned).half(), "ema": None, "updates": None, "optimizer": None, "epoch": -1}
+    torch.save(ckpt, f)
+    LOGGER.info(f"{colorstr('Prune:')} saved {amount:.0%} channel-pruned model to {f}")
+    models = [("original", weights), ("pruned", f)]
+
+    # Fine-tune
+    if epochs:
+        opt = train.run(
+            data=data,
+            weights=str(f),
+            epochs=epochs,
+            imgsz=imgsz,
+            batch_size=batch_size,
+            device=device,
+            project=save_dir,
+            name="finetune",
+            exist_ok=True,
+        )
+        w = Path(opt.save_dir) / "weights"
+        models.append(("fine-tuned", w / "best.pt" if (w / "best.pt").exists() else w / "last.pt"))
+
+    # Report
+    device = select_device(device, batch_size=batch_size)
+    y = []
+    for label, w in models:
+        model = attempt_load(w, device=device)  # fused
+        n_p, flops = model_info(model, imgsz=imgsz)
+        t = latency(model, imgsz, device)
+        result = val_det(data, w, batch_size, imgsz, plots=False, device=device)
+        metrics = [round(x, 4) for x in result[0][2:4]]  # mAP50, mAP50-95
+        y.append([label, round(n_p / 1e6, 2), flops and round(flops, 1), round(t, 2), *metrics])
+    py = pd.DataFrame(y, columns=["Model", "Params (M)", "GFLOPs", "Latency (ms)", "mAP50", "mAP50-95"])
+    py.to_csv(save_dir / "results.csv", index=False)
+    LOGGER.info(f"\nPruning complete ({amount:.0%} of channels), results saved to {colorstr('bold', save_dir)}\n{py}")
+    return py
+
+
+def parse_opt():
+    """
+    Parses command-line arguments for structured pruning and fine-tuning.
+
+    Args:
+        weights (str): Trained model weights path. Defaults to 'ROOT / "yolov5s.pt"'.
+        data (str): Dataset YAML path. Defaults to 'ROOT / "data/coco128.yaml"'.
+        amount (float): Fraction of channels to remove. Defaults to 0.3.
+        epochs (int): Fine-tuning epochs, 0 to skip. Defaults to 30.
+        imgsz (int): Image size in pixels. Defaults to 640.
+        batch_size (int): Fine-tuning and val batch size. Defaults to 16.
+        device (str): CUDA device, e.g., '0' or '0,1,2,3' or 'cpu'. Defaults to an empty string (auto-select).
+        project (str): Save to project/name. Defaults to 'ROOT / "runs/prune"'.
+        name (str): Save to project/name. Defaults to 'exp'.
+        exist_ok (bool): Existing project/name ok, do not increment. This is a flag and defaults to False.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", type=str, default=ROOT / "yolov5s.pt", help="trained model.pt path")
+    parser.add_argument("--data", type=str, default=ROOT / "data/coco128.yaml", help="dataset.yaml path")
+    parser.add_argument("--amount", type=float, default=0.3, help="fraction of channels to remove")
+    parser.add_argument("--epochs", type=int, default=30, help="fine-tuning epochs, 0 to skip")
+    parser.add_argument("--imgsz", "--img", "--img-size", type=int, default=640, help="image size (pixels)")
+    parser.add_argument("--batch-size", type=int, default=16, help="fine-tuning and val batch size")
+    parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
+    parser.add_argument("--project", default=ROOT / "runs/prune", help="save to project/name")
+    parser.add_argument("--name", default="exp", help="save to project/name")
+    parser.add_argument("--exist-ok", action="store_true", help="existing project/name ok, do not increment")
+    opt = parser.parse_args()
+    print_args(vars(opt))
+    return opt
+
+
+def main(opt):
+    """Runs structured pruning, fine-tuning and the comparison report with parsed command-line options."""
+    run(**vars(opt))
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
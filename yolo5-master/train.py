@@ -215,7 +215,11 @@ def train(hyp, opt, device, callbacks):
         with torch_distributed_zero_first(LOCAL_RANK):
             weights = attempt_download(weights)  # download if not found locally
         ckpt = torch_load(weights, map_location="cpu")  # load checkpoint to CPU to avoid CUDA memory leak
-        model = Model(cfg or ckpt["model"].yaml, ch=3, nc=nc, anchors=hyp.get("anchors")).to(device)  # create
+        if ckpt["model"].yaml.get("pruned") and not cfg:  # structured-pruned channels no longer match the yaml
+            assert ckpt["model"].nc == nc, f"pruned {weights} has {ckpt['model'].nc} classes, dataset has {nc}"
+            model = ckpt["model"].float().to(device)  # train the pruned architecture as is
+        else:
+            model = Model(cfg or ckpt["model"].yaml, ch=3, nc=nc, anchors=hyp.get("anchors")).to(device)  # create
         exclude = ["anchor"] if (cfg or hyp.get("anchors")) and not resume else []  # exclude keys
         csd = ckpt["model"].float().state_dict()  # checkpoint state_dict as FP32
         csd = intersect_dicts(csd, model.state_dict(), exclude=exclude)  # intersect
@@ -3,6 +3,7 @@
 
 import math
 import random
+from functools import lru_cache
 
 import cv2
 import numpy as np
@@ -119,12 +120,9 @@ def replicate(im, labels):
     return im, labels
 
 
-def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), auto=True, scaleFill=False, scaleup=True, stride=32):
-    """Resizes and pads image to new_shape with stride-multiple constraints, returns resized image, ratio, padding."""
-    shape = im.shape[:2]  # current shape [height, width]
-    if isinstance(new_shape, int):
-        new_shape = (new_shape, new_shape)
-
+@lru_cache(maxsize=64)
+def letterbox_geometry(shape, new_shape=(640, 640), auto=True, scaleFill=False, scaleup=True, stride=32):
+    """Returns cached letterbox geometry (new_unpad, ratio, (dw, dh), (top, bottom, left, right)) for an image shape."""
     # Scale ratio (new / old)
     r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
     if not scaleup:  # only scale down, do not scale up (for better val mAP)
@@ -143,11 +141,22 @@ def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), auto=True, scaleF
 
     dw /= 2  # divide padding into 2 sides
     dh /= 2
+    border = round(dh - 0.1), round(dh + 0.1), round(dw - 0.1), round(dw + 0.1)  # top, bottom, left, right
+    return new_unpad, ratio, (dw, dh), border
+
+
+def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), auto=True, scaleFill=False, scaleup=True, stride=32):
+    """Resizes and pads image to new_shape with stride-multiple constraints, returns resized image, ratio, padding."""
+    shape = im.shape[:2]  # current shape [height, width]
+    if isinstance(new_shape, int):
+        new_shape = (new_shape, new_shape)
+    new_shape = tuple(round(x) for x in new_shape)  # hashable for geometry cache, rounded like new_unpad
+    new_unpad, ratio, (dw, dh), (top, bottom, left, right) = letterbox_geometry(
+        shape, new_shape, auto, scaleFill, scaleup, int(stride)
+    )
 
     if shape[::-1] != new_unpad:  # resize
         im = cv2.resize(im, new_unpad, interpolation=cv2.INTER_LINEAR)
-    top, bottom = round(dh - 0.1), round(dh + 0.1)
-    left, right = round(dw - 0.1), round(dw + 0.1)
     im = cv2.copyMakeBorder(im, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)  # add border
     return im, ratio, (dw, dh)
 
@@ -10,10 +10,11 @@ import os
 import random
 import shutil
 import time
+from collections import deque
 from itertools import repeat
 from multiprocessing.pool import Pool, ThreadPool
 from pathlib import Path
-from threading import Thread
+from threading import Condition, Thread
 from urllib.parse import urlparse
 
 import numpy as np
@@ -117,6 +118,15 @@ def exif_transpose(image):
     return image
 
 
+def hwc_to_chw(im, channels_last=False):
+    """Converts a BGR HWC image to RGB CHW, contiguous or, with `channels_last`, as a CHW view of RGB HWC memory that
+    copies into NHWC (channels_last) input tensors without a transpose.
+    """
+    if channels_last:
+        return cv2.cvtColor(im, cv2.COLOR_BGR2RGB).transpose((2, 0, 1))
+    return np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB, contiguous
+
+
 def seed_worker(worker_id):
     """
     Sets the seed for a dataloader worker to ensure reproducibility, based on PyTorch's randomness notes.
@@ -264,12 +274,13 @@ class _RepeatSampler:
 class LoadScreenshots:
     """Loads and processes screenshots for YOLOv5 detection from specified screen regions using mss."""
 
-    def __init__(self, source, img_size=640, stride=32, auto=True, transforms=None):
+    def __init__(self, source, img_size=640, stride=32, auto=True, transforms=None, channels_last=False):
         """
         Initializes a screenshot dataloader for YOLOv5 with specified source region, image size, stride, auto, and
         transforms.
 
-        Source = [screen_number left top width height] (pixels)
+        Source = [screen_number left top width height] (pixels). With `channels_last`, images are CHW views of HWC
+        memory, see hwc_to_chw().
         """
         check_requirements("mss")
         import mss
@@ -286,6 +297,7 @@ class LoadScreenshots:
         self.stride = stride
         self.transforms = transforms
         self.auto = auto
+        self.channels_last = channels_last
         self.mode = "stream"
         self.frame = 0
         self.sct = mss.mss()
@@ -313,17 +325,127 @@ class LoadScreenshots:
             im = self.transforms(im0)  # transforms
         else:
             im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # padded resize
-            im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
-            im = np.ascontiguousarray(im)  # contiguous
+            im = hwc_to_chw(im, self.channels_last)  # HWC to CHW, BGR to RGB
         self.frame += 1
         return str(self.screen), im, im0, None, s  # screen, img, original img, im0s, s
 
 
+class PyAVCapture:
+    """
+    PyAV (FFmpeg) video reader with the `cv2.VideoCapture` calls used by LoadImages and detect.py.
+
+    Decoding is multi-threaded (frame and slice threads, `threads=0` lets FFmpeg choose), `grab()` decodes without the
+    YUV to BGR conversion, and `grab_at()` seeks to the nearest keyframe when the target frame lies more than one GOP
+    ahead instead of decoding every frame in between. With `keyframes=True` the decoder skips all non-key frames.
+    """
+
+    def __init__(self, path, threads=0, keyframes=False):
+        """Opens video `path` for decoding with `threads` decoder threads, optionally keyframes only."""
+        check_requirements("av")
+        import av
+
+        self.container = av.open(str(path))
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"  # frame and slice threading
+        self.stream.thread_count = threads
+        if keyframes:
+            self.stream.codec_context.skip_frame = "NONKEY"
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 30)
+        self.start = self.stream.start_time or 0  # first pts
+        self.frames = self.stream.frames or (
+            int(self.stream.duration * self.stream.time_base * self.fps) if self.stream.duration else 0
+        )
+        self.orientation = int(self.stream.metadata.get("rotate", 0))
+        self.decoder = self.container.decode(self.stream)
+        self.frame = None  # last grabbed av.VideoFrame
+        self.index = -1  # index of the last grabbed frame
+        self.gop = 0  # observed keyframe interval in frames, 0 until two keyframes are seen
+        self.last_key = None
+
+    def get(self, prop):
+        """Returns the value of a `cv2.CAP_PROP_*` property, 0 for unsupported ones."""
+        return {
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_WIDTH: self.stream.codec_context.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.stream.codec_context.height,
+            cv2.CAP_PROP_FRAME_COUNT: self.frames,
+            cv2.CAP_PROP_ORIENTATION_META: self.orientation,
+        }.get(prop, 0)
+
+    def grab(self):
+        """Decodes the next frame without converting it, returning False at the end of the stream."""
+        try:
+            self.frame = next(self.decoder)
+        except (StopIteration, EOFError):
+            self.frame = None
+            return False
+        pts = self.frame.pts
+        t = None if pts is None else float((pts - self.start) * self.stream.time_base)  # seconds
+        self.index = self.index + 1 if t is None else round(t * self.fps)
+        if self.frame.key_frame:
+            if self.last_key is not None and self.index > self.last_key:
+                self.gop = self.index - self.last_key
+            self.last_key = self.index
+        return True
+
+    def grab_at(self, index):
+        """Grabs the first frame at or after frame `index`, seeking when it lies more than one GOP ahead."""
+        if 0 < self.gop <= index - self.index - 1:
+            pts = self.start + int(index / self.fps / self.stream.time_base)
+            self.container.seek(pts, backward=True, stream=self.stream)  # to the keyframe at or before pts
+            self.decoder = self.container.decode(self.stream)
+            self.last_key = None  # keyframe distance is not measurable across a seek
+        while self.grab():
+            if self.index >= index:
+                return True
+        return False
+
+    def retrieve(self):
+        """Converts the last grabbed frame to a BGR array."""
+        if self.frame is None:
+            return False, None
+        return True, self.frame.to_ndarray(format="bgr24")
+
+    def read(self):
+        """Grabs and converts the next frame."""
+        return self.grab() and self.retrieve() or (False, None)
+
+    def isOpened(self):
+        """Returns True while the container is open."""
+        return self.container is not None
+
+    def release(self):
+        """Closes the container."""
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
 class LoadImages:
     """YOLOv5 image/video dataloader, i.e. `python detect.py --source image.jpg/vid.mp4`."""
 
-    def __init__(self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):
-        """Initializes YOLOv5 loader for images/videos, supporting glob patterns, directories, and lists of paths."""
+    def __init__(
+        self,
+        path,
+        img_size=640,
+        stride=32,
+        auto=True,
+        transforms=None,
+        vid_stride=1,
+        video_backend="opencv",
+        decode_threads=0,
+        keyframes=False,
+        channels_last=False,
+    ):
+        """
+        Initializes YOLOv5 loader for images/videos, supporting glob patterns, directories, and lists of paths.
+
+        Videos are read with OpenCV or, with `video_backend="pyav"`, with PyAVCapture using `decode_threads` decoder
+        threads, seeking for large `vid_stride` and optionally decoding `keyframes` only. With `channels_last`, images
+        are CHW views of HWC memory for NHWC model inputs, see hwc_to_chw().
+        """
+        assert video_backend in {"opencv", "pyav"}, f"Invalid video backend {video_backend}, use opencv or pyav"
+        assert not keyframes or video_backend == "pyav", "keyframes=True requires video_backend='pyav'"
         if isinstance(path, str) and Path(path).suffix == ".txt":  # *.txt file with img/vid/dir on each line
             path = Path(path).read_text().rsplit()
         files = []
@@ -351,6 +473,10 @@ class LoadImages:
         self.auto = auto
         self.transforms = transforms  # optional
         self.vid_stride = vid_stride  # video frame-rate stride
+        self.video_backend = video_backend
+        self.decode_threads = decode_threads
+        self.keyframes = keyframes
+        self.channels_last = channels_last
         if any(videos):
             self._new_video(videos[0])  # new video
         else:
@@ -373,9 +499,13 @@ class LoadImages:
         if self.video_flag[self.count]:
             # Read video
             self.mode = "video"
-            for _ in range(self.vid_stride):
-                self.cap.grab()
-            ret_val, im0 = self.cap.retrieve()
+            if self.video_backend == "pyav":
+                ret_val = self.cap.grab_at(self.cap.index + self.vid_stride)  # seeks past skipped frames
+                im0 = self.cap.retrieve()[1] if ret_val else None
+            else:
+                for _ in range(self.vid_stride):
+                    self.cap.grab()
+                ret_val, im0 = self.cap.retrieve()
             while not ret_val:
                 self.count += 1
                 self.cap.release()
@@ -400,8 +530,7 @@ class LoadImages:
             im = self.transforms(im0)  # transforms
         else:
             im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # padded resize
-            im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
-            im = np.ascontiguousarray(im)  # contiguous
+            im = hwc_to_chw(im, self.channels_last)  # HWC to CHW, BGR to RGB
 
         return path, im, im0, self.cap, s
 
@@ -410,7 +539,10 @@ class LoadImages:
         metadata.
         """
         self.frame = 0
-        self.cap = cv2.VideoCapture(path)
+        if self.video_backend == "pyav":
+            self.cap = PyAVCapture(path, self.decode_threads, self.keyframes)
+        else:
+            self.cap = cv2.VideoCapture(path)
         self.frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) / self.vid_stride)
         self.orientation = int(self.cap.get(cv2.CAP_PROP_ORIENTATION_META))  # rotation degrees
         # self.cap.set(cv2.CAP_PROP_ORIENTATION_AUTO, 0)  # disable https://github.com/ultralytics/yolov5/issues/8493
@@ -430,24 +562,68 @@ class LoadImages:
         return self.nf  # number of files
 
 
+def benchmark_video_decode(source, img_size=640, stride=32, vid_stride=1, decode_threads=0):
+    """
+    Logs and returns LoadImages decode + letterbox FPS for `source` videos with the OpenCV and PyAV backends.
+
+    PyAV is timed with `decode_threads` threads and again in keyframes-only mode. FPS counts frames returned.
+    """
+    results = {}
+    for name, kwargs in (
+        ("opencv", {}),
+        ("pyav", {"video_backend": "pyav", "decode_threads": decode_threads}),
+        ("pyav-keyframes", {"video_backend": "pyav", "decode_threads": decode_threads, "keyframes": True}),
+    ):
+        t, n = time.perf_counter(), 0
+        for _ in LoadImages(source, img_size=img_size, stride=stride, vid_stride=vid_stride, **kwargs):
+            n += 1
+        t = time.perf_counter() - t
+        results[name] = n / t
+        LOGGER.info(f"{name:>16}: {n} frames in {t:.2f}s, {n / t:.1f} FPS")
+    return results
+
+
 class LoadStreams:
-    """Loads and processes video streams for YOLOv5, supporting various sources including YouTube and IP cameras."""
+    """
+    Loads and processes video streams for YOLOv5, supporting various sources including YouTube and IP cameras.
+
+    One reader thread per stream blocks on the capture, letterboxes each new frame once and appends it with its
+    sequence number and capture timestamp to a ring buffer of `buffer` frames. Iterating waits (without polling) until
+    every stream has a frame it has not yielded yet, then yields the newest frame of each stream, or the oldest with
+    `latest=False`. Frames that are overwritten or skipped are counted as dropped, see `stats()`. Once one stream has a
+    new frame, streams still without one after `timeout` seconds, e.g. a stalled camera, repeat their last frame,
+    counted as repeated, so one source can not hold up the others; a batch always holds at least one new frame.
+    """
 
-    def __init__(self, sources="file.streams", img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):
+    def __init__(
+        self,
+        sources="file.streams",
+        img_size=640,
+        stride=32,
+        auto=True,
+        transforms=None,
+        vid_stride=1,
+        buffer=4,
+        latest=True,
+        channels_last=False,
+        timeout=1.0,
+    ):
         """Initializes a stream loader for processing video streams with YOLOv5, supporting various sources including
-        YouTube.
+        YouTube; with `channels_last`, frames are CHW views of HWC memory, see hwc_to_chw().
         """
         torch.backends.cudnn.benchmark = True  # faster for fixed-size inference
         self.mode = "stream"
         self.img_size = img_size
         self.stride = stride
         self.vid_stride = vid_stride  # video frame-rate stride
+        self.latest = latest
+        self.channels_last = channels_last
+        self.timeout = timeout  # seconds to wait for lagging streams before repeating their last frame
         sources = Path(sources).read_text().rsplit() if os.path.isfile(sources) else [sources]
         n = len(sources)
         self.sources = [clean_str(x) for x in sources]  # clean source names for later
-        self.imgs, self.fps, self.frames, self.threads = [None] * n, [0] * n, [0] * n, [None] * n
+        self.fps, self.frames, self.threads, caps, first = [0] * n, [0] * n, [None] * n, [None] * n, [None] * n
         for i, s in enumerate(sources):  # index, source
-            # Start thread to read frames from video stream
             st = f"{i + 1}/{n}: {s}... "
             if urlparse(s).hostname in ("www.youtube.com", "youtube.com", "youtu.be"):  # if source is YouTube video
                 # YouTube format i.e. 'https://www.youtube.com/watch?v=Zgi9g1ksQHc' or 'https://youtu.be/LNwODJXcvt4'
@@ -466,36 +642,72 @@ class LoadStreams:
             fps = cap.get(cv2.CAP_PROP_FPS)  # warning: may return 0 or nan
             self.frames[i] = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0) or float("inf")  # infinite stream fallback
             self.fps[i] = max((fps if math.isfinite(fps) else 0) % 100, 0) or 30  # 30 FPS fallback
-
-            _, self.imgs[i] = cap.read()  # guarantee first frame
-            self.threads[i] = Thread(target=self.update, args=([i, cap, s]), daemon=True)
+            success, first[i] = cap.read()  # guarantee first frame
+            assert success, f"{st}Failed to read {s}"
+            caps[i] = cap, s
             LOGGER.info(f"{st} Success ({self.frames[i]} frames {w}x{h} at {self.fps[i]:.2f} FPS)")
-            self.threads[i].start()
         LOGGER.info("")  # newline
 
         # check for common shapes
-        s = np.stack([letterbox(x, img_size, stride=stride, auto=auto)[0].shape for x in self.imgs])
+        s = np.stack([letterbox(x, img_size, stride=stride, auto=auto)[0].shape for x in first])
         self.rect = np.unique(s, axis=0).shape[0] == 1  # rect inference if all shapes equal
         self.auto = auto and self.rect
         self.transforms = transforms  # optional
         if not self.rect:
             LOGGER.warning("WARNING ⚠️ Stream shapes differ. For optimal performance supply similarly-shaped streams.")
 
+        # Ring buffers of (sequence number, capture time, im0, im), guarded by one condition for all streams
+        self.cond = Condition()
+        self.buffers = [deque(maxlen=buffer) for _ in range(n)]
+        self.seq = [0] * n  # sequence number of the last yielded frame per stream
+        self.timestamps = [0.0] * n  # capture time of the last yielded frame per stream
+        self.alive = [True] * n
+        self.last = [None] * n  # last yielded frame per stream, repeated while the stream lags
+        self.captured, self.yielded, self.dropped, self.reconnects = [0] * n, [0] * n, [0] * n, [0] * n
+        self.repeated = [0] * n  # last frames yielded again after a timeout
+        self.age, self.max_age = [0.0] * n, [0.0] * n  # summed and max capture-to-yield delay per stream
+        for i, (cap, s) in enumerate(caps):
+            self._put(i, first[i], time.time())
+            self.threads[i] = Thread(target=self.update, args=([i, cap, s]), daemon=True)
+            self.threads[i].start()
+
+    def _put(self, i, im0, t):
+        """Preprocesses frame `im0` of stream `i` captured at time `t` and appends it to the stream's ring buffer."""
+        if self.transforms:
+            im = self.transforms(im0)  # transforms
+        else:
+            im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # resize
+            im = hwc_to_chw(im, self.channels_last)  # HWC to CHW, BGR to RGB
+        with self.cond:
+            buffer = self.buffers[i]
+            self.dropped[i] += len(buffer) == buffer.maxlen  # oldest frame is overwritten unread
+            self.captured[i] += 1
+            buffer.append((self.captured[i], t, im0, im))
+            self.cond.notify_all()
+
     def update(self, i, cap, stream):
-        """Reads frames from stream `i`, updating imgs array; handles stream reopening on signal loss."""
-        n, f = 0, self.frames[i]  # frame number, frame array
-        while cap.isOpened() and n < f:
-            n += 1
-            cap.grab()  # .read() = .grab() followed by .retrieve()
-            if n % self.vid_stride == 0:
-                success, im = cap.retrieve()
-                if success:
-                    self.imgs[i] = im
-                else:
-                    LOGGER.warning("WARNING ⚠️ Video stream unresponsive, please check your IP camera connection.")
-                    self.imgs[i] = np.zeros_like(self.imgs[i])
-                    cap.open(stream)  # re-open stream if signal was lost
-            time.sleep(0.0)  # wait time
+        """Reads frames from stream `i` into its ring buffer; handles stream reopening on signal loss."""
+        n, f, wait = 1, self.frames[i], 0.0  # frame number (first frame read in __init__), frames, reconnect delay
+        try:
+            while cap.isOpened() and n < f:
+                n += 1
+                cap.grab()  # blocks until the next frame, .read() = .grab() followed by .retrieve()
+                t = time.time()
+                if n % self.vid_stride == 0:
+                    success, im = cap.retrieve()
+                    if success:
+                        self._put(i, im, t)
+                        wait = 0.0
+                    else:
+                        LOGGER.warning("WARNING ⚠️ Video stream unresponsive, please check your IP camera connection.")
+                        time.sleep(wait)  # back off while the source is down
+                        wait = min(2 * wait or 0.1, 2.0)
+                        cap.open(stream)  # re-open stream if signal was lost
+                        self.reconnects[i] += 1
+        finally:
+            with self.cond:
+                self.alive[i] = False
+                self.cond.notify_all()
 
     def __iter__(self):
         """Resets and returns the iterator for iterating over video frames or images in a dataset."""
@@ -503,24 +715,73 @@ class LoadStreams:
         return self
 
     def __next__(self):
-        """Iterates over video frames or images, halting on thread stop or 'q' key press, raising `StopIteration` when
-        done.
+        """Waits for a new frame from every stream and returns them as a batch, halting when a stream ends or on 'q' key
+        press, raising `StopIteration` when done.
         """
         self.count += 1
-        if not all(x.is_alive() for x in self.threads) or cv2.waitKey(1) == ord("q"):  # q to quit
+        if cv2.waitKey(1) == ord("q"):  # q to quit
             cv2.destroyAllWindows()
             raise StopIteration
 
-        im0 = self.imgs.copy()
-        if self.transforms:
-            im = np.stack([self.transforms(x) for x in im0])  # transforms
-        else:
-            im = np.stack([letterbox(x, self.img_size, stride=self.stride, auto=self.auto)[0] for x in im0])  # resize
-            im = im[..., ::-1].transpose((0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW
-            im = np.ascontiguousarray(im)  # contiguous
-
+        def ended():
+            """Returns True if a stream ended with nothing left to yield."""
+            return any(not b and not a for b, a in zip(self.buffers, self.alive))
+
+        with self.cond:
+            self.cond.wait_for(lambda: any(self.buffers) or ended())  # a fresh frame, batches are never only repeats
+            self.cond.wait_for(lambda: all(b or not a for b, a in zip(self.buffers, self.alive)), self.timeout)
+            if ended():
+                cv2.destroyAllWindows()
+                raise StopIteration
+            frames = []
+            for i, buffer in enumerate(self.buffers):
+                if not buffer:  # stream alive but lagging past the timeout, repeat its last frame
+                    frames.append(self.last[i])
+                    self.repeated[i] += 1
+                elif self.latest:
+                    frames.append(buffer.pop())
+                    self.dropped[i] += len(buffer)  # skipped in favour of the newest frame
+                    buffer.clear()
+                else:
+                    frames.append(buffer.popleft())
+            self.last = frames
+        now = time.time()
+        for i, (seq, t, _, _) in enumerate(frames):
+            self.seq[i], self.timestamps[i] = seq, t
+            self.yielded[i] += 1
+            self.age[i] += now - t
+            self.max_age[i] = max(self.max_age[i], now - t)
+
+        im0 = [x[2] for x in frames]
+        im = np.stack([x[3] for x in frames])
         return self.sources, im, im0, None, ""
 
+    def stats(self):
+        """Returns per-stream capture, drop and staleness statistics as a list of dicts."""
+        with self.cond:
+            return [
+                {
+                    "source": source,
+                    "captured": self.captured[i],
+                    "yielded": self.yielded[i],
+                    "dropped": self.dropped[i],
+                    "repeated": self.repeated[i],
+                    "buffered": len(self.buffers[i]),
+                    "reconnects": self.reconnects[i],
+                    "age_ms": 1e3 * self.age[i] / max(self.yielded[i], 1),
+                    "max_age_ms": 1e3 * self.max_age[i],
+                }
+                for i, source in enumerate(self.sources)
+            ]
+
+    def summary(self):
+        """Returns a one-line per-stream summary of frames captured, yielded, dropped and repeated, and their age."""
+        return ", ".join(
+            f"{x['source']}: {x['captured']} captured, {x['yielded']} yielded, {x['dropped']} dropped, "
+            f"{x['repeated']} repeated, age {x['age_ms']:.1f}/{x['max_age_ms']:.1f}ms"
+            for x in self.stats()
+        )
+
     def __len__(self):
         """Returns the number of sources in the dataset, supporting up to 32 streams at 30 FPS over 30 years."""
         return len(self.sources)  # 1E12 frames = 32 streams at 30 FPS for 30 years
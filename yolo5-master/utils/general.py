@@ -62,6 +62,7 @@ AUTOINSTALL = str(os.getenv("YOLOv5_AUTOINSTALL", True)).lower() == "true"  # gl
 VERBOSE = str(os.getenv("YOLOv5_VERBOSE", True)).lower() == "true"  # global verbose mode
 TQDM_BAR_FORMAT = "{l_bar}{bar:10}{r_bar}"  # tqdm bar format
 FONT = "Arial.ttf"  # https://github.com/ultralytics/assets/releases/download/v0.0.0/Arial.ttf
+NMS_METHODS = "greedy", "merge", "matrix", "cluster"  # non_max_suppression() algorithms
 
 torch.set_printoptions(linewidth=320, precision=5, profile="long")
 np.set_printoptions(linewidth=320, formatter={"float_kind": "{:11.5g}".format})  # format short g, %precision=5
@@ -968,6 +969,44 @@ def scale_boxes(img1_shape, boxes, img0_shape, ratio_pad=None):
     return boxes
 
 
+def letterbox_ratio_pad(img1_shape, img0_shapes):
+    """Returns an (n, 3) array of the letterbox gain and x, y padding of n images of (h, w) `img0_shapes` resized to
+    `img1_shape`, as computed by scale_boxes().
+    """
+    s = np.asarray(img0_shapes, dtype=np.float64)[:, :2]  # (n, 2) h, w
+    gain = np.minimum(img1_shape[0] / s[:, 0], img1_shape[1] / s[:, 1])  # gain  = old / new
+    return np.stack((gain, (img1_shape[1] - s[:, 1] * gain) / 2, (img1_shape[0] - s[:, 0] * gain) / 2), 1)
+
+
+def scale_boxes_batch(img1_shape, boxes, index, img0_shapes, ratio_pad=None):
+    """
+    Rescales packed (xyxy) boxes of a whole batch from img1_shape to the shape of their images in place, in one op.
+
+    Args:
+        img1_shape (tuple): Letterboxed (h, w) of all images in the batch.
+        boxes (torch.Tensor | np.ndarray): (n, 4+) boxes of all images, xyxy in the first 4 columns.
+        index (torch.Tensor | np.ndarray): (n,) integer index of the image of each box.
+        img0_shapes (list | np.ndarray): (b, 2+) original (h, w) of each image.
+        ratio_pad (list | np.ndarray, optional): (b, 3) gain and x, y padding of each image, e.g. from the
+            ((h / h0, w / w0), (padw, padh)) dataloader shapes; computed from `img0_shapes` if None.
+
+    Returns:
+        (torch.Tensor | np.ndarray): `boxes`, rescaled and clipped.
+    """
+    if ratio_pad is None:
+        ratio_pad = letterbox_ratio_pad(img1_shape, img0_shapes)
+    bounds = np.asarray(img0_shapes, dtype=np.float64)[:, [1, 0, 1, 0]]  # (b, 4) image wh for x1y1x2y2
+    rp = np.concatenate((np.asarray(ratio_pad, dtype=np.float64).reshape(-1, 3), bounds), 1)  # (b, 7)
+    if isinstance(boxes, torch.Tensor):
+        rp = torch.from_numpy(rp).to(boxes.device, boxes.dtype)[index]  # (n, 7) per box
+    else:
+        rp = rp.astype(boxes.dtype)[index]
+    boxes[:, :4] -= rp[:, [1, 2, 1, 2]]  # xy padding
+    boxes[:, :4] /= rp[:, :1]  # gain
+    clip_boxes_batch(boxes, rp[:, 3:])
+    return boxes
+
+
 def scale_segments(img1_shape, segments, img0_shape, ratio_pad=None, normalize=False):
     """Rescales segment coordinates from img1_shape to img0_shape, optionally normalizing them with custom padding."""
     if ratio_pad is None:  # calculate from img0_shape
@@ -999,6 +1038,14 @@ def clip_boxes(boxes, shape):
         boxes[..., [1, 3]] = boxes[..., [1, 3]].clip(0, shape[0])  # y1, y2
 
 
+def clip_boxes_batch(boxes, bounds):
+    """Clips packed (xyxy) boxes of many images in place to per-box (n, 4) `bounds` (w, h, w, h) in one op."""
+    if isinstance(boxes, torch.Tensor):
+        boxes[:, :4] = torch.minimum(boxes[:, :4].clamp(min=0), bounds)
+    else:  # np.array
+        boxes[:, :4] = boxes[:, :4].clip(0, bounds)
+
+
 def clip_segments(segments, shape):
     """Clips segment coordinates (xy1, xy2, ...) to an image's boundaries given its shape (height, width)."""
     if isinstance(segments, torch.Tensor):  # faster individually
@@ -1019,18 +1066,27 @@ def non_max_suppression(
     labels=(),
     max_det=300,
     nm=0,  # number of masks
+    batched=True,  # loop-free NMS over the whole batch
+    method="greedy",  # NMS algorithm, one of NMS_METHODS
 ):
     """
     Non-Maximum Suppression (NMS) on inference results to reject overlapping detections.
 
+    `method` selects the suppression algorithm, see `nms_rows()`.
+
     Returns:
          list of detections, on (n,6) tensor per image [xyxy, conf, cls]
     """
     # Checks
     assert 0 <= conf_thres <= 1, f"Invalid Confidence threshold {conf_thres}, valid values are between 0.0 and 1.0"
     assert 0 <= iou_thres <= 1, f"Invalid IoU {iou_thres}, valid values are between 0.0 and 1.0"
+    assert method in NMS_METHODS, f"Invalid NMS method {method}, valid values are {NMS_METHODS}"
     if isinstance(prediction, (list, tuple)):  # YOLOv5 model in validation model, output = (inference_out, loss_out)
         prediction = prediction[0]  # select only inference output
+    if batched:
+        return batched_non_max_suppression(
+            prediction, conf_thres, iou_thres, classes, agnostic, multi_label, labels, max_det, nm, method
+        )
 
     device = prediction.device
     mps = "mps" in device.type  # Apple MPS
@@ -1044,10 +1100,9 @@ def non_max_suppression(
     # min_wh = 2  # (pixels) minimum box width and height
     max_wh = 7680  # (pixels) maximum box width and height
     max_nms = 30000  # maximum number of boxes into torchvision.ops.nms()
+    max_matrix = 3000  # maximum number of boxes into the (n,n) IoU matrix of matrix and cluster NMS
     time_limit = 0.5 + 0.05 * bs  # seconds to quit after
-    redundant = True  # require redundant detections
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
-    merge = False  # use merge-NMS
 
     t = time.time()
     mi = 5 + nc  # mask start index
@@ -1097,22 +1152,13 @@ def non_max_suppression(
         n = x.shape[0]  # number of boxes
         if not n:  # no boxes
             continue
-        x = x[x[:, 4].argsort(descending=True)[:max_nms]]  # sort by confidence and remove excess boxes
+        x = x[x[:, 4].argsort(descending=True)[: max_nms if method in ("greedy", "merge") else max_matrix]]
 
         # Batched NMS
         c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
-        boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
-        i = torchvision.ops.nms(boxes, scores, iou_thres)  # NMS
-        i = i[:max_det]  # limit detections
-        if merge and (1 < n < 3e3):  # Merge NMS (boxes merged using weighted mean)
-            # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
-            iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
-            weights = iou * scores[None]  # box weights
-            x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(1, keepdim=True)  # merged boxes
-            if redundant:
-                i = i[iou.sum(1) > 1]  # require redundancy
-
-        output[xi] = x[i]
+        boxes = x[:, :4] + c  # boxes (offset by class)
+        group = None if agnostic else x[:, 5].long()  # class ids
+        output[xi] = nms_rows(x, boxes, iou_thres, method, conf_thres, group=group)[:max_det]  # NMS, limit detections
         if mps:
             output[xi] = output[xi].to(device)
         if (time.time() - t) > time_limit:
@@ -1122,6 +1168,267 @@ def non_max_suppression(
     return output
 
 
+def batched_non_max_suppression(
+    prediction,
+    conf_thres=0.25,
+    iou_thres=0.45,
+    classes=None,
+    agnostic=False,
+    multi_label=False,
+    labels=(),
+    max_det=300,
+    nm=0,  # number of masks
+    method="greedy",  # NMS algorithm, one of NMS_METHODS
+):
+    """
+    Loop-free NMS for a whole batch: one candidate mask, per-image and per-class box offsets and a single NMS call.
+
+    Produces the same detections as the per-image `non_max_suppression(..., batched=False)` loop without its time limit.
+
+    Returns:
+         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+    """
+    device = prediction.device
+    mps = "mps" in device.type  # Apple MPS
+    if mps:  # MPS not fully supported yet, convert tensors to CPU before NMS
+        prediction = prediction.cpu()
+    bs = prediction.shape[0]  # batch size
+    nc = prediction.shape[2] - nm - 5  # number of classes
+    mi = 5 + nc  # mask start index
+
+    # Settings
+    max_wh = 7680  # (pixels) maximum box width and height
+    max_nms = 30000  # maximum number of boxes per image into torchvision.ops.nms()
+    max_matrix = 3000  # maximum number of boxes per image into the (n,n) IoU matrix of matrix and cluster NMS
+    multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
+
+    # Candidates of all images, b holds the image index of every row
+    b, a = (prediction[..., 4] > conf_thres).nonzero(as_tuple=True)  # image, anchor indices
+    x = prediction[b, a]  # confidence
+
+    # Cat apriori labels if autolabelling
+    if labels and any(len(lb) for lb in labels):
+        v = torch.zeros((sum(len(lb) for lb in labels), nc + nm + 5), device=x.device)
+        lb = torch.cat([lb for lb in labels if len(lb)]).to(x.device)
+        v[:, :4] = lb[:, 1:5]  # box
+        v[:, 4] = 1.0  # conf
+        v[range(len(lb)), lb[:, 0].long() + 5] = 1.0  # cls
+        vb = torch.cat([torch.full((len(lb),), i, device=x.device) for i, lb in enumerate(labels) if len(lb)])
+        x, b = torch.cat((x, v), 0), torch.cat((b, vb), 0)
+
+    # Compute conf
+    x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+
+    # Box/Mask
+    box = xywh2xyxy(x[:, :4])  # center_x, center_y, width, height) to (x1, y1, x2, y2)
+    mask = x[:, mi:]  # zero columns if no masks
+
+    # Detections matrix nx6 (xyxy, conf, cls)
+    if multi_label:
+        i, j = (x[:, 5:mi] > conf_thres).nonzero(as_tuple=False).T
+        x, b = torch.cat((box[i], x[i, 5 + j, None], j[:, None].float(), mask[i]), 1), b[i]
+    else:  # best class only
+        conf, j = x[:, 5:mi].max(1, keepdim=True)
+        i = conf.view(-1) > conf_thres
+        x, b = torch.cat((box, conf, j.float(), mask), 1)[i], b[i]
+
+    # Filter by class
+    if classes is not None:
+        i = (x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)
+        x, b = x[i], b[i]
+
+    # Sort by confidence within each image and remove excess boxes
+    i = x[:, 4].argsort(descending=True)
+    i = i[b[i].argsort(stable=True)]  # image-major, confidence-descending
+    i = i[_rank_in_group(b[i], bs) < (max_nms if method in ("greedy", "merge") else max_matrix)]
+    x, b = x[i], b[i]
+
+    # Batched NMS, class offsets as in per-image NMS plus an image offset in float64 to keep coordinates exact
+    c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
+    boxes = (x[:, :4] + c).double() + b[:, None].double() * (max_wh * (nc + 1))  # boxes (offset by class, image)
+    if method == "greedy" and x.device.type != "cpu":  # single NMS call for the whole batch
+        i = torchvision.ops.nms(boxes, x[:, 4].double(), iou_thres)  # NMS
+        i = i[b[i].argsort(stable=True)]  # regroup by image, confidence-descending within each
+        x, b = x[i], b[i]
+    else:  # CPU greedy kernel is O(n^2) in all boxes of the call, IoU matrix methods are O(n^2) memory
+        n = torch.bincount(b, minlength=bs).tolist()
+        x = [
+            nms_rows(xi, bi, iou_thres, method, conf_thres, group=None if agnostic else xi[:, 5].long())
+            for xi, bi in zip(x.split(n), boxes.split(n))
+        ]
+        b = torch.cat([torch.full((len(xi),), j, device=b.device) for j, xi in enumerate(x)])
+        x = torch.cat(x)
+    i = _rank_in_group(b, bs) < max_det  # limit detections
+    x, b = x[i], b[i]
+
+    output = list(x.split(torch.bincount(b, minlength=bs).tolist()))
+    if mps:
+        output = [xi.to(device) for xi in output]
+    return output
+
+
+def nms_rows(x, boxes, iou_thres=0.45, method="greedy", conf_thres=0.0, sigma=2.0, group=None):
+    """
+    Suppresses overlapping detections `x` (n,6+) sorted by descending confidence, using class-offset `boxes` (n,4).
+
+    Matrix and cluster NMS compare boxes within the integer `group` (n,) ids, e.g. classes, or all boxes if None; the
+    offsets of `boxes` can not identify the group once rounded into float32 coordinates.
+
+    Methods:
+        greedy: torchvision.ops.nms().
+        merge: greedy, then each kept box becomes the confidence-weighted mean of the boxes it suppressed, and boxes
+            without any overlapping duplicate are dropped.
+        matrix: Matrix NMS (SOLOv2), confidences decay with the overlap of higher-scoring boxes in one parallel pass
+            (gaussian kernel `sigma`), then boxes below `conf_thres` are dropped; `iou_thres` is not used.
+        cluster: Cluster NMS, iterates parallel suppression over the IoU matrix until it converges to the greedy result.
+
+    Returns:
+        (torch.Tensor): Kept rows of `x` sorted by descending (possibly decayed) confidence.
+    """
+    if method in ("greedy", "merge"):
+        i = torchvision.ops.nms(boxes, x[:, 4].to(boxes.dtype), iou_thres)
+        if method == "merge" and 1 < len(x) < 3e3:  # Merge NMS (boxes merged using weighted mean)
+            # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
+            iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
+            weights = iou * x[None, :, 4]  # box weights
+            x = x.clone()
+            x[i, :4] = (torch.mm(weights, x[:, :4].to(weights.dtype)) / weights.sum(1, keepdim=True)).to(x.dtype)
+            i = i[iou.sum(1) > 1]  # require redundancy
+        return x[i]
+    if not len(x):
+        return x
+
+    # IoU of the plain boxes within each group
+    iou = box_iou(x[:, :4], x[:, :4]).triu_(diagonal=1)  # iou[i, j] of box j with every higher-scoring box i
+    if group is not None:
+        iou *= group[:, None] == group[None]
+    if method == "cluster":
+        over = (iou > iou_thres).float()  # over[i, j]: box i suppresses box j if i is kept
+        keep = torch.ones(len(x), dtype=torch.bool, device=x.device)
+        for _ in range(200):
+            keep_next = (keep.float() @ over) == 0  # boxes not suppressed by any currently kept box
+            if torch.equal(keep, keep_next):
+                break
+            keep = keep_next
+        return x[keep]
+
+    # Matrix NMS: decay_j = min_i f(iou_ij) / f(compensate_i) with f = exp(-sigma * iou^2), monotonic so reduce first
+    compensate = iou.max(0)[0]  # max IoU of every box with any higher-scoring box
+    decay = torch.exp(-sigma * (iou.square_() - compensate[:, None] ** 2).max(0)[0])
+    x = x.clone()
+    x[:, 4] *= decay
+    x = x[x[:, 4] > conf_thres]
+    return x[x[:, 4].argsort(descending=True)]
+
+
+def weighted_boxes_fusion(x, sources, iou_thres=0.55, agnostic=False, max_det=300):
+    """
+    Weighted Box Fusion (WBF, arXiv:1910.13302) of the detections `x` of one image from `sources` models or views.
+
+    Clusters are seeded by the greedy NMS survivors and every box joins the highest-confidence seed of its class it
+    overlaps by more than `iou_thres`, assigned in one pass over the (seeds, boxes) IoU matrix instead of matching
+    boxes one by one against the evolving fused boxes. Each cluster becomes the confidence-weighted mean of its boxes
+    (and of any extra columns, e.g. mask coefficients) with the mean confidence scaled by min(boxes, sources) / sources,
+    so detections that few sources agree on are down-weighted.
+
+    Args:
+        x (torch.Tensor): (n, 6+) detections [xyxy, conf, cls, ...] of all sources, e.g. non_max_suppression() outputs
+            concatenated.
+        sources (int): Number of models or augmented views that produced `x`.
+        iou_thres (float): IoU above which a box joins a cluster (default: 0.55).
+        agnostic (bool): Fuse boxes across classes (default: False).
+        max_det (int): Maximum number of fused detections (default: 300).
+
+    Returns:
+        (torch.Tensor): (k, 6+) fused detections sorted by descending confidence.
+    """
+    if not len(x):
+        return x
+    max_wh = 7680  # (pixels) maximum box width and height
+    boxes = x[:, :4] + (0 if agnostic else x[:, 5:6] * max_wh)  # class-offset boxes
+    i = torchvision.ops.nms(boxes, x[:, 4], iou_thres)[:max_det]  # cluster seeds, highest confidence first
+    match = box_iou(boxes[i], boxes) > iou_thres  # (seeds, boxes)
+    j = torch.arange(len(x), device=x.device)
+    member = torch.zeros_like(match)
+    member[match.byte().argmax(0), j] = match.any(0)  # each box in its first matching cluster, if any
+    w = member * x[:, 4]  # (seeds, boxes) fusion weights
+    n = member.sum(1, keepdim=True)  # boxes per cluster
+    y = x[i].clone()
+    y[:, :4] = w @ x[:, :4] / w.sum(1, keepdim=True)
+    y[:, 6:] = w @ x[:, 6:] / w.sum(1, keepdim=True)
+    y[:, 4] = (w.sum(1, keepdim=True) / n * n.clamp(max=sources) / sources).squeeze(1)
+    return y[y[:, 4].argsort(descending=True)]
+
+
+def non_max_suppression_wbf(
+    prediction,
+    sources,
+    conf_thres=0.25,
+    iou_thres=0.45,
+    classes=None,
+    agnostic=False,
+    multi_label=False,
+    labels=(),
+    max_det=300,
+    nm=0,  # number of masks
+    method="greedy",  # NMS algorithm of each source, one of NMS_METHODS
+    wbf_iou=0.55,  # weighted_boxes_fusion() IoU threshold
+):
+    """
+    Non-Maximum Suppression within each source, then Weighted Box Fusion across sources, see weighted_boxes_fusion().
+
+    `prediction` (bs, n, no) holds a block of rows per source for each image: `sources` equal blocks, e.g. the views
+    of augmented inference, DetectionModel(x, augment=True), or the row count of each block, e.g. the rows returned by
+    Ensemble(x, sources=True).
+    Apriori `labels` of each image are kept apart from the fusion: they are added after it as boxes of confidence 1.0
+    that suppress the fused detections of their class they overlap by more than `iou_thres`.
+
+    Returns:
+         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+    """
+    if isinstance(prediction, (list, tuple)):  # YOLOv5 model in validation model, output = (inference_out, loss_out)
+        prediction = prediction[0]  # select only inference output
+    bs, n, no = prediction.shape
+    blocks = [n // sources] * sources if isinstance(sources, int) else list(sources)  # rows per source
+    assert sum(blocks) == n, f"{n} prediction rows can not be split into sources {sources}"
+    k = len(blocks)
+    kwargs = dict(max_det=max_det, nm=nm, method=method)
+    if len(set(blocks)) == 1:  # one NMS image per source
+        y = non_max_suppression(
+            prediction.reshape(bs * k, blocks[0], no), conf_thres, iou_thres, classes, agnostic, multi_label, **kwargs
+        )
+        y = [y[i : i + k] for i in range(0, len(y), k)]
+    else:  # one NMS batch per source
+        y = [
+            non_max_suppression(p, conf_thres, iou_thres, classes, agnostic, multi_label, **kwargs)
+            for p in prediction.split(blocks, 1)
+        ]
+        y = list(zip(*y))
+    output = [weighted_boxes_fusion(torch.cat(x), k, wbf_iou, agnostic, max_det) for x in y]
+
+    for xi, lb in enumerate(labels):  # apriori labels [cls, xywh], never fused with predictions
+        if not len(lb):
+            continue
+        x = output[xi]
+        v = torch.zeros((len(lb), x.shape[1]), device=x.device, dtype=x.dtype)
+        v[:, :4] = xywh2xyxy(lb[:, 1:5])  # box
+        v[:, 4] = 1.0  # conf
+        v[:, 5] = lb[:, 0]  # cls
+        if classes is not None:
+            v = v[(v[:, 5:6] == torch.tensor(classes, device=v.device)).any(1)]
+        iou = box_iou(x[:, :4], v[:, :4])
+        if not agnostic:
+            iou *= x[:, 5:6] == v[:, 5]
+        output[xi] = torch.cat((v, x[(iou <= iou_thres).all(1)]))[:max_det]
+    return output
+
+
+def _rank_in_group(b, n):
+    """Returns the position of each element within its group for group indices `b` sorted ascending in [0, n)."""
+    counts = torch.bincount(b, minlength=n)
+    return torch.arange(len(b), device=b.device) - (counts.cumsum(0) - counts)[b]
+
+
 def strip_optimizer(f="best.pt", s=""):
     """
     Strips optimizer and optionally saves checkpoint to finalize training; arguments are file path 'f' and save path
@@ -0,0 +1,179 @@
+# Ultralytics 🚀 AGPL-3.0 License - https://ultralytics.com/license
+"""Multi-instance CPU inference: DetectMultiBackend replicas in worker processes pinned to disjoint cores."""
+
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import numpy as np
+import torch
+
+from utils.general import LOGGER
+
+
+def available_cores():
+    """Returns the sorted CPU cores this process may run on."""
+    return sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+
+
+def _worker(cores, threads, weights, kwargs, jobs, results):
+    """Replica process: pins itself to `cores`, loads the model and runs jobs until the None end marker."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    from models.common import DetectMultiBackend  # scoped, imported after the thread count is set
+
+    model = DetectMultiBackend(weights, device=torch.device("cpu"), **kwargs)
+    results.put((None, os.getpid()))  # ready
+    with torch.inference_mode():
+        while (job := jobs.get()) is not None:
+            i, im = job
+            try:
+                y = model(model.preprocess(im) if im.dtype == np.uint8 else torch.from_numpy(im))
+                y = y[0] if isinstance(y, (list, tuple)) else y  # predictions
+                y = y.numpy()
+                results.put((i, y.copy() if model.zero_copy else y))  # pickled later by the queue's feeder thread
+            except Exception as e:
+                results.put((i, e))
+
+
+class ReplicaPool:
+    """
+    Runs `replicas` DetectMultiBackend CPU replicas, each in its own process pinned to `threads` dedicated cores with
+    `threads` intra-op threads, behind one submit/result API.
+
+    One model with many intra-op threads scales poorly at small input sizes; several replicas with a few threads each
+    keep all cores busy when requests are submitted concurrently. Jobs go to whichever replica is free. Submit uint8
+    images (CHW or BCHW, normalized in the replica, 4x less to transfer) or normalized float arrays/tensors.
+
+    Example:
+        ```python
+        pool = ReplicaPool("yolov5s.pt", replicas=4, threads=2)
+        ids = [pool.submit(im) for im in images]  # uint8 CHW letterboxed images
+        preds = [pool.result(i) for i in ids]  # raw predictions, for non_max_suppression()
+        pool.close()
+        ```
+    """
+
+    def __init__(self, weights, replicas=2, threads=1, cores=None, **kwargs):
+        """Starts `replicas` worker processes on disjoint slices of `cores` (default: all available) and waits until
+        every replica has loaded `weights`; `kwargs` are passed to DetectMultiBackend.
+        """
+        cores = cores or available_cores()
+        if replicas * threads > len(cores):
+            LOGGER.warning(f"WARNING ⚠️ {replicas} replicas x {threads} threads > {len(cores)} cores, cores are shared")
+        ctx = mp.get_context("spawn")  # fork is unsafe once OpenMP threads exist
+        self.jobs, self.results = ctx.Queue(), ctx.Queue()
+        self.replicas, self.threads = replicas, threads
+        self.cores = [[cores[(r * threads + j) % len(cores)] for j in range(threads)] for r in range(replicas)]
+        self.processes = [
+            ctx.Process(target=_worker, args=(c, threads, str(weights), kwargs, self.jobs, self.results), daemon=True)
+            for c in self.cores
+        ]
+        for p in self.processes:
+            p.start()
+        for _ in self.processes:
+            self.results.get(timeout=600)  # ready
+        self.count = 0
+        self.done = {}  # job id -> finished result not yet collected
+
+    def submit(self, im):
+        """Queues image batch `im` for the next free replica and returns its job id."""
+        im = im.cpu().numpy() if isinstance(im, torch.Tensor) else np.ascontiguousarray(im)
+        self.count += 1
+        self.jobs.put((self.count, im))
+        return self.count
+
+    def result(self, i, timeout=None):
+        """Waits for and returns the predictions of job `i` as a tensor, re-raising a replica exception."""
+        deadline = None if timeout is None else time.time() + timeout
+        while i not in self.done:
+            try:
+                j, y = self.results.get(timeout=None if deadline is None else max(deadline - time.time(), 0))
+            except queue.Empty:
+                raise TimeoutError(f"replica result {i} not ready after {timeout}s") from None
+            self.done[j] = y
+        y = self.done.pop(i)
+        if isinstance(y, Exception):
+            raise y
+        return torch.from_numpy(y)
+
+    def wait(self):
+        """Waits for the next finished job and returns its (job id, predictions), re-raising a replica exception."""
+        if not self.done:
+            j, y = self.results.get()
+            self.done[j] = y
+        i = next(iter(self.done))
+        return i, self.result(i)
+
+    def __call__(self, im):
+        """Runs image batch `im` synchronously on a free replica."""
+        return self.result(self.submit(im))
+
+    def close(self):
+        """Stops all replicas."""
+        for _ in self.processes:
+            self.jobs.put(None)
+        for p in self.processes:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+
+
+def autotune(weights, imgsz=640, batch_size=1, slo_ms=100.0, n=64, cores=None, **kwargs):
+    """
+    Searches replicas x threads partitions of the CPU cores for the highest throughput with p95 latency within `slo_ms`.
+
+    Thread counts are powers of two up to the core count; for each, replica counts from 1 to cores // threads in powers
+    of two plus the full partition are measured closed-loop with one request in flight per replica.
+
+    Args:
+        weights (Path | str): Model weights for DetectMultiBackend.
+        imgsz (int): Inference size in pixels (default: 640).
+        batch_size (int): Images per request (default: 1).
+        slo_ms (float): p95 latency objective in milliseconds (default: 100.0).
+        n (int): Timed requests per configuration (default: 64).
+        cores (list[int], optional): Cores to partition, all available by default.
+        **kwargs: Passed to DetectMultiBackend.
+
+    Returns:
+        (tuple): Best (replicas, threads) meeting the objective, or None, and a list of
+            [replicas, threads, images/s, p50 ms, p95 ms] rows for every configuration.
+    """
+    cores = cores or available_cores()
+    im = np.random.randint(0, 255, (batch_size, 3, imgsz, imgsz), dtype=np.uint8)
+    rows, best = [], None
+    threads = 1
+    while threads <= len(cores):
+        m = len(cores) // threads
+        for replicas in sorted({2**k for k in range(m.bit_length()) if 2**k <= m} | {m}):
+            pool = ReplicaPool(weights, replicas, threads, cores, **kwargs)
+            try:
+                for i in [pool.submit(im) for _ in range(replicas)]:
+                    pool.result(i)  # warmup
+                latency, inflight, t0 = [], {}, time.time()
+                for _ in range(replicas):  # one request in flight per replica
+                    inflight[pool.submit(im)] = time.time()
+                submitted = replicas
+                while inflight:
+                    i, _ = pool.wait()
+                    latency.append((time.time() - inflight.pop(i)) * 1e3)
+                    if submitted < n:
+                        inflight[pool.submit(im)] = time.time()
+                        submitted += 1
+                fps = n * batch_size / (time.time() - t0)
+            finally:
+                pool.close()
+            p50, p95 = np.percentile(latency, (50, 95))
+            rows.append([replicas, threads, round(fps, 1), round(p50, 1), round(p95, 1)])
+            s = f"{replicas:>3} replicas x {threads:>2} threads"
+            LOGGER.info(f"{s}: {fps:.1f} images/s, p50/p95 {p50:.1f}/{p95:.1f}ms")
+            if p95 <= slo_ms and (best is None or fps > best[2]):
+                best = replicas, threads, fps
+        threads *= 2
+    if best is None:
+        LOGGER.warning(f"WARNING ⚠️ No configuration meets the {slo_ms:g}ms p95 latency objective")
+        return None, rows
+    LOGGER.info(f"Best: {best[0]} replicas x {best[1]} threads, {best[2]:.1f} images/s within {slo_ms:g}ms p95")
+    return best[:2], rows
@@ -5,8 +5,10 @@ import math
 import os
 import platform
 import subprocess
+import threading
 import time
 import warnings
+from collections import OrderedDict
 from contextlib import contextmanager
 from copy import deepcopy
 from pathlib import Path
@@ -250,7 +252,15 @@ def sparsity(model):
 
 
 def prune(model, amount=0.3):
-    """Prunes Conv2d layers in a model to a specified sparsity using L1 unstructured pruning."""
+    """
+    Removes `amount` of the channels of a YOLOv5 model, ranked by BatchNorm weight, see BaseModel.prune().
+
+    Unlike unstructured weight masks, which dense kernels multiply anyway, removed channels make the model smaller and
+    faster; fine-tune afterwards with train.py. Other modules fall back to L1 unstructured pruning of their Conv2d
+    weights in place.
+    """
+    if hasattr(model, "prune"):
+        return model.prune(amount)
     import torch.nn.utils.prune as prune
 
     for name, m in model.named_modules():
@@ -258,6 +268,29 @@ def prune(model, amount=0.3):
             prune.l1_unstructured(m, name="weight", amount=amount)  # prune
             prune.remove(m, "weight")  # make permanent
     LOGGER.info(f"Model pruned to {sparsity(model):.3g} global sparsity")
+    return model
+
+
+def prune_conv(m, out=None, inp=None):
+    """Keeps output channels `out` and input channels `inp` (index tensors, None keeps all) of a Conv2d or a Conv with
+    BatchNorm in place.
+    """
+    conv, bn = (m.conv, getattr(m, "bn", None)) if hasattr(m, "conv") else (m, None)
+    assert conv.groups == 1, "grouped convolutions are not prunable"
+    w = conv.weight
+    if out is not None:
+        conv.out_channels = len(out)
+        if conv.bias is not None:
+            conv.bias = nn.Parameter(conv.bias.data[out].clone(), requires_grad=conv.bias.requires_grad)
+        if bn is not None:
+            bn.num_features = len(out)
+            bn.weight = nn.Parameter(bn.weight.data[out].clone(), requires_grad=bn.weight.requires_grad)
+            bn.bias = nn.Parameter(bn.bias.data[out].clone(), requires_grad=bn.bias.requires_grad)
+            bn.running_mean, bn.running_var = bn.running_mean[out].clone(), bn.running_var[out].clone()
+    if inp is not None:
+        conv.in_channels = len(inp)
+    data = w.data if out is None else w.data[out]
+    conv.weight = nn.Parameter((data if inp is None else data[:, inp]).clone(), requires_grad=w.requires_grad)
 
 
 def fuse_conv_and_bn(conv, bn):
@@ -298,7 +331,7 @@ def model_info(model, verbose=False, imgsz=640):
     """
     Prints model summary including layers, parameters, gradients, and FLOPs; imgsz may be int or list.
 
-    Example: img_size=640 or img_size=[640, 320]
+    Returns the number of parameters and GFLOPs at `imgsz` (None without thop). Example: img_size=640 or [640, 320]
     """
     n_p = sum(x.numel() for x in model.parameters())  # number parameters
     n_g = sum(x.numel() for x in model.parameters() if x.requires_grad)  # number gradients
@@ -317,12 +350,14 @@ def model_info(model, verbose=False, imgsz=640):
         im = torch.empty((1, p.shape[1], stride, stride), device=p.device)  # input image in BCHW format
         flops = thop.profile(deepcopy(model), inputs=(im,), verbose=False)[0] / 1e9 * 2  # stride GFLOPs
         imgsz = imgsz if isinstance(imgsz, list) else [imgsz, imgsz]  # expand if int/float
-        fs = f", {flops * imgsz[0] / stride * imgsz[1] / stride:.1f} GFLOPs"  # 640x640 GFLOPs
+        flops = flops * imgsz[0] / stride * imgsz[1] / stride  # 640x640 GFLOPs
+        fs = f", {flops:.1f} GFLOPs"
     except Exception:
-        fs = ""
+        flops, fs = None, ""
 
     name = Path(model.yaml_file).stem.replace("yolov5", "YOLOv5") if hasattr(model, "yaml_file") else "Model"
     LOGGER.info(f"{name} summary: {len(list(model.modules()))} layers, {n_p} parameters, {n_g} gradients{fs}")
+    return n_p, flops
 
 
 def scale_img(img, ratio=1.0, same_shape=False, gs=32):  # img(16,3,256,416)
@@ -480,3 +515,92 @@ class ModelEMA:
         default.
         """
         copy_attr(self.ema, model, include, exclude)
+
+
+class InputBuffers:
+    """
+    Reusable model input tensors keyed by shape, device and dtype, filled from uint8 images and normalized in place.
+
+    Each key owns a ring of `slots` buffers per calling thread: a returned tensor stays valid for the next `slots - 1`
+    calls of that thread, so raise `slots` when batches are prefetched by a pipeline. Threads never share a buffer, and
+    a single slot stays hot in cache. Images given as a list are copied into the batch buffer row by row without
+    stacking. For CUDA devices the uint8 batch is staged in pinned host memory and copied asynchronously. The uint8 to
+    fp16/32 conversion and 0-255 to 0.0-1.0 scaling both run in place in the output buffer (a mixed-dtype
+    `torch.div(..., out=)` is slower on CPU). Buffers of `memory_format=torch.channels_last` are NHWC in memory; CHW
+    views of HWC images, e.g. `letterbox(im)[0].transpose(2, 0, 1)`, then copy in without a transpose. At most
+    `max_keys` keys are kept, least recently used first out, so arbitrary image sizes and exited threads do not grow
+    the pool without bound.
+    """
+
+    def __init__(self, slots=1, pin=True, max_keys=16):
+        """Initializes an empty pool with `slots` buffers per key for up to `max_keys` keys, staging CUDA inputs in
+        pinned memory if `pin`.
+        """
+        self.slots = slots
+        self.pin = pin and torch.cuda.is_available()
+        self.max_keys = max_keys
+        self.buffers = OrderedDict()  # (shape, device, dtype, format, thread) -> list of (host, device uint8, output)
+        self.index = {}  # (shape, device, dtype, format, thread) -> next slot
+        self.allocations = 0  # tensors allocated
+        self.evictions = 0  # keys evicted
+        self.bytes = 0  # bytes allocated
+        self.calls = 0
+        self.images = 0
+
+    def __call__(self, im, device, dtype, memory_format=torch.contiguous_format):
+        """Returns uint8 images `im` (numpy array or tensor, CHW or BCHW, or a list of CHW) as a 0.0-1.0 `dtype`
+        tensor on `device` in `memory_format`, overwritten `slots` calls later.
+        """
+        batched = not isinstance(im, (list, tuple))
+        parts = [torch.as_tensor(x) for x in im] if not batched else [torch.as_tensor(im)]
+        if batched and parts[0].ndim == 3:
+            parts[0] = parts[0][None]  # expand for batch dim
+        shape = tuple(parts[0].shape) if batched else (len(parts), *parts[0].shape)
+        device = torch.device(device)
+        key = shape, device, dtype, memory_format, threading.get_ident()
+        if key in self.buffers:
+            self.buffers.move_to_end(key)
+        elif len(self.buffers) >= self.max_keys:
+            self.index.pop(self.buffers.popitem(last=False)[0], None)  # least recently used
+            self.evictions += 1
+        ring = self.buffers.setdefault(key, [])
+        i = self.index.get(key, 0)
+        self.index[key] = (i + 1) % self.slots
+        if i == len(ring):
+            ring.append(self._allocate(shape, device, dtype, memory_format))
+        host, staged, out = ring[i]
+
+        if staged is None or parts[0].device == device:  # convert straight into the output
+            for x, o in zip(parts, [out] if batched else out):
+                o.copy_(x)  # uint8 to fp16/32
+        else:  # stage in (pinned) host memory, copy asynchronously, convert on the device
+            if batched and parts[0].is_pinned():
+                host = parts[0]  # already pinned, e.g. by a DataLoader with pin_memory=True
+            else:
+                for x, h in zip(parts, [host] if batched else host):
+                    h.copy_(x)
+            staged.copy_(host, non_blocking=host.is_pinned())
+            out.copy_(staged)  # uint8 to fp16/32
+        out /= 255  # 0 - 255 to 0.0 - 1.0, in place
+        self.calls += 1
+        self.images += shape[0]
+        return out
+
+    def _allocate(self, shape, device, dtype, memory_format=torch.contiguous_format):
+        """Allocates the (host uint8, device uint8, output) buffers of one slot, host buffers for CUDA devices only."""
+        out = torch.empty(shape, dtype=dtype, device=device, memory_format=memory_format)
+        host = staged = None
+        if device.type != "cpu":
+            host = torch.empty(shape, dtype=torch.uint8, pin_memory=self.pin, memory_format=memory_format)
+            staged = torch.empty(shape, dtype=torch.uint8, device=device, memory_format=memory_format)
+        buffers = [x for x in (host, staged, out) if x is not None]
+        self.allocations += len(buffers)
+        self.bytes += sum(x.numel() * x.element_size() for x in buffers)
+        return host, staged, out
+
+    def summary(self):
+        """Returns a one-line summary of buffers allocated versus images served."""
+        return (
+            f"{self.allocations} input buffers ({self.bytes / 2**20:.1f} MB) allocated for {self.images} images in "
+            f"{self.calls} batches, {self.evictions} shapes evicted"
+        )
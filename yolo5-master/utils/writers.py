@@ -0,0 +1,130 @@
+# Ultralytics 🚀 AGPL-3.0 License - https://ultralytics.com/license
+"""Buffered result writers for labels, CSV, JSONL and crops, written in bulk and optionally from a background thread."""
+
+import csv
+import io
+import json
+import os
+import queue
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from PIL import Image
+
+
+class ResultWriter:
+    """
+    Collects detection outputs in memory and writes them to disk in bulk.
+
+    Text is buffered per file and appended with a single write per file on every flush instead of one open/close per
+    row. Files that receive rows on every flush (CSV, JSONL) stay open until `close()`. Crops are JPEG-encoded on flush.
+    With `background=True` flushes run in a daemon thread, so the caller only pays for formatting and buffering.
+    """
+
+    def __init__(self, flush_rows=1000, flush_crops=64, background=False):
+        """Initializes empty buffers, flushing every `flush_rows` text rows or `flush_crops` crops."""
+        self.flush_rows = flush_rows
+        self.flush_crops = flush_crops
+        self.text = defaultdict(list)  # path -> buffered text chunks
+        self.crops = []  # (path, RGB image) pairs
+        self.rows = 0
+        self.keep_open = set()  # paths of files held open between flushes
+        self.files = {}  # path -> open file handle
+        self.csv_paths = set()  # CSV files whose header is written or already on disk
+        self.crop_index = {}  # crop path -> last used increment
+        self.crop_names = {}  # crop directory -> file names on disk at first use and names taken since
+        self.error = None
+        self.queue = queue.Queue(4) if background else None
+        if background:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def write(self, path, lines, keep_open=False):
+        """Buffers `lines` (str, newline-terminated) to append to `path`; `keep_open` for files written repeatedly."""
+        path = str(path)
+        self.text[path].extend(lines)
+        if keep_open:
+            self.keep_open.add(path)
+        self.rows += len(lines)
+        if self.rows >= self.flush_rows:
+            self.flush()
+
+    def write_csv(self, path, rows, header):
+        """Buffers CSV `rows`, starting a new file with `header`; same format as csv.DictWriter."""
+        path = str(path)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if path not in self.csv_paths:
+            self.csv_paths.add(path)
+            if not os.path.isfile(path):
+                writer.writerow(header)
+        writer.writerows(rows)
+        self.write(path, [buffer.getvalue()], keep_open=True)
+
+    def write_jsonl(self, path, record):
+        """Buffers `record` as one JSON line."""
+        self.write(path, [json.dumps(record) + "\n"], keep_open=True)
+
+    def crop(self, file, im, BGR=False):
+        """Buffers image `im` to save as JPEG `file`, incremented as file-2.jpg, file-3.jpg... like increment_path()."""
+        file = Path(file).with_suffix(".jpg")
+        names = self.crop_names.get(file.parent)
+        if names is None:  # one directory listing instead of an exists() call per crop
+            names = self.crop_names[file.parent] = set(os.listdir(file.parent)) if file.parent.is_dir() else set()
+        n = self.crop_index.get(file, 0) + 1  # own earlier crops are counted, they may not be on disk yet
+        f = file if n == 1 else file.with_name(f"{file.stem}-{n}{file.suffix}")
+        while f.name in names:  # skip names taken by earlier runs
+            n += 1
+            f = file.with_name(f"{file.stem}-{n}{file.suffix}")
+        names.add(f.name)
+        self.crop_index[file] = n
+        self.crops.append((f, im[..., ::-1] if BGR else im))
+        if len(self.crops) >= self.flush_crops:
+            self.flush()
+
+    def flush(self):
+        """Hands all buffered output to the writer thread, or writes it now without one."""
+        text, crops = self.text, self.crops
+        self.text, self.crops, self.rows = defaultdict(list), [], 0
+        if self.queue is None:
+            self._write(text, crops)
+        else:
+            if self.error:
+                raise self.error
+            self.queue.put((text, crops))
+
+    def close(self):
+        """Flushes remaining output, stops the writer thread and closes all files."""
+        self.flush()
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join()
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        if self.error:
+            raise self.error
+
+    def _run(self):
+        """Writes queued buffers until the end marker, keeping the first exception for the caller."""
+        while (item := self.queue.get()) is not None:
+            if self.error is None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    self.error = e
+
+    def _write(self, text, crops):
+        """Appends every buffered text chunk with one write per file and saves crops."""
+        for path, chunks in text.items():
+            f = self.files.get(path) or open(path, "a", newline="")
+            f.write("".join(chunks))
+            if path in self.keep_open:
+                self.files[path] = f
+                f.flush()
+            else:
+                f.close()
+        for f, im in crops:
+            f.parent.mkdir(parents=True, exist_ok=True)
+            Image.fromarray(im).save(f, quality=95, subsampling=0)  # same encoding as save_one_box()
@@ -37,10 +37,13 @@ if str(ROOT) not in sys.path:
 ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 
 from models.common import DetectMultiBackend
+from models.experimental import Ensemble
+from models.yolo import DetectionModel
 from utils.callbacks import Callbacks
 from utils.dataloaders import create_dataloader
 from utils.general import (
     LOGGER,
+    NMS_METHODS,
     TQDM_BAR_FORMAT,
     Profile,
     check_dataset,
@@ -51,14 +54,15 @@ from utils.general import (
     colorstr,
     increment_path,
     non_max_suppression,
+    non_max_suppression_wbf,
     print_args,
-    scale_boxes,
+    scale_boxes_batch,
     xywh2xyxy,
     xyxy2xywh,
 )
 from utils.metrics import ConfusionMatrix, ap_per_class, box_iou
 from utils.plots import output_to_target, plot_images, plot_val_study
-from utils.torch_utils import select_device, smart_inference_mode
+from utils.torch_utils import InputBuffers, select_device, smart_inference_mode
 
 
 def save_one_txt(predn, save_conf, shape, file):
@@ -193,11 +197,12 @@ def run(
     conf_thres=0.001,  # confidence threshold
     iou_thres=0.6,  # NMS IoU threshold
     max_det=300,  # maximum detections per image
-    task="val",  # train, val, test, speed or study
+    task="val",  # train, val, test, speed, study or nms
     device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
     workers=8,  # max dataloader workers (per RANK in DDP mode)
     single_cls=False,  # treat as single-class dataset
     augment=False,  # augmented inference
+    wbf=False,  # fuse augmented views and ensemble members with Weighted Box Fusion instead of joint NMS
     verbose=False,  # verbose output
     save_txt=False,  # save results to *.txt
     save_hybrid=False,  # save label+prediction hybrid results to *.txt
@@ -208,6 +213,9 @@ def run(
     exist_ok=False,  # existing project/name ok, do not increment
     half=True,  # use FP16 half-precision inference
     dnn=False,  # use OpenCV DNN for ONNX inference
+    nms="greedy",  # NMS algorithm, greedy, merge, matrix or cluster
+    compile_mode="",  # run PyTorch models compiled, jit (TorchScript freeze) or inductor (torch.compile)
+    compile_bucket=0,  # pad inputs to multiples of this many pixels to share compiled shapes (0 for exact shapes)
     model=None,
     dataloader=None,
     save_dir=Path(""),
@@ -228,11 +236,14 @@ def run(
         conf_thres (float, optional): Confidence threshold for object detection. Default is 0.001.
         iou_thres (float, optional): IoU threshold for Non-Maximum Suppression (NMS). Default is 0.6.
         max_det (int, optional): Maximum number of detections per image. Default is 300.
-        task (str, optional): Task type - 'train', 'val', 'test', 'speed', or 'study'. Default is 'val'.
+        task (str, optional): Task type - 'train', 'val', 'test', 'speed', 'study', or 'nms'. Default is 'val'.
         device (str, optional): Device to use for computation, e.g., '0' or '0,1,2,3' for CUDA or 'cpu' for CPU. Default is ''.
         workers (int, optional): Number of dataloader workers. Default is 8.
         single_cls (bool, optional): Treat dataset as a single class. Default is False.
         augment (bool, optional): Enable augmented inference. Default is False.
+        wbf (bool, optional): With `augment` or several `weights` on PyTorch models, suppress each augmented view and
+            ensemble member separately and fuse them with Weighted Box Fusion instead of one NMS over all of them.
+            Default is False.
         verbose (bool, optional): Enable verbose output. Default is False.
         save_txt (bool, optional): Save results to *.txt files. Default is False.
         save_hybrid (bool, optional): Save label and prediction hybrid results to *.txt files. Default is False.
@@ -243,6 +254,11 @@ def run(
         exist_ok (bool, optional): Overwrite existing project/name without incrementing. Default is False.
         half (bool, optional): Use FP16 half-precision inference. Default is True.
         dnn (bool, optional): Use OpenCV DNN for ONNX inference. Default is False.
+        nms (str, optional): NMS algorithm - 'greedy', 'merge', 'matrix', or 'cluster'. Default is 'greedy'.
+        compile_mode (str, optional): Run PyTorch models compiled per input shape, 'jit' or 'inductor'; '' runs eagerly.
+            Default is ''.
+        compile_bucket (int, optional): With `compile_mode`, pad inputs to multiples of this many pixels so rectangular
+            batches share compiled shapes, 0 for exact shapes. Default is 0.
         model (torch.nn.Module, optional): Model object for training. Default is None.
         dataloader (torch.utils.data.DataLoader, optional): Dataloader object. Default is None.
         save_dir (Path, optional): Directory to save results. Default is Path('').
@@ -267,8 +283,20 @@ def run(
         (save_dir / "labels" if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
 
         # Load model
-        model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+        model = DetectMultiBackend(
+            weights,
+            device=device,
+            dnn=dnn,
+            data=data,
+            fp16=half,
+            zero_copy=True,  # outputs reach NMS before the next call overwrites them
+            compile_mode=compile_mode,
+            compile_bucket=compile_bucket,
+        )
         stride, pt, jit, engine = model.stride, model.pt, model.jit, model.engine
+        if wbf and not (pt and (augment or isinstance(model.model, Ensemble))):
+            LOGGER.warning("WARNING ⚠️ --wbf requires --augment or several --weights with PyTorch models, ignoring")
+            wbf = False
         imgsz = check_img_size(imgsz, s=stride)  # check image size
         half = model.fp16  # FP16 supported on limited backends with CUDA
         if engine:
@@ -298,7 +326,8 @@ def run(
                 f"{weights} ({ncm} classes) trained on different --data than what you passed ({nc} "
                 f"classes). Pass correct combination of --weights and --data that are trained together."
             )
-        model.warmup(imgsz=(1 if pt else batch_size, 3, imgsz, imgsz))  # warmup
+        if not (pt and compile_mode):  # compiled models warm up on each input shape actually inferred, see below
+            model.warmup(imgsz=(1 if pt else batch_size, 3, imgsz, imgsz))  # warmup
         pad, rect = (0.0, False) if task == "speed" else (0.5, pt)  # square inference for benchmarks
         task = task if task in ("train", "val", "test") else "val"  # path to train/val/test images
         dataloader = create_dataloader(
@@ -324,21 +353,25 @@ def run(
     dt = Profile(device=device), Profile(device=device), Profile(device=device)  # profiling times
     loss = torch.zeros(3, device=device)
     jdict, stats, ap, ap_class = [], [], [], []
+    inputs = InputBuffers()  # reused input tensors
+    warm = set()  # batch shapes compiled before their timed inference, with compile_mode
     callbacks.run("on_val_start")
     pbar = tqdm(dataloader, desc=s, bar_format=TQDM_BAR_FORMAT)  # progress bar
     for batch_i, (im, targets, paths, shapes) in enumerate(pbar):
         callbacks.run("on_val_batch_start")
         with dt[0]:
             if cuda:
-                im = im.to(device, non_blocking=True)
                 targets = targets.to(device)
-            im = im.half() if half else im.float()  # uint8 to fp16/32
-            im /= 255  # 0 - 255 to 0.0 - 1.0
+            im = inputs(im, device, torch.half if half else torch.float)  # to a reused buffer, uint8 to 0.0-1.0 fp16/32
             nb, _, height, width = im.shape  # batch size, channels, height, width
 
         # Inference
+        compiled = pt and compile_mode and not (training or augment or wbf)  # these run eagerly
+        if compiled and im.shape not in warm:  # compile each new shape outside the timed inference
+            warm.add(im.shape)
+            model.warmup(imgsz=im.shape)
         with dt[1]:
-            preds, train_out = model(im) if compute_loss else (model(im, augment=augment), None)
+            preds, train_out = model(im) if compute_loss else (model(im, augment=augment, sources=wbf), None)
 
         # Loss
         if compute_loss:
@@ -348,13 +381,45 @@ def run(
         targets[:, 2:] *= torch.tensor((width, height, width, height), device=device)  # to pixels
         lb = [targets[targets[:, 0] == i, 1:] for i in range(nb)] if save_hybrid else []  # for autolabelling
         with dt[2]:
-            preds = non_max_suppression(
-                preds, conf_thres, iou_thres, labels=lb, multi_label=True, agnostic=single_cls, max_det=max_det
-            )
+            if wbf:  # one block of rows per augmented view and ensemble member
+                preds, sources = preds  # rows of each Ensemble member, None for the views of augmented inference
+                preds = non_max_suppression_wbf(
+                    preds,
+                    sources or len(DetectionModel.tta_scales),
+                    conf_thres,
+                    iou_thres,
+                    labels=lb,
+                    multi_label=True,
+                    agnostic=single_cls,
+                    max_det=max_det,
+                    method=nms,
+                )
+            else:
+                preds = non_max_suppression(
+                    preds,
+                    conf_thres,
+                    iou_thres,
+                    labels=lb,
+                    multi_label=True,
+                    agnostic=single_cls,
+                    max_det=max_det,
+                    method=nms,
+                )
+
+        # Native-space predictions and labels of the whole batch, each rescaled in one op
+        if single_cls:
+            for pred in preds:
+                pred[:, 5] = 0
+        shape0, ratio_pad = [s[0] for s in shapes], [(r[0][0], *r[1]) for _, r in shapes]  # (h0, w0), (gain, pad)
+        n = [len(p) for p in preds]  # predictions per image
+        index = torch.arange(nb, device=device).repeat_interleave(torch.tensor(n, device=device))  # image of each pred
+        predns = scale_boxes_batch(im.shape[2:], torch.cat(preds), index, shape0, ratio_pad).split(n)
+        tboxes = scale_boxes_batch(im.shape[2:], xywh2xyxy(targets[:, 2:6]), targets[:, 0].long(), shape0, ratio_pad)
 
         # Metrics
-        for si, pred in enumerate(preds):
-            labels = targets[targets[:, 0] == si, 1:]
+        for si, (pred, predn) in enumerate(zip(preds, predns)):
+            ti = targets[:, 0] == si
+            labels = targets[ti, 1:]
             nl, npr = labels.shape[0], pred.shape[0]  # number of labels, predictions
             path, shape = Path(paths[si]), shapes[si][0]
             correct = torch.zeros(npr, niou, dtype=torch.bool, device=device)  # init
@@ -367,17 +432,9 @@ def run(
                         confusion_matrix.process_batch(detections=None, labels=labels[:, 0])
                 continue
 
-            # Predictions
-            if single_cls:
-                pred[:, 5] = 0
-            predn = pred.clone()
-            scale_boxes(im[si].shape[1:], predn[:, :4], shape, shapes[si][1])  # native-space pred
-
             # Evaluate
             if nl:
-                tbox = xywh2xyxy(labels[:, 1:5])  # target boxes
-                scale_boxes(im[si].shape[1:], tbox, shape, shapes[si][1])  # native-space labels
-                labelsn = torch.cat((labels[:, 0:1], tbox), 1)  # native-space labels
+                labelsn = torch.cat((labels[:, 0:1], tboxes[ti]), 1)  # native-space labels
                 correct = process_batch(predn, labelsn, iouv)
                 if plots:
                     confusion_matrix.process_batch(predn, labelsn)
@@ -467,6 +524,128 @@ def run(
     return (mp, mr, map50, map, *(loss.cpu() / len(dataloader)).tolist()), maps, t
 
 
+@smart_inference_mode()
+def benchmark_nms(
+    weights=None,
+    data=None,
+    imgsz=640,
+    device="",
+    conf_thres=0.001,
+    iou_thres=0.6,
+    max_det=300,
+    workers=8,
+    batch_sizes=(1, 2, 4, 8, 16, 32, 64),
+    n=10,
+):
+    """
+    Benchmarks the per-image NMS loop against batched NMS on real model outputs and checks both give identical results.
+
+    Args:
+        weights (str | Path): Path to the model weights.
+        data (str | Path): Path to the dataset YAML file, the first validation images are used.
+        imgsz (int): Inference image size in pixels. Default is 640.
+        device (str): Device to run on, i.e. 'cpu' or '0'. Default is '' (auto).
+        conf_thres (float): Confidence threshold, the val.py default gives the realistic (large) candidate count.
+        iou_thres (float): NMS IoU threshold.
+        max_det (int): Maximum detections per image.
+        workers (int): Maximum dataloader workers.
+        batch_sizes (tuple[int]): Batch sizes to benchmark.
+        n (int): Timed repeats per batch size.
+
+    Returns:
+        (list[tuple]): (batch size, loop ms, batched ms, identical) per batch size.
+
+    Example:
+        ```python
+        $ python val.py --task nms --data coco128.yaml --weights yolov5s.pt --device cpu
+        ```
+    """
+    device = select_device(device)
+    model = DetectMultiBackend(weights, device=device, data=data)
+    imgsz = check_img_size(imgsz, s=model.stride)
+    data = check_dataset(data)
+    bs = max(batch_sizes)
+    dataloader = create_dataloader(
+        data["val"], imgsz, bs, model.stride, pad=0.0, rect=False, workers=workers, prefix=colorstr("nms: ")
+    )[0]
+    im = next(iter(dataloader))[0].to(device)
+    im = im.repeat((bs + len(im) - 1) // len(im), 1, 1, 1)[:bs]  # fill batch if dataset is smaller
+    im = (im.half() if model.fp16 else im.float()) / 255
+    preds = []
+    for x in im.split(8):  # inference in chunks to bound memory
+        y = model(x)
+        preds.append((y[0] if isinstance(y, (list, tuple)) else y).clone())  # predictions, outputs may alias buffers
+    preds = torch.cat(preds)
+
+    LOGGER.info(f"\n{'batch':>8}{'loop (ms)':>12}{'batched (ms)':>14}{'speedup':>10}{'identical':>11}")
+    results = []
+    for b in batch_sizes:
+        t, out = [], []
+        for batched in (False, True):
+            dt = Profile(device=device)
+            for _ in range(n):
+                with dt:
+                    y = non_max_suppression(preds[:b], conf_thres, iou_thres, max_det=max_det, batched=batched)
+            t.append(dt.t / n * 1e3)
+            out.append(y)
+        same = all(torch.equal(x, y) for x, y in zip(*out))
+        results.append((b, *t, same))
+        LOGGER.info(f"{b:>8}{t[0]:>12.2f}{t[1]:>14.2f}{t[0] / t[1]:>9.2f}x{str(same):>11}")
+    return results
+
+
+@smart_inference_mode()
+def benchmark_nms_methods(device="", sizes=(500, 1000, 3000, 10000), iou_thres=0.6, nc=80, n=5):
+    """
+    Benchmarks NMS_METHODS on synthetic crowded frames, ~6 heavily overlapping candidates per object in a 1280 image.
+
+    Objects get random classes (mostly >= 1). Every method is checked to give identical detections with batched and
+    per-image NMS, and the detections only one of cluster and greedy NMS keeps are counted: up to the 3000 candidates
+    cluster NMS considers, only boxes at IoU == `iou_thres` up to greedy's float32 class-offset rounding.
+
+    Args:
+        device (str): Device to run on, i.e. 'cpu' or '0'. Default is '' (auto).
+        sizes (tuple[int]): Candidate boxes per frame to benchmark.
+        iou_thres (float): NMS IoU threshold.
+        nc (int): Number of classes.
+        n (int): Timed repeats per size and method.
+
+    Returns:
+        (list[tuple]): (candidates, {method: (ms, detections)}, identical, cluster vs greedy differences) per size.
+    """
+    device = select_device(device)
+    s = "".join(f"{m + ' (ms/dets)':>22}" for m in NMS_METHODS)
+    LOGGER.info(f"\n{'boxes':>8}{s}{'identical':>11}{'cluster≠':>10}")
+    results = []
+    for k in sizes:
+        objects = k // 6
+        o = torch.randint(0, objects, (1, k), device=device)
+        xy, wh = torch.rand(1, objects, 2, device=device) * 1280, torch.rand(1, objects, 2, device=device) * 40 + 10
+        p = torch.zeros(1, k, 5 + nc, device=device)
+        p[..., :2] = xy.gather(1, o[..., None].expand(-1, -1, 2)) + torch.randn(1, k, 2, device=device) * 3
+        p[..., 2:4] = wh.gather(1, o[..., None].expand(-1, -1, 2)) * (1 + 0.1 * torch.randn(1, k, 2, device=device))
+        p[..., 4] = torch.rand(1, k, device=device) * 0.7 + 0.3  # objectness
+        p[..., 5:] = torch.rand(1, k, nc, device=device) * 0.2
+        c = torch.randint(0, nc, (1, objects), device=device).gather(1, o)  # one class per object
+        p[..., 5:].scatter_(2, c[..., None], torch.rand(1, k, 1, device=device) * 0.5 + 0.5)  # crowds of a class
+        r, y = {}, {}
+        for m in NMS_METHODS:
+            non_max_suppression(p, 0.25, iou_thres, max_det=1000, method=m)  # warmup
+            dt = Profile(device=device)
+            for _ in range(n):
+                with dt:
+                    y[m] = non_max_suppression(p, 0.25, iou_thres, max_det=1000, method=m)[0]
+            r[m] = dt.t / n * 1e3, len(y[m])
+        same = all(
+            torch.equal(y[m], non_max_suppression(p, 0.25, iou_thres, max_det=1000, batched=False, method=m)[0])
+            for m in NMS_METHODS
+        )
+        diff = len(set(map(tuple, y["cluster"].tolist())) ^ set(map(tuple, y["greedy"].tolist())))
+        results.append((k, r, same, diff))
+        LOGGER.info(f"{k:>8}" + "".join(f"{f'{t:.2f}/{d}':>22}" for t, d in r.values()) + f"{str(same):>11}{diff:>10}")
+    return results
+
+
 def parse_opt():
     """
     Parse command-line options for configuring YOLOv5 model inference.
@@ -479,11 +658,14 @@ def parse_opt():
         conf_thres (float, optional): Confidence threshold for predictions. Default is 0.001.
         iou_thres (float, optional): IoU threshold for Non-Max Suppression (NMS). Default is 0.6.
         max_det (int, optional): Maximum number of detections per image. Default is 300.
-        task (str, optional): Task type - options are 'train', 'val', 'test', 'speed', or 'study'. Default is 'val'.
+        task (str, optional): Task type - options are 'train', 'val', 'test', 'speed', 'study', or 'nms'. Default is
+            'val'.
         device (str, optional): Device to run the model on. e.g., '0' or '0,1,2,3' or 'cpu'. Default is empty to let the system choose automatically.
         workers (int, optional): Maximum number of dataloader workers per rank in DDP mode. Default is 8.
         single_cls (bool, optional): If set, treats the dataset as a single-class dataset. Default is False.
         augment (bool, optional): If set, performs augmented inference. Default is False.
+        wbf (bool, optional): If set, fuses --augment views and ensemble --weights with Weighted Box Fusion instead of
+            NMS. Default is False.
         verbose (bool, optional): If set, reports mAP by class. Default is False.
         save_txt (bool, optional): If set, saves results to *.txt files. Default is False.
         save_hybrid (bool, optional): If set, saves label+prediction hybrid results to *.txt files. Default is False.
@@ -494,6 +676,10 @@ def parse_opt():
         exist_ok (bool, optional): If set, existing directory will not be incremented. Default is False.
         half (bool, optional): If set, uses FP16 half-precision inference. Default is False.
         dnn (bool, optional): If set, uses OpenCV DNN for ONNX inference. Default is False.
+        nms (str, optional): NMS algorithm - 'greedy', 'merge', 'matrix', or 'cluster'. Default is 'greedy'.
+        compile_mode (str, optional): Run PyTorch models compiled, 'jit' or 'inductor'. Default is '' (eager).
+        compile_bucket (int, optional): Pad inputs to multiples of this many pixels to share compiled shapes. Default
+            is 0 (exact shapes).
 
     Returns:
         argparse.Namespace: Parsed command-line options.
@@ -522,11 +708,12 @@ def parse_opt():
     parser.add_argument("--conf-thres", type=float, default=0.001, help="confidence threshold")
     parser.add_argument("--iou-thres", type=float, default=0.6, help="NMS IoU threshold")
     parser.add_argument("--max-det", type=int, default=300, help="maximum detections per image")
-    parser.add_argument("--task", default="val", help="train, val, test, speed or study")
+    parser.add_argument("--task", default="val", help="train, val, test, speed, study or nms")
     parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
     parser.add_argument("--workers", type=int, default=8, help="max dataloader workers (per RANK in DDP mode)")
     parser.add_argument("--single-cls", action="store_true", help="treat as single-class dataset")
     parser.add_argument("--augment", action="store_true", help="augmented inference")
+    parser.add_argument("--wbf", action="store_true", help="fuse --augment views and ensembles with WBF")
     parser.add_argument("--verbose", action="store_true", help="report mAP by class")
     parser.add_argument("--save-txt", action="store_true", help="save results to *.txt")
     parser.add_argument("--save-hybrid", action="store_true", help="save label+prediction hybrid results to *.txt")
@@ -537,6 +724,9 @@ def parse_opt():
     parser.add_argument("--exist-ok", action="store_true", help="existing project/name ok, do not increment")
     parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
     parser.add_argument("--dnn", action="store_true", help="use OpenCV DNN for ONNX inference")
+    parser.add_argument("--nms", default="greedy", choices=NMS_METHODS, help="NMS algorithm")
+    parser.add_argument("--compile-mode", default="", choices=("", "jit", "inductor"), help="compiled PyTorch mode")
+    parser.add_argument("--compile-bucket", type=int, default=0, help="pad to multiples of this for --compile-mode")
     opt = parser.parse_args()
     opt.data = check_yaml(opt.data)  # check YAML
     opt.save_json |= opt.data.endswith("coco.yaml")
@@ -553,7 +743,7 @@ def main(opt):
         opt (argparse.Namespace): Parsed command-line options.
             This includes values for parameters like 'data', 'weights', 'batch_size', 'imgsz', 'conf_thres',
             'iou_thres', 'max_det', 'task', 'device', 'workers', 'single_cls', 'augment', 'verbose', 'save_txt',
-            'save_hybrid', 'save_conf', 'save_json', 'project', 'name', 'exist_ok', 'half', and 'dnn', essential
+            'save_hybrid', 'save_conf', 'save_json', 'project', 'name', 'exist_ok', 'half', 'dnn', and 'nms', essential
             for configuring the YOLOv5 tasks.
 
     Returns:
@@ -595,8 +785,31 @@ def main(opt):
                 np.savetxt(f, y, fmt="%10.4g")  # save
             subprocess.run(["zip", "-r", "study.zip", "study_*.txt"])
             plot_val_study(x=x)  # plot
+        elif opt.task == "nms":  # per-image vs batched NMS, NMS methods speed and mAP benchmarks
+            # python val.py --task nms --data coco128.yaml --weights yolov5s.pt --device cpu
+            benchmark_nms_methods(opt.device, iou_thres=opt.iou_thres)
+            opt.save_json = False
+            for opt.weights in weights:
+                benchmark_nms(
+                    opt.weights,
+                    opt.data,
+                    opt.imgsz,
+                    opt.device,
+                    opt.conf_thres,
+                    opt.iou_thres,
+                    opt.max_det,
+                    opt.workers,
+                )
+                y = []
+                for opt.nms in NMS_METHODS:
+                    LOGGER.info(f"\nRunning {Path(opt.weights).stem} --nms {opt.nms}...")
+                    (_, _, map50, map, *_), _, t = run(**vars(opt), plots=False)
+                    y.append((opt.nms, map50, map, t[2]))
+                LOGGER.info(f"\n{'nms':>8}{'mAP50':>10}{'mAP50-95':>10}{'NMS (ms)':>10}")
+                for m, map50, map, t in y:
+                    LOGGER.info(f"{m:>8}{map50:>10.4g}{map:>10.4g}{t:>10.2f}")
         else:
-            raise NotImplementedError(f'--task {opt.task} not in ("train", "val", "test", "speed", "study")')
+            raise NotImplementedError(f'--task {opt.task} not in ("train", "val", "test", "speed", "study", "nms")')
 
 
 if __name__ == "__main__":
@@ -1,58 +1,136 @@
+import time
+
+START_TIME = time.time()  # 进程启动时间：统计 import 耗时与 time-to-ready
+
+import argparse
+import contextlib
+import multiprocessing as mp
+import os
+import queue
 import socket
 import av
 import cv2
 import numpy as np
 import struct
-import time
 import threading
 import json
 import torch
 from ultralytics import YOLO
 
-# 加载 YOLOv8 模型
-device = 'cuda' if torch.cuda.is_available() else 'cpu'
-print(f"🚀 Using device: {device}")
+from model_cache import ModelCache
+from send_queue import POLICIES, SendQueue, enable_keepalive
+from stream_profile import LetterboxGeometry, StreamProfile
+from tracker import Tracker
+
+IMPORT_TIME = time.time() - START_TIME
+
+
+# 命令行参数
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--track', action='store_true', help='NMS 后启用目标跟踪，输出稳定的 track_id')
+    parser.add_argument('--imgsz', type=int, default=320, help='起始推理尺寸（延迟预算充裕时逐档升高）')
+    parser.add_argument('--max-imgsz', type=int, default=640, help='推理尺寸上限（实际尺寸按源分辨率与延迟预算选择）')
+    parser.add_argument('--latency-budget', type=float, default=50.0, help='每帧推理延迟预算 (ms)，超出时自动降档')
+    parser.add_argument('--forward-policy', default='drop-oldest', choices=POLICIES, help='结果发送队列满时的策略')
+    parser.add_argument('--forward-queue', type=int, default=4, help='结果发送队列长度（消息数）')
+    parser.add_argument('--sndbuf', type=int, default=64 * 1024, help='SO_SNDBUF 字节数，0 为系统默认')
+    parser.add_argument('--workers', type=int, default=0, help='>0 时以 supervisor 模式启动 N 个推理进程，接受多路摄像头')
+    parser.add_argument('--threads', type=int, default=0, help='每个推理进程的 torch 线程数，0 为 CPU 核数 / workers')
+    parser.add_argument('--jit', action='store_true', help='使用缓存的预融合 TorchScript 模型（每个输入形状一份）')
+    parser.add_argument('--cache-dir', default='~/.cache/yoloserver', help='TorchScript 模型缓存目录')
+    parser.add_argument('--warmup', type=int, default=2, help='开始接受连接前，每个候选推理尺寸的预热次数')
+    parser.add_argument('--source-size', type=int, nargs=2, default=[640, 480], help='预热用的源分辨率 w h')
+    parser.add_argument('--bench', action='store_true', help='workers 从 1 扩展到 CPU 核数，测试聚合 FPS 后退出')
+    parser.add_argument('--bench-seconds', type=float, default=10.0, help='--bench 每档测试时长 (s)')
+    return parser.parse_args()
 
-model = YOLO('yolov8n.pt')
-model.to(device)
-print("✅ YOLOv8n model loaded and moved to", device)
 
-# 启动服务器
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-server_socket.bind(('0.0.0.0', 8080))
-server_socket.listen(1)
-print("✅ YOLO Server listening on port 8080...")
-
-conn, addr = server_socket.accept()
-print(f"📡 Connected by {addr}")
+# 加载 YOLOv8 模型
+def load_model(args, tag=''):
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"🚀 {tag}Using device: {device}")
+
+    if args.jit:
+        model = ModelCache('yolov8n.pt', device, args.cache_dir)
+        for shape in candidate_shapes(args):
+            model.load(shape)  # 缓存命中直接加载，否则导出
+        print(f"✅ {tag}YOLOv8n TorchScript cache {model.cache_dir}/{model.key}-*")
+    else:
+        model = YOLO('yolov8n.pt')
+        model.to(device)
+        print(f"✅ {tag}YOLOv8n model loaded and moved to", device)
+    return model
+
+
+# 可能用到的推理尺寸：不超过源图长边（与 StreamProfile 的选择规则一致）
+def candidate_sizes(args):
+    sizes = StreamProfile(max_size=args.max_imgsz).sizes
+    return [s for s in sizes if s <= max(args.source_size)] or sizes[-1:]
+
+
+# --jit 需预先导出的输入形状：各候选尺寸下 --source-size 的 letterbox 输出 (h, w)
+def candidate_shapes(args):
+    w, h = args.source_size
+    return [LetterboxGeometry((h, w), imgsz).out_shape for imgsz in candidate_sizes(args)]
+
+
+# 预热：按真实输入形状跑完模型的懒初始化（predictor 构建、fuse、各尺寸的 kernel 选择），
+# 避免首帧与降档后的第一帧出现延迟尖峰
+def warmup(model, args, tag=''):
+    w, h = args.source_size
+    image = np.zeros((h, w, 3), dtype=np.uint8)
+    for imgsz in candidate_sizes(args):
+        letterboxed = LetterboxGeometry((h, w), imgsz).apply(image)
+        for _ in range(args.warmup):
+            model(letterboxed, imgsz=imgsz, verbose=False)
+
+
+# 加载 + 预热，并报告启动耗时
+def prepare_model(args, tag=''):
+    load_start = time.time()
+    model = load_model(args, tag)
+    load_time = time.time() - load_start
+    warmup_start = time.time()
+    if args.warmup > 0:
+        warmup(model, args, tag)
+    warmup_time = time.time() - warmup_start
+    print(f"⏱️ {tag}Import={IMPORT_TIME * 1000:.0f}ms | Load={load_time * 1000:.0f}ms | "
+          f"Warmup={warmup_time * 1000:.0f}ms ({args.warmup}x {candidate_sizes(args)}) | "
+          f"Ready={(time.time() - START_TIME) * 1000:.0f}ms")
+    return model
+
+
+# 单路视频流的主循环：接收 -> 丢包统计 -> 解码 -> 推理 -> (跟踪) -> 发送结果
+# out 需提供 put(bytes) / summary()；lock 用于同一进程内多路流共享一个模型
+def serve_stream(conn, model, args, out, tag='', stream_id=None, lock=None):
+    data = b''
+    header_size = struct.calcsize('dQQ')  # capture_time, payload_size, frame_id
+
+    # 丢包统计
+    received_frame_ids = set()
+    expected_frame_id = None
+    received_count = 0
+    lost_count = 0
+    max_frame_id = 0
+
+    # 推理配置：imgsz 选择 + letterbox 几何缓存
+    profile = StreamProfile(args.imgsz, args.max_imgsz, args.latency_budget)
+
+    # 跟踪器（可选）：低分框也送入模型输出，供 ByteTrack 第二阶段关联
+    tracker = Tracker() if args.track else None
+    if tracker:
+        print(f"🎯 {tag}Tracking enabled")
+
+    # FPS & warm-up
+    frame_count = 0
+    processed_frame_count = 0
+    fps = 0.0
+    fps_start_time = time.time()
+
+    # 解码器
+    decoder = av.CodecContext.create('h264', 'r')
 
-# 连接到 receiver
-forward_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-forward_socket.connect(('localhost', 9090))
-print("📤 Connected to Receiver (port 9090)")
-
-# 主循环
-data = b''
-header_size = struct.calcsize('dQQ')  # capture_time, payload_size, frame_id
-
-# 丢包统计
-received_frame_ids = set()
-expected_frame_id = None
-received_count = 0
-lost_count = 0
-max_frame_id = 0
-
-# FPS & warm-up
-frame_count = 0
-processed_frame_count = 0
-fps = 0.0
-fps_start_time = time.time()
-
-# 解码器
-decoder = av.CodecContext.create('h264', 'r')
-
-try:
     while True:
         total_start = time.time()
 
@@ -79,7 +157,7 @@ try:
         max_frame_id = max(max_frame_id, frame_id)
         if expected_frame_id is None:
             expected_frame_id = frame_id
-            print(f"🎯 First received frame ID: {frame_id}")
+            print(f"🎯 {tag}First received frame ID: {frame_id}")
 
         if frame_id not in received_frame_ids:
             received_frame_ids.add(frame_id)
@@ -95,14 +173,14 @@ try:
 
         frame_count += 1
         if frame_count <= 3:
-            print(f"🔥 Skipping warm-up frame {frame_count}/3 (ID={frame_id})")
+            print(f"🔥 {tag}Skipping warm-up frame {frame_count}/3 (ID={frame_id})")
             continue
 
         # 关键：丢弃过期帧（>500ms）
         current_time = time.time()
         age_ms = (current_time - capture_time) * 1000
         if age_ms > 500:
-            print(f"⏳ Skipped stale frame ID={frame_id} (age={age_ms:.1f}ms)")
+            print(f"⏳ {tag}Skipped stale frame ID={frame_id} (age={age_ms:.1f}ms)")
             continue
 
         processed_frame_count += 1
@@ -126,23 +204,39 @@ try:
             if image is None:
                 continue
         except Exception as e:
-            print(f"⚠️ Decode error: {e}")
+            print(f"⚠️ {tag}Decode error: {e}")
             continue
 
-        # YOLOv8 推理
-        infer_start = time.time()
-        results = model(image, imgsz=320, verbose=False)
-        infer_time = (time.time() - infer_start) * 1000
-
-        # 收集检测结果
+        # YOLOv8 推理：按缓存的几何参数 letterbox，模型内部不再缩放
+        geometry = profile.geometry(image.shape[:2])
+        letterboxed = geometry.apply(image)
+        with lock or contextlib.nullcontext():
+            infer_start = time.time()
+            results = model(letterboxed, imgsz=geometry.imgsz, conf=tracker.low_thres if tracker else 0.25,
+                            verbose=False)
+            infer_time = (time.time() - infer_start) * 1000
+        if profile.record(infer_time):
+            print(f"📐 {tag}Inference size -> {profile.imgsz} (budget={args.latency_budget:.0f}ms)")
+
+        # 收集检测结果（坐标映射回源图）
         detections = []
         boxes = results[0].boxes
-        if len(boxes) > 0:
-            xyxy = boxes.xyxy.cpu().numpy()
-            conf = boxes.conf.cpu().numpy()
-            cls = boxes.cls.cpu().numpy().astype(int)
-
-            for i in range(len(boxes)):
+        xyxy = geometry.to_source(boxes.xyxy.cpu().numpy())
+        conf = boxes.conf.cpu().numpy()
+        cls = boxes.cls.cpu().numpy().astype(int)
+        if tracker:
+            # 跟踪：整帧批量关联，输出平滑后的框与 track_id
+            xyxy, conf, cls, ids = tracker.update(xyxy, conf, cls)
+            for i in range(len(ids)):
+                x1, y1, x2, y2 = map(int, xyxy[i])
+                detections.append({
+                    "label": model.names[cls[i]],
+                    "confidence": float(conf[i]),
+                    "bbox": [x1, y1, x2, y2],
+                    "track_id": int(ids[i])
+                })
+        else:
+            for i in range(len(xyxy)):
                 if conf[i] < 0.4:
                     continue
                 x1, y1, x2, y2 = map(int, xyxy[i])
@@ -155,36 +249,243 @@ try:
                 detections.append(detection)
 
         # 发送检测结果到 receiver
-        result_json = json.dumps({
+        result = {
             "capture_time": capture_time,
             "frame_id": frame_id,
             "detections": detections
-        })
-
-        result_bytes = result_json.encode('utf-8')
+        }
+        if stream_id is not None:
+            result["stream"] = stream_id
+        result_bytes = json.dumps(result).encode('utf-8')
         header = struct.pack('dQ', capture_time, len(result_bytes))
-        forward_socket.sendall(header + result_bytes)
+        out.put(header + result_bytes)
 
         # 日志
         process_time = (time.time() - total_start) * 1000
-        print(f"📊 Frame {frame_count:3d} (ID={frame_id}) | "
-              f"Infer={infer_time:5.1f}ms | "
+        print(f"📊 {tag}Frame {frame_count:3d} (ID={frame_id}) | "
+              f"Infer={infer_time:5.1f}ms@{geometry.imgsz} | "
               f"Process={process_time:5.1f}ms | "
               f"FPS={fps:4.1f} | "
               f"Loss={loss_rate:5.1f}% | "
               f"Age={age_ms:5.1f}ms | "
-              f"Detections={len(detections)}")
+              f"Detections={len(detections)} | "
+              f"{out.summary()}")
 
-except KeyboardInterrupt:
-    print("\n🛑 Stopped by user.")
-except Exception as e:
-    import traceback
 
-    traceback.print_exc()
-    print(f"❌ Server error: {e}")
-finally:
-    conn.close()
-    forward_socket.close()
+# 连接到 receiver
+def connect_receiver(args):
+    forward_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    forward_socket.connect(('localhost', 9090))
+    print("📤 Connected to Receiver (port 9090)")
+    forward_queue = SendQueue(forward_socket, 'server->receiver', args.forward_queue, args.forward_policy, args.sndbuf)
+    print(f"📮 Forward queue: policy={args.forward_policy}, size={args.forward_queue}, sndbuf={args.sndbuf}")
+    return forward_socket, forward_queue
+
+
+# 单进程模式：只接受一路摄像头
+def main(args):
+    model = prepare_model(args)
+
+    # 启动服务器
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind(('0.0.0.0', 8080))
+    server_socket.listen(1)
+    print("✅ YOLO Server listening on port 8080...")
+
+    conn, addr = server_socket.accept()
+    print(f"📡 Connected by {addr}")
+    enable_keepalive(conn)  # 发送端掉线时 recv 不会永远挂起
+
+    forward_socket, forward_queue = connect_receiver(args)
+
+    try:
+        serve_stream(conn, model, args, forward_queue)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped by user.")
+    except Exception as e:
+        import traceback
+
+        traceback.print_exc()
+        print(f"❌ Server error: {e}")
+    finally:
+        conn.close()
+        forward_queue.close()
+        forward_socket.close()
+
+
+# ==================== 多进程分片模式 ====================
+# supervisor 接受所有摄像头连接，按当前流数最少分配给 worker 进程（socket 经 Pipe 传递）；
+# 每个 worker 持有独立模型与 torch 线程预算，结果经共享队列汇总到 supervisor 唯一的 receiver 连接
+class ResultPipe:
+    # worker 侧的结果出口：队列满时丢弃最新结果，不阻塞推理
+    def __init__(self, idx, result_queue):
+        self.idx = idx
+        self.queue = result_queue
+        self.dropped = 0
+
+    def put(self, data):
+        try:
+            self.queue.put_nowait((self.idx, data))
+        except queue.Full:
+            self.dropped += 1
+
+    def summary(self):
+        return f"W{self.idx} drop={self.dropped}"
 
 
+def worker(idx, args, threads, pipe, result_queue, load):
+    torch.set_num_threads(threads)
+    tag = f"[W{idx}] "
+    model = prepare_model(args, tag)
+    print(f"🧵 {tag}torch threads={threads}")
+    lock = threading.Lock()
+    out = ResultPipe(idx, result_queue)
 
+    def run(stream_id, conn):
+        try:
+            enable_keepalive(conn)
+            serve_stream(conn, model, args, out, tag=f"[W{idx}/S{stream_id}] ", stream_id=stream_id, lock=lock)
+        except Exception as e:
+            print(f"❌ {tag}Stream {stream_id} ended: {e}")
+        finally:
+            conn.close()
+            with load.get_lock():
+                load[idx] -= 1
+
+    try:
+        while True:
+            stream_id, conn = pipe.recv()
+            threading.Thread(target=run, args=(stream_id, conn), daemon=True).start()
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+def supervisor(args):
+    n = args.workers
+    threads = args.threads or max(1, (os.cpu_count() or 1) // n)
+    if args.jit:  # 先在 supervisor 中导出缺失的缓存，避免多个 worker 同时导出
+        cache = ModelCache('yolov8n.pt', 'cuda' if torch.cuda.is_available() else 'cpu', args.cache_dir)
+        for shape in candidate_shapes(args):
+            cache.prepare(shape)
+    ctx = mp.get_context('spawn')
+    result_queue = ctx.Queue(maxsize=64 * n)
+    load = ctx.Array('i', n)  # 每个 worker 当前负责的流数
+    pipes, processes = [], []
+    for i in range(n):
+        parent, child = ctx.Pipe()
+        p = ctx.Process(target=worker, args=(i, args, threads, child, result_queue, load), daemon=True)
+        p.start()
+        pipes.append(parent)
+        processes.append(p)
+    print(f"🏭 Supervisor started {n} workers x {threads} torch threads")
+
+    forward_socket, forward_queue = connect_receiver(args)
+
+    # 汇总线程：转发所有 worker 的结果，并每秒统计聚合 FPS
+    # receiver 断开（SendQueue.put 抛出 ConnectionError）时关闭旧连接并重连，重连成功前丢弃结果
+    def aggregate():
+        nonlocal forward_socket, forward_queue
+        counts = [0] * n
+        start = time.time()
+        while True:
+            try:
+                idx, data = result_queue.get(timeout=1.0)
+                if forward_queue is None:
+                    forward_socket, forward_queue = connect_receiver(args)
+                forward_queue.put(data)
+                counts[idx] += 1
+            except queue.Empty:
+                pass
+            except OSError as e:  # ConnectionError 或重连失败
+                print(f"❌ Receiver connection lost: {e}, reconnecting...")
+                if forward_queue is not None:
+                    forward_queue.close(timeout=0)
+                    forward_socket.close()
+                    forward_socket, forward_queue = None, None
+                time.sleep(1.0)
+            now = time.time()
+            if now - start >= 1.0 and (any(counts) or any(load[:])):
+                per_worker = [c / (now - start) for c in counts]
+                print(f"📈 Aggregate FPS={sum(per_worker):5.1f} | "
+                      f"Workers={' '.join(f'{f:.1f}' for f in per_worker)} | "
+                      f"Streams={list(load[:])} | {forward_queue.summary() if forward_queue else 'Q=disconnected'}")
+                counts = [0] * n
+                start = now
+            elif now - start >= 1.0:
+                start = now
+
+    threading.Thread(target=aggregate, daemon=True).start()
+
+    # 启动服务器
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind(('0.0.0.0', 8080))
+    server_socket.listen(4 * n)
+    print("✅ YOLO Server listening on port 8080...")
+
+    stream_id = 0
+    try:
+        while True:
+            conn, addr = server_socket.accept()
+            with load.get_lock():
+                idx = min(range(n), key=lambda i: load[i])  # least-loaded
+                load[idx] += 1
+            pipes[idx].send((stream_id, conn))  # 同步 pickle，随后即可关闭本进程的副本
+            conn.close()
+            print(f"📡 Stream {stream_id} from {addr} -> worker {idx}")
+            stream_id += 1
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped by user.")
+    finally:
+        server_socket.close()
+        for p in processes:
+            p.terminate()
+        if forward_queue is not None:
+            forward_queue.close()
+            forward_socket.close()
+
+
+# ==================== 扩展性测试 ====================
+def bench_worker(args, threads, barrier, result_queue):
+    torch.set_num_threads(threads)
+    model = YOLO('yolov8n.pt')
+    image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    letterboxed = LetterboxGeometry(image.shape[:2], args.imgsz).apply(image)
+    for _ in range(3):  # warmup
+        model(letterboxed, imgsz=args.imgsz, verbose=False)
+    barrier.wait()
+    frames, start = 0, time.time()
+    while time.time() - start < args.bench_seconds:
+        model(letterboxed, imgsz=args.imgsz, verbose=False)
+        frames += 1
+    result_queue.put(frames / (time.time() - start))
+
+
+def bench(args):
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores, *(2 ** k for k in range(1, cores.bit_length()) if 2 ** k < cores)})
+    ctx = mp.get_context('spawn')
+    print(f"{'workers':>8}{'threads':>9}{'FPS':>10}{'speedup':>9}")
+    base = None
+    for n in counts:
+        threads = args.threads or max(1, cores // n)
+        barrier, result_queue = ctx.Barrier(n), ctx.Queue()
+        processes = [ctx.Process(target=bench_worker, args=(args, threads, barrier, result_queue)) for _ in range(n)]
+        for p in processes:
+            p.start()
+        fps = sum(result_queue.get() for _ in range(n))
+        for p in processes:
+            p.join()
+        base = base or fps
+        print(f"{n:>8d}{threads:>9d}{fps:>10.1f}{fps / base:>8.2f}x")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.bench:
+        bench(args)
+    elif args.workers > 0:
+        supervisor(args)
+    else:
+        main(args)